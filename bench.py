@@ -0,0 +1,212 @@
+"""
+Benchmark the optimiser over synthetic Jump programs of increasing size.
+
+Each size runs in a fresh worker process, so its peak memory is its own.
+A process's peak only ever rises, so each stage is credited with how far it
+raised the peak, rather than with the peak so far.
+Results can be saved as a baseline and later runs compared against one,
+flagging stages that got slower.
+
+"""
+import argparse
+import json
+import multiprocessing
+import resource
+import sys
+from collections import OrderedDict
+from StringIO import StringIO
+from timeit import default_timer as clock
+
+from graph.passes import PassManager, PIPELINES
+from graph.pycompile import CompiledProgram
+from graph.stats import Stats
+from graph.vm import execute, interpret
+from synth import ProgramGenerator
+from run import parse, FRONTENDS
+
+DEFAULT_SIZES = (100, 1000, 10000, 100000)
+MAX_STEPS = 10 ** 8
+
+def peak_rss():
+    """Peak resident set size of this process so far, in KiB."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def bench_size(job):
+    """Benchmark one program size; returns an OrderedDict of stage results."""
+    size, knobs, level, run, frontend = job
+
+    source = '\n'.join(ProgramGenerator(statements=size, **knobs).generate())
+
+    stats = Stats()
+    stages = OrderedDict()
+
+    def stage(name, fn):
+        start = clock()
+        peak = peak_rss()
+        result = fn()
+        stages[name] = OrderedDict([('time', clock() - start),
+                                    ('peak_growth', peak_rss() - peak)])
+        return result
+
+    graph = stage('frontend',
+                  lambda: parse(StringIO(source), stats, frontend))
+    stage('optimise', lambda: PassManager(graph, level).run())
+    code = stage('generate', lambda: list(graph.generate()))
+
+    if run:
+        # differential test: the optimised program must behave as the original
+        before = execute(parse(StringIO(source), frontend=frontend),
+                         MAX_STEPS)
+        # and every engine must agree on it: statement walking, the VM and
+        # compiled Python (timed separately from its compilation)
+        walked = stage('interpret', lambda: interpret(graph, MAX_STEPS))
+        after = stage('execute', lambda: execute(graph, MAX_STEPS))
+        program = stage('pycompile', lambda: CompiledProgram(graph))
+        compiled = stage('pyexecute', lambda: program.run(MAX_STEPS))
+        execution = OrderedDict([
+            ('value', after.value),
+            ('steps_before', before.steps),
+            ('steps_after', after.steps),
+            ('matches', (before.value, before.returned) ==
+                        (after.value, after.returned)),
+            ('engines_agree', walked == after == compiled),
+        ])
+
+    # break the optimiser down by pass
+    for name in PIPELINES[level]:
+        if name in stats.passes:
+            stages[name] = OrderedDict([('time', stats[name].time),
+                                        ('calls', stats[name].calls)])
+
+    result = OrderedDict([
+        ('size', size),
+        ('level', level),
+        ('frontend', frontend),
+        ('knobs', knobs),
+        ('lines_in', source.count('\n') + 1),
+        ('lines_out', len(code)),
+        ('peak_rss', peak_rss()),
+        ('stages', stages),
+    ])
+    if run:
+        result['execution'] = execution
+    return result
+
+def run_benchmarks(sizes, knobs, level='O2', run=False, frontend='antlr'):
+    pool = multiprocessing.Pool(1, maxtasksperchild=1)
+    try:
+        return pool.map(bench_size,
+                        [(size, knobs, level, run, frontend) for size in sizes],
+                        chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+def compare(results, baseline, threshold):
+    """Yield (size, stage, old, new) for every stage slower than threshold."""
+    old_by_size = dict((r['size'], r) for r in baseline)
+    for result in results:
+        old = old_by_size.get(result['size'])
+        if old is None or old['level'] != result['level'] or \
+                old.get('frontend') != result['frontend'] or \
+                old['knobs'] != result['knobs']:
+            continue
+        for name, stage in result['stages'].iteritems():
+            old_stage = old['stages'].get(name)
+            if old_stage is None or old_stage['time'] <= 0:
+                continue
+            if stage['time'] > old_stage['time'] * threshold:
+                yield result['size'], name, old_stage['time'], stage['time']
+
+def report(results):
+    for result in results:
+        line = '{0} statements ({1} lines in, {2} out)'.format(
+            result['size'], result['lines_in'], result['lines_out'])
+        if 'peak_rss' in result:
+            line += ', {0} KiB peak'.format(result['peak_rss'])
+        yield line + ':'
+        for name, stage in result['stages'].iteritems():
+            line = '  {0:<10} {1:>10.2f} ms'.format(name, stage['time'] * 1000)
+            if 'peak_growth' in stage:
+                line += '  {0:>+8} KiB peak'.format(stage['peak_growth'])
+            yield line
+        if 'execution' in result:
+            execution = result['execution']
+            yield '  returned {0}; {1} -> {2} instructions executed{3}{4}'.format(
+                execution['value'], execution['steps_before'],
+                execution['steps_after'],
+                '' if execution['matches'] else ' (MISMATCH)',
+                '' if execution.get('engines_agree', True)
+                else ' (ENGINES DISAGREE)')
+
+def get_argparser():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        metavar='N', help='program sizes, in statements')
+    parser.add_argument('--frontend', default='antlr', choices=FRONTENDS,
+                        help='parser to use (default: %(default)s)')
+    parser.add_argument('-O', dest='level', default='2',
+                        choices=[level[1:] for level in sorted(PIPELINES)],
+                        help='optimisation level (default: %(default)s)')
+    parser.add_argument('--save', metavar='FILE',
+                        help='save the results as a baseline')
+    parser.add_argument('--compare', metavar='FILE',
+                        help='compare against a saved baseline')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='slowdown factor counted as a regression '
+                             '(default: %(default)s)')
+    parser.add_argument('--execute', action='store_true',
+                        help='run each program before and after optimisation, '
+                             'checking they agree, and time running it by '
+                             'walking statements, in the VM and compiled to '
+                             'Python')
+
+    knobs = parser.add_argument_group('program generator')
+    knobs.add_argument('--variables', type=int, default=20)
+    knobs.add_argument('--loop-depth', type=int, default=2)
+    knobs.add_argument('--branch-density', type=float, default=0.1)
+    knobs.add_argument('--label-density', type=float, default=0.05)
+    knobs.add_argument('--dead-ratio', type=float, default=0.1)
+    knobs.add_argument('--seed', type=int, default=0)
+    return parser
+
+
+if __name__ == '__main__':
+    args = get_argparser().parse_args()
+    knobs = dict(variables=args.variables, loop_depth=args.loop_depth,
+                 branch_density=args.branch_density,
+                 label_density=args.label_density,
+                 dead_ratio=args.dead_ratio, seed=args.seed)
+
+    results = run_benchmarks(args.sizes, knobs, 'O' + args.level, args.execute,
+                             args.frontend)
+    for line in report(results):
+        print line
+
+    mismatches = [r['size'] for r in results
+                  if not r.get('execution', {}).get('matches', True) or
+                  not r.get('execution', {}).get('engines_agree', True)]
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = list(compare(results, baseline, args.threshold))
+        for size, name, old, new in regressions:
+            print >> sys.stderr, 'REGRESSION: {0} @ {1} statements: ' \
+                                 '{2:.2f} ms -> {3:.2f} ms'.format(
+                                     name, size, old * 1000, new * 1000)
+    else:
+        regressions = []
+
+    if mismatches:
+        print >> sys.stderr, 'MISMATCH: optimised programs of {0} statements ' \
+                             'behave differently'.format(
+                                 ', '.join(map(str, mismatches)))
+
+    if regressions or mismatches:
+        sys.exit(1)
@@ -9,3 +9,4 @@ GOTO = 1
 IFGOTO = 2
 
 class JumpSyntaxError(ValueError): pass
+class JumpRuntimeError(RuntimeError): pass
@@ -0,0 +1,124 @@
+"""
+Basic blocks: maximal runs of statements with a single entry and exit.
+
+A statement joins the block of the one before it when that is its only
+predecessor, it is that statement's only successor, and neither branches
+(an IFGOTO always ends its block) nor is the start.  Block-level edges are
+those between the last statement of a block and the first of another, so
+an analysis can summarise each block once and iterate over the blocks
+alone.
+
+"""
+from array import array
+
+from graph import tokens as lex
+
+from graph import GOTO, IFGOTO
+from graph.traversal import reverse_postorder
+
+class Block(object):
+    __slots__ = ('num', 'statements', 'succs', 'preds')
+
+    def __init__(self, num, statements):
+        self.num = num
+        self.statements = statements
+        self.succs = []
+        self.preds = []
+
+    @property
+    def first(self):
+        return self.statements[0]
+
+    @property
+    def last(self):
+        return self.statements[-1]
+
+    def __repr__(self):
+        return '<Block #{0} | {1} -> {2} | -> {3} >'.format(
+            self.num, self.first.num, self.last.num,
+            ', '.join(str(block.num) for block in self.succs) or '//')
+
+class BlockGraph(object):
+    """
+    The basic blocks of a CFGraph, as of its construction.
+
+    Blocks are numbered in reverse postorder (so the start's block is block
+    0, when there is a start).  `block_of[stmt.num]` is the number of the
+    block holding stmt, or -1 for statements no longer in the graph, and
+    `position[stmt.num]` its index within that block.
+
+    """
+    def __init__(self, graph):
+        self.graph = graph
+        self.blocks = []
+        self.block_of = array('i', [-1]) * len(graph.nodes)
+        self.position = array('i', [-1]) * len(graph.nodes)
+
+        order = reverse_postorder(graph)
+        linr, goto, ifgoto = graph.succ
+        linr_pred = graph.linr_pred
+        goto_pred = graph.jump_pred[GOTO]
+        ifgoto_pred = graph.jump_pred[IFGOTO]
+        start = graph.start.num if graph.start is not None else -1
+
+        # chain[num] is the statement following num in its block, if any;
+        # joined marks the statements which so continue a block
+        self.chain = chain = array('i', [-1]) * len(graph.nodes)
+        joined = bytearray(len(graph.nodes))
+        for stmt in order:
+            if stmt.type == lex.IFGOTO:
+                continue
+            num = stmt.num
+            target = linr[num] if linr[num] >= 0 else goto[num]
+            if target < 0 or target == num or target == start:
+                continue
+            if (linr_pred[target] >= 0) + len(goto_pred.get(target, ())) + \
+                    len(ifgoto_pred.get(target, ())) == 1:
+                chain[num] = target
+                joined[target] = 1
+
+        # start blocks at the leaders in reverse postorder, which keeps the
+        # statements of a block together; then at whatever is left, which
+        # can only be cycles of statements unreachable from elsewhere
+        for stmt in order:
+            if not joined[stmt.num]:
+                self.add_block(stmt)
+        for stmt in order:
+            if self.block_of[stmt.num] < 0:
+                self.add_block(stmt)
+
+        for block in self.blocks:
+            for stmt in graph.successors(block.last):
+                succ = self.blocks[self.block_of[stmt.num]]
+                if succ not in block.succs:
+                    block.succs.append(succ)
+                    succ.preds.append(block)
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def __iter__(self):
+        return iter(self.blocks)
+
+    def block(self, stmt):
+        """The block holding stmt."""
+        return self.blocks[self.block_of[stmt.num]]
+
+    @property
+    def entry(self):
+        start = self.graph.start
+        return self.blocks[self.block_of[start.num]] if start else None
+
+    def add_block(self, leader):
+        block = Block(len(self.blocks), [])
+        self.blocks.append(block)
+
+        nodes = self.graph.nodes
+        num = leader.num
+        while num >= 0 and self.block_of[num] < 0:
+            self.block_of[num] = block.num
+            self.position[num] = len(block.statements)
+            block.statements.append(nodes[num])
+            num = self.chain[num]
+
+        return block
@@ -0,0 +1,373 @@
+"""
+An on-disk cache of compilations, so unchanged programs are never re-optimised.
+
+Entries are keyed by a digest of the source text, the optimiser configuration
+and the tool's own source code -- the graph package, the grammar and the
+parser ANTLR generated from it -- so any change to the tool invalidates them,
+and hold the generated program and, optionally, its dot file.
+A MemoryCache keeps recent entries in memory instead, for a long-lived
+process, in front of an on-disk cache if there is one.
+
+Entries can be written as the compilation is generated, a piece at a time
+(see writer()), so that it need not be held in memory first.
+
+Several processes may share a cache directory: entries are written to a
+temporary file and renamed into place, so readers only ever see whole
+entries.  Hits refresh an entry's mtime; once the cache outgrows its size
+limit, the least recently used entries are evicted.  Rather than measuring
+the directory on every put, a cache counts the size of the entries it puts
+since it last did, and only measures it (and evicts) once that count passes
+the limit; evicting leaves some room, so that it is not needed again at once.
+As the count misses entries other processes put, the limit is only kept to
+within what each puts between measuring.
+
+"""
+import errno
+import hashlib
+import json
+import os
+import tempfile
+from collections import namedtuple, OrderedDict
+
+DEFAULT_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME') or
+                           os.path.expanduser(os.path.join('~', '.cache')),
+                           'jump')
+DEFAULT_SIZE = 64 * 1024 * 1024  # bytes
+EVICT_TO = 0.75  # of the size limit, what evicting leaves
+DOT_BUFFER = 1 << 16  # bytes of dot text gathered before encoding them
+DEFAULT_ENTRIES = 256  # for a MemoryCache
+SUFFIX = '.json'
+
+Entry = namedtuple('Entry', 'output dot')
+
+_tool_version = None
+
+def make_key(source, config):
+    """The key of source compiled with config, a dict of its settings."""
+    digest = hashlib.sha1()
+    digest.update(json.dumps([tool_version(), sorted(config.items())]))
+    digest.update('\0')
+    digest.update(source)
+    return digest.hexdigest()
+
+def python_files(directory):
+    if not os.path.isdir(directory):
+        return []
+    return [os.path.join(directory, name)
+            for name in sorted(os.listdir(directory)) if name.endswith('.py')]
+
+def tool_version():
+    """
+    A digest of the source of the graph package, of Jump.g and of the parser
+    generated from it in build/ (if it has been built).
+
+    """
+    global _tool_version
+    if _tool_version is None:
+        digest = hashlib.sha1()
+        package = os.path.dirname(os.path.abspath(__file__))
+        root = os.path.dirname(package)
+        paths = python_files(package) + [os.path.join(root, 'Jump.g')] + \
+                python_files(os.path.join(root, 'build'))
+        for path in paths:
+            try:
+                with open(path, 'rb') as f:
+                    text = f.read()
+            except IOError:
+                continue
+            name = os.path.relpath(path, root)
+            digest.update(name + '\0' + text + '\0')
+        _tool_version = digest.hexdigest()
+    return _tool_version
+
+class CompileCache(object):
+    """
+    Compilations cached in directory, of at most max_size bytes; or with a
+    max_size of None, of any size (for evict() to be called later).
+
+    """
+    def __init__(self, directory=DEFAULT_DIR, max_size=DEFAULT_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+        self.size = None  # as last measured, plus what was put since
+
+    def key(self, source, **config):
+        """The key of source compiled with the given configuration."""
+        return make_key(source, config)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + SUFFIX)
+
+    def get(self, key, dot=False):
+        """
+        Return the Entry stored under key, or None.
+
+        With dot, entries stored without a dot file count as misses.
+
+        """
+        path = self.path(key)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            os.utime(path, None)
+        except (IOError, OSError, ValueError):
+            # missing, or evicted under our feet
+            return None
+
+        if dot and data['dot'] is None:
+            return None
+        return Entry([str(line) for line in data['output']],
+                     str(data['dot']) if data['dot'] is not None else None)
+
+    def put(self, key, output, dot=None):
+        """Store the generated lines of output (and dot text) under key."""
+        writer = self.writer(key)
+        writer.add(output)
+        if dot is not None:
+            writer.write(dot)
+        writer.commit()
+
+    def writer(self, key):
+        """An EntryWriter for the entry to store under key."""
+        return EntryWriter(self, key)
+
+    def added(self, size):
+        """Count size more bytes put in the cache, evicting if need be."""
+        if self.max_size is None:
+            return
+        if self.size is not None:
+            self.size += size
+        if self.size is None or self.size > self.max_size:
+            self.evict()
+
+    def evict(self):
+        """
+        Measure the cache, and if it is bigger than max_size, remove the least
+        recently used entries until it is no bigger than EVICT_TO of it.
+
+        """
+        entries = []
+        total = 0
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            if not name.endswith(SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                info = os.stat(path)
+            except OSError:
+                continue
+            entries.append((info.st_mtime, path, info.st_size))
+            total += info.st_size
+
+        self.size = total
+        if self.max_size is None or total <= self.max_size:
+            return
+
+        entries.sort()
+        for mtime, path, size in entries:
+            if total <= self.max_size * EVICT_TO:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # another process got there first
+            total -= size
+        self.size = total
+
+class EntryWriter(object):
+    """
+    An entry of a CompileCache being written, to a temporary file which
+    commit() renames into place, or discard() removes: the lines of output to
+    add(), a list at a time, and then any dot text to write(), as a file.
+
+    The cache is only an optimisation, so failing to write it is silent.
+
+    """
+    def __init__(self, cache, key):
+        self.cache = cache
+        self.key = key
+        self.file = None
+        self.temp = None
+        self.lines = False  # whether any were added
+        self.dot = None     # dot text not yet encoded, once any is written
+        self.pending = 0    # bytes of it
+
+        try:
+            if not os.path.isdir(cache.directory):
+                try:
+                    os.makedirs(cache.directory)
+                except OSError as e:
+                    if e.errno != errno.EEXIST:
+                        raise
+            fd, self.temp = tempfile.mkstemp(suffix='.tmp',
+                                             dir=cache.directory)
+            self.file = os.fdopen(fd, 'w')
+            self.file.write('{"output": [')
+        except (IOError, OSError):
+            self.discard()
+
+    def add(self, lines):
+        if not lines:
+            return
+        if self.lines:
+            self.emit(', ')
+        self.emit(json.dumps(lines)[1:-1])
+        self.lines = True
+
+    def write(self, text):
+        if self.file is None:
+            return
+        if self.dot is None:
+            self.dot = []
+            self.emit('], "dot": "')
+        self.dot.append(text)
+        self.pending += len(text)
+        if self.pending >= DOT_BUFFER:
+            self.flush()
+
+    def flush(self):
+        """Encode the dot text written so far."""
+        text = ''.join(self.dot)
+        self.dot = []
+        self.pending = 0
+        self.emit(json.dumps(text)[1:-1])
+
+    def emit(self, text):
+        if self.file is None:
+            return
+        try:
+            self.file.write(text)
+        except (IOError, OSError):
+            self.discard()
+
+    def commit(self):
+        """Store the entry, in place of any stored under its key before."""
+        if self.dot is None:
+            self.emit('], "dot": null}')
+        else:
+            self.flush()
+            self.emit('"}')
+        if self.file is None:
+            return
+
+        path = self.cache.path(self.key)
+        try:
+            size = self.file.tell()
+            self.file.close()
+            try:
+                size -= os.path.getsize(path)  # being replaced
+            except OSError:
+                pass
+            os.rename(self.temp, path)
+        except (IOError, OSError):
+            self.discard()
+            return
+        self.file = None
+        self.cache.added(size)
+
+    def discard(self):
+        """Give up on the entry."""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        if self.temp is not None:
+            try:
+                os.remove(self.temp)
+            except OSError:
+                pass
+            self.temp = None
+
+class MemoryCache(object):
+    """
+    The max_entries most recently used compilations, held in memory.
+
+    Misses fall through to backing (a CompileCache) if given, and entries
+    found there are kept in memory too; entries put are stored in both.
+
+    """
+    def __init__(self, max_entries=DEFAULT_ENTRIES, backing=None):
+        self.max_entries = max_entries
+        self.backing = backing
+        self.entries = OrderedDict()  # key -> Entry, least recently used first
+
+    def __len__(self):
+        return len(self.entries)
+
+    def key(self, source, **config):
+        """The key of source compiled with the given configuration."""
+        return make_key(source, config)
+
+    def get(self, key, dot=False):
+        """
+        Return the Entry stored under key, or None.
+
+        With dot, entries stored without a dot file count as misses.
+
+        """
+        entry = self.entries.pop(key, None)
+        if entry is None and self.backing is not None:
+            entry = self.backing.get(key, dot)
+        if entry is None:
+            return None
+        self.remember(key, entry)
+        if dot and entry.dot is None:
+            return None
+        return entry
+
+    def put(self, key, output, dot=None):
+        """Store the generated lines of output (and dot text) under key."""
+        self.entries.pop(key, None)
+        self.remember(key, Entry(output, dot))
+        if self.backing is not None:
+            self.backing.put(key, output, dot)
+
+    def writer(self, key):
+        """A MemoryWriter for the entry to store under key."""
+        return MemoryWriter(self, key)
+
+    def remember(self, key, entry):
+        self.entries[key] = entry
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+class MemoryWriter(object):
+    """
+    An entry of a MemoryCache being written, as an EntryWriter's is: it is
+    held in memory anyway, but written through to the backing cache as it
+    comes.
+
+    """
+    def __init__(self, cache, key):
+        self.cache = cache
+        self.key = key
+        self.output = []
+        self.dot = None
+        self.backing = cache.backing.writer(key) \
+                       if cache.backing is not None else None
+
+    def add(self, lines):
+        self.output.extend(lines)
+        if self.backing is not None:
+            self.backing.add(lines)
+
+    def write(self, text):
+        if self.dot is None:
+            self.dot = []
+        self.dot.append(text)
+        if self.backing is not None:
+            self.backing.write(text)
+
+    def commit(self):
+        dot = ''.join(self.dot) if self.dot is not None else None
+        self.cache.entries.pop(self.key, None)
+        self.cache.remember(self.key, Entry(self.output, dot))
+        if self.backing is not None:
+            self.backing.commit()
+
+    def discard(self):
+        if self.backing is not None:
+            self.backing.discard()
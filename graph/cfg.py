@@ -1,59 +1,111 @@
-import sys
-from collections import defaultdict
-from copy import deepcopy
+from array import array
+from collections import OrderedDict
+from itertools import compress
 
-import build.JumpLexer as lex
+from graph import tokens as lex
 
 from graph import JumpSyntaxError
 from graph import LINR, GOTO, IFGOTO
+from graph.blocks import BlockGraph
+from graph.dataflow import Liveness
+from graph.dominators import DominatorTree, LoopNest
+from graph.induction import COMPARISONS, InductionVariables
+from graph.layout import StaticProfile
+from graph.licm import can_trap, hoistable, invariant_statements
+from graph.sccp import ConstantPropagation
+from graph.ssa import SSAForm
 from graph.statement import AssignStmt, AssignOpStmt, IfGotoStmt, ReturnStmt
 from graph.statement import get_statement
+from graph.stats import Stats, instrumented
+from graph.traversal import breadth_first, reachable, reverse_postorder
+from graph.valuenumbering import ValueNumbering
 
 class CFGraph(object):
-    def __init__(self, root):
-        sys.setrecursionlimit(30)
-
+    """
+    The control flow graph of a program.
+
+    Statements are nodes identified by their `num`, which must be their index
+    in the program.  Edges are held in one array per edge type, `succ[type]`
+    mapping a node ID to its successor's (or -1), and deleted nodes are
+    tombstoned in `live` rather than removed, so IDs stay valid throughout.
+    Each statement's `next` is a view of its row of the arrays.
+
+    Predecessors are indexed too, and kept up to date by `set_edge`: a node
+    has at most one linear parent, held in `linr_pred`, while `jump_pred[type]`
+    maps the targets of GOTO and IFGOTO edges to the set of their sources.
+
+    `version` is bumped by every change to the edges, the nodes or the start,
+    so analyses of the graph's shape (blocks, dominators, loops) are cached
+    until it next changes.
+
+    `profile`, if set, is an EdgeProfile of the program, by which JE lays out
+    the most frequently taken edges to fall through (see `graph.layout`).
+    `entry_constants` maps the variables known to hold a constant on entry
+    (as when compiling part of a program apart) to it, for CP to start from.
+    `reserved` holds variables the code around the graph uses, which any
+    variable a pass adds must not be named.
+
+    """
+    def __init__(self, statements, stats=None):
+        """Build the graph of a program's statements, numbered in order."""
+        self.stats = stats if stats is not None else Stats()
         self.gotos_expanded = True
-        self.statements = []
+        self.profile = None
+        self.entry_constants = {}
+        self.reserved = set()
+
+        self.nodes = list(statements)
+        size = len(self.nodes)
+        self.succ = tuple(array('i', [-1]) * size
+                          for edge_type in (LINR, GOTO, IFGOTO))
+        self.live = bytearray([1]) * size
+        self.linr_pred = array('i', [-1]) * size
+        self.jump_pred = (None, {}, {})  # indexed by GOTO, IFGOTO
+        self.size = size  # live nodes
+        self.version = 0
+        self._start = None
+        self._analyses = {}  # name -> (version, result)
+        for i, stmt in enumerate(self.nodes):
+            assert stmt.num == i and stmt.graph is None, \
+                "Statements must be numbered in order, and in no other graph."
+            stmt.graph = self
+
         labels = {}
+        jumps = []  # (node ID, edge type, label) of each GOTO and IFGOTO
 
-        # create all statements and link those that follow linearly
+        # link those statements that follow linearly
         last = None  # the current `stmt` is the LINR child of `last`, if `last`
-        for i, node in enumerate(root.children):
-            stmt = get_statement(node, i)
-            self.statements.append(stmt)
-
+        for i, stmt in enumerate(self.nodes):
             # add the linear `next` pointer to the previous statement
             # (ignore block markers (labels); the `next` pointer will be set to
             # the subsequent statement on the next pass)
-            if last and node.type != lex.REFLABEL:
-                last.next[LINR] = stmt
+            if last is not None and stmt.type != lex.REFLABEL:
+                self.set_edge(last, LINR, i)
 
-            if node.type == lex.REFLABEL:
+            if stmt.type == lex.REFLABEL:
                 # a label points to the subsequent 'stmt' (as defined in Jump.g)
-                label = node.children[0].text
-                labels[label] = i + 1
+                labels[stmt.name] = i + 1
 
-            elif node.type == lex.RETURN:
+            elif stmt.type == lex.RETURN:
                 # terminal statement; has no `next`
                 last = None
 
-            elif node.type in (lex.GOTO, lex.IFGOTO):
+            elif stmt.type in (lex.GOTO, lex.IFGOTO):
                 # goto; ensure the target is in the labels dict
-                assert node.children[0].type == lex.LABEL
-                target = node.children[0].text
-                if target not in labels:
-                    labels[target] = None
+                if stmt.label not in labels:
+                    labels[stmt.label] = None
 
                 # IFGOTOs have a LINR next; GOTOs do not
-                if node.type == lex.GOTO:
+                if stmt.type == lex.GOTO:
+                    jumps.append((i, GOTO, stmt.label))
                     last = None
                 else:
-                    last = stmt
+                    jumps.append((i, IFGOTO, stmt.label))
+                    last = i
 
             else:
                 # assignment statement
-                last = stmt
+                last = i
 
         # check that all GOTO targets exist
         for label, target in labels.iteritems():
@@ -62,27 +114,186 @@ class CFGraph(object):
                                       .format(label))
 
         # forge GOTO and IFGOTO links
-        for i, stmt in enumerate(self.statements):
-            if stmt.type in (lex.GOTO, lex.IFGOTO):
-                edge_type = GOTO if stmt.type == lex.GOTO else IFGOTO
-                target_label = root.children[i].children[0].text
-                stmt.next[edge_type] = self.statements[labels[target_label]]
+        for i, edge_type, label in jumps:
+            self.set_edge(i, edge_type, labels[label])
 
         # find the start (entry) statement
         idx = 0
-        while self.statements[idx].type == lex.REFLABEL:
+        while idx < size and self.nodes[idx].type == lex.REFLABEL:
             idx += 1
-            if idx > len(self.statements):
-                # this should never happen; should be a syntax error in ANTLR
-                raise RuntimeError("Cannot find an entry statement!")
-
-        self.start = self.statements[idx]
+        if idx == size:
+            # only possible for an empty program; labels always precede a stmt
+            raise JumpSyntaxError("Cannot find an entry statement!")
 
-        # NOTE equivalence of stmt.num and self.statements.index(stmt)
-        # not guaranteed beyond this point
+        self.start = self.nodes[idx]
 
         self.eliminate_gotos()
 
+    @classmethod
+    def from_tree(cls, root, stats=None):
+        """Build the graph of an ANTLR parse tree."""
+        return cls([get_statement(node, i)
+                    for i, node in enumerate(root.children or [])], stats)
+
+    @property
+    def start(self):
+        """The entry statement."""
+        return self._start
+
+    @start.setter
+    def start(self, stmt):
+        if stmt is not self._start:
+            self._start = stmt
+            self.version += 1
+
+    def analysis(self, name, build):
+        """Return build(self), reusing the result until the graph changes."""
+        cached = self._analyses.get(name)
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
+        result = build(self)
+        self._analyses[name] = (self.version, result)
+        return result
+
+    def get_blocks(self):
+        """The graph's BlockGraph."""
+        return self.analysis('blocks', BlockGraph)
+
+    def get_dominators(self):
+        """The DominatorTree of the graph's blocks."""
+        return self.analysis('dominators',
+                             lambda graph: DominatorTree(graph.get_blocks()))
+
+    def get_loops(self):
+        """The LoopNest of the graph's natural loops."""
+        return self.analysis('loops',
+                             lambda graph: LoopNest(graph.get_dominators()))
+
+    @property
+    def statements(self):
+        """The statements still in the graph, in program order."""
+        return list(compress(self.nodes, self.live))
+
+    def successors(self, stmt):
+        """The statements stmt has edges to, in edge type order."""
+        num = stmt.num
+        nodes = self.nodes
+        return [nodes[edges[num]] for edges in self.succ if edges[num] >= 0]
+
+    def predecessors(self, stmt):
+        """The (statement, edge type) pairs of the edges into stmt, in order."""
+        num = stmt.num
+        preds = []
+        if self.linr_pred[num] >= 0:
+            preds.append((self.linr_pred[num], LINR))
+        for edge_type in (GOTO, IFGOTO):
+            sources = self.jump_pred[edge_type].get(num)
+            if sources:
+                preds.extend((source, edge_type) for source in sources)
+        preds.sort()
+
+        nodes = self.nodes
+        return [(nodes[source], edge_type) for source, edge_type in preds]
+
+    def linear_parent(self, stmt):
+        """The statement falling through to stmt, if any."""
+        source = self.linr_pred[stmt.num]
+        return self.nodes[source] if source >= 0 else None
+
+    def falls_through_to(self, stmt, target):
+        """True if following linear edges from stmt reaches target."""
+        linr = self.succ[LINR]
+        num = stmt.num
+        for i in xrange(len(linr)):  # linear edges may form cycles
+            if num == target.num:
+                return True
+            num = linr[num]
+            if num < 0 or num == stmt.num:
+                return False
+        return False
+
+    def is_labelled(self, stmt):
+        """True if stmt is the target of a GOTO or IFGOTO edge."""
+        return stmt.num in self.jump_pred[GOTO] or \
+               stmt.num in self.jump_pred[IFGOTO]
+
+    @property
+    def labelled(self):
+        """The set of statements targeted by GOTO or IFGOTO edges."""
+        nodes = self.nodes
+        return set(nodes[num] for edge_type in (GOTO, IFGOTO)
+                   for num in self.jump_pred[edge_type])
+
+    def set_edge(self, num, edge_type, target):
+        """Point the edge_type edge of node num at node target (or -1)."""
+        edges = self.succ[edge_type]
+        old = edges[num]
+        if old == target:
+            return
+
+        if edge_type == LINR:
+            assert target < 0 or self.linr_pred[target] < 0, \
+                "Cannot have multiple linear parents."
+            if old >= 0:
+                self.linr_pred[old] = -1
+            if target >= 0:
+                self.linr_pred[target] = num
+        else:
+            preds = self.jump_pred[edge_type]
+            if old >= 0:
+                sources = preds[old]
+                sources.discard(num)
+                if not sources:
+                    del preds[old]
+            if target >= 0:
+                sources = preds.get(target)
+                if sources is None:
+                    sources = preds[target] = set()
+                sources.add(num)
+
+        edges[num] = target
+        self.version += 1
+
+    def sweep(self, keep):
+        """
+        Kill every statement whose node ID is not marked in keep.
+
+        Returns the number of statements killed.
+
+        """
+        nodes = self.nodes
+        live = self.live
+        removed = 0
+        for num in xrange(len(nodes)):
+            if live[num] and not keep[num]:
+                self.kill(nodes[num])
+                removed += 1
+        return removed
+
+    def add(self, stmt):
+        """Add a new statement (numbered as the next node ID) to the graph."""
+        assert stmt.num == len(self.nodes) and stmt.graph is None, \
+            "New statements must take the next number, and be in no graph."
+        self.nodes.append(stmt)
+        for edges in self.succ:
+            edges.append(-1)
+        self.live.append(1)
+        self.linr_pred.append(-1)
+        self.size += 1
+        self.version += 1
+        stmt.graph = self
+        return stmt
+
+    def kill(self, stmt):
+        """Delete a statement (no longer referred to) from the graph."""
+        num = stmt.num
+        for edge_type in (LINR, GOTO, IFGOTO):
+            self.set_edge(num, edge_type, -1)
+        self.live[num] = 0
+        self.size -= 1
+        self.version += 1
+
+    @instrumented
     def eliminate_gotos(self):
         """
         Remove all GOTO statement nodes; preserving references.
@@ -90,263 +301,540 @@ class CFGraph(object):
         The references are preserved in the preceiding statement's GOTO pointer
         slot in its `next` attribute.
 
+        Each chain of GOTOs is followed only once: every GOTO on it is
+        remembered as leading to the concrete statement at its end, so later
+        references into the chain are resolved at once (path compression), and
+        the whole pass takes linear time.
+
         """
         assert self.gotos_expanded
 
-        for stmt in self.statements:
-            # we need to repoint self.start if it's currently on a GOTO
-            # about to be eliminated...
-            move_start = (stmt == self.start and stmt.type == lex.GOTO)
+        nodes = self.nodes
+        goto_edges = self.succ[GOTO]
+        # resolved[num] is the concrete statement the GOTO at num leads to;
+        # or UNRESOLVED, or ACTIVE while it is on the chain being followed
+        UNRESOLVED, ACTIVE = -1, -2
+        resolved = array('i', [UNRESOLVED]) * len(nodes)
+
+        def resolve(num):
+            """The concrete statement a reference to num leads to."""
+            path = []
+            while nodes[num].type == lex.GOTO and resolved[num] < 0:
+                if resolved[num] == ACTIVE:
+                    # XXX handle this better?  or is exploding appropriate?
+                    raise JumpSyntaxError("OMG INFINITE GOTO LOOPSIES!")
+                resolved[num] = ACTIVE
+                path.append(num)
+                num = goto_edges[num]
+            if nodes[num].type == lex.GOTO:
+                num = resolved[num]
+            for step in path:
+                resolved[step] = num
+            return nodes[num]
 
+        for stmt in self.statements:
             for edge_type in (LINR, GOTO, IFGOTO):
-
                 snext = stmt.next[edge_type]
-
-                if snext is None:
+                if snext is None or snext.type != lex.GOTO:
                     continue
 
-                # work though any consecutive GOTO references until we hit a
-                # 'concrete' statement
-                visited = []
-                while snext.type == lex.GOTO:
-                    if snext in visited:
-                        # XXX handle this better?  or is exploding appropriate?
-                        raise JumpSyntaxError("OMG INFINITE GOTO LOOPSIES!")
-                    visited.append(snext)
-                    snext = snext.next[GOTO]
+                # skip any consecutive GOTO references to the 'concrete'
+                # statement they lead to
+                target = resolve(snext.num)
 
                 # maintain the [LINR, GOTO, IFGOTO] convention
-                if stmt.next[edge_type].type == lex.GOTO:
-                    if edge_type == LINR:
-                        stmt.next[LINR] = None
-                        stmt.next[GOTO] = snext
-                    else:
-                        stmt.next[edge_type] = snext
+                self.stats.count('edges_rewritten')
+                if edge_type == LINR:
+                    stmt.next[LINR] = None
+                    stmt.next[GOTO] = target
                 else:
-                    stmt.next[edge_type] = snext
+                    stmt.next[edge_type] = target
 
-                if move_start:
-                    assert edge_type == GOTO, \
-                        "Should only be moving self.start if it points to a GOTO."
-                    self.start = snext
+        # we need to repoint self.start if it's on a GOTO about to be
+        # eliminated...
+        if self.start.type == lex.GOTO:
+            self.start = resolve(self.start.num)
 
         for stmt in self.statements:
             if stmt.type == lex.GOTO:
                 stmt.next = [None, None, None]
+                self.stats.count('statements_removed')
 
         self.gotos_expanded = False
 
-    def get_backrefs(self):
-        """Return a backrefs mapping from each stmt to those that refer to it."""
-
-        # { stmt: [ ( prev, type ), ... ], ... }; type in (LINR, GOTO, IFGOTO)
-        backrefs = defaultdict(list)
-        backrefs[self.start] = []
-
-        for stmt in self.statements:
-            for edge_type in (LINR, GOTO, IFGOTO):
-
-                target = stmt.next[edge_type]
-                if target is not None:
-                    backrefs[target].append((stmt, edge_type))
-
-        return backrefs
-
     def optimise(self, debug=False):
-        if debug:
-            self.UCE()
-            print
-            print "  ---> Post-UCE:"
-            print self
-            self.JE()
-            print
-            print "  ---> Post-J:"
-            print self
-            self.DCE()
-            print
-            print "  ---> Post-DCE:"
-            print self
-            self.CP()
-            print
-            print "  ---> Post-CP:"
-        else:
-            self.UCE()
-            self.JE()
-            self.DCE()
-            self.CP()
-
+        """Run each pass once; returns True if any of them changed the graph."""
+        changed = False
+        for name in ('UCE', 'JE', 'DCE', 'CP', 'CSE', 'LICM', 'SR'):
+            changed = getattr(self, name)() or changed
+            if debug:
+                print
+                print "  ---> Post-{0}:".format(name)
+                print self
+        return changed
+
+    @instrumented
     def UCE(self):
         """Unreachable code elimination."""
 
-        cur_nodes = [self.start]
-        for node in cur_nodes:
-            for target_node in node.next:
-                if target_node not in cur_nodes and target_node != None:
-                    cur_nodes.append(target_node)
-
-        self.statements = sorted(cur_nodes, key=lambda x: x.num)
+        removed = self.sweep(reachable(self))
+        self.stats.count('statements_removed', removed)
+        return removed > 0
 
+    @instrumented
     def JE(self):
         """Jump elimination."""
         # XXX not optimal
 
         assert not self.gotos_expanded
 
-        dists = dict()
-        todo = [(self.start, 0)]
-        visited = set()
-        while todo:
-            curr, dist = todo.pop(0)
-            dists[curr] = dist
-            todo.extend((t, dist + 1) for t in curr.next
-                        if t and t not in visited)
-            visited.update(set([t for t in curr.next if t]))
+        dists = dict(breadth_first(self))
+        profile = self.profile
+        weights = profile if profile is not None else StaticProfile(self)
 
         # make a best-effort attempt to have as many stmts with one LINR
-        # parent (backref) as possible, and for each LINR parent to be as close
-        # to the start node as possible
-        backrefs = self.get_backrefs()
-        for stmt, parents in backrefs.iteritems():
-            if stmt == self.start:
+        # parent (backref) as possible, and for each LINR parent to be the one
+        # most often taken (or as close to the start node as possible)
+        changed = False
+        start = self.start
+        for stmt in self.statements:
+            if stmt == start:
                 continue
 
-            existing_linr = [p for p, edge_type in parents if edge_type == LINR]
-            assert len(existing_linr) <= 1, "Cannot have multiple linear parents."
-            existing_linr = existing_linr[0] if existing_linr else None
+            existing_linr = self.linear_parent(stmt)
 
-            f = lambda p: dists[p[0]]  # distance of parent from start node
-            for parent, edge_type in sorted(parents, key=f):
+            preds = self.predecessors(stmt)
+            if len(preds) > 1:
+                # hottest first; then by distance of parent from start node
+                # (unreachable parents, which UCE may not have swept, last)
+                preds.sort(key=lambda p: (-weights.weight(p[0], stmt),
+                                          dists.get(p[0], len(dists))))
+            for parent, edge_type in preds:
                 if parent == stmt:
                     continue
                 if parent == existing_linr:
                     break
-                if edge_type == GOTO and parent.next[LINR] is None:
-                    parent.next[LINR] = stmt
-                    parent.next[GOTO] = None
-                    idx = backrefs[stmt].index((parent, GOTO))
-                    backrefs[stmt][idx] = (parent, LINR)
+                if edge_type == GOTO and parent.next[LINR] is None and \
+                        not self.falls_through_to(stmt, parent):
+                    # (a cycle of linear edges would need a jump out anyway)
+                    # demote the old linear parent first; there can only be one
+                    if profile is not None:
+                        self.stats.count('taken_jumps_removed',
+                                         profile.weight(parent, stmt) -
+                                         (profile.weight(existing_linr, stmt)
+                                          if existing_linr else 0))
                     if existing_linr:
                         existing_linr.next[LINR] = None
                         existing_linr.next[GOTO] = stmt
-                        idx = backrefs[stmt].index((existing_linr, LINR))
-                        backrefs[stmt][idx] = (existing_linr, GOTO)
+                        self.stats.count('edges_rewritten')
+                    parent.next[GOTO] = None
+                    parent.next[LINR] = stmt
+                    self.stats.count('edges_rewritten')
+                    changed = True
                     break
 
+        return changed
+
+    @instrumented
     def DCE(self):
         """Dead code elimination."""
 
-        backrefs = self.get_backrefs()
+        def stuck(stmt):
+            # a statement looping back onto itself, or with nothing after it,
+            # has nowhere to reroute its parents to
+            return stmt in stmt.next or stmt.next == [None, None, None]
 
-        terminal_nodes = []
-        for stmt in self.statements:
-            if stmt.next == [None, None, None]:
-                terminal_nodes.append(stmt)
+        def required(stmt):
+            # statements which stay, and so need the values they read; one
+            # which could trap must run even if its value is not needed
+            return stuck(stmt) or can_trap(stmt)
 
-        gen = lambda stmt: set(stmt.rhs)
-        kill = lambda stmt: set(stmt.lhs)
-        fn = lambda node, x: gen(node).union((x - kill(node)))
+        ssa = SSAForm(self, self.get_blocks(), self.get_dominators())
+        self.stats.count('phis', sum(len(phis) for phis in ssa.phis))
 
-        def out_stmt(stmt, visited=None):
-            visited = visited or []
-            in_ = set()
-            for edge in stmt.next:
-                if edge and edge not in visited:
-                    visited.append(edge)
-                    in_ |= out_stmt(edge, visited)[0]
+        changed = False
+        for stmt in ssa.dead(required):
+            if stuck(stmt):
+                # left looping onto itself by removing the rest of a dead
+                # loop; harmless, as it cannot trap
+                continue
+            self.remove(stmt)
+            self.stats.count('statements_removed')
+            changed = True
 
-            kill_it = (len(kill(stmt) - in_) > 0)
+        return changed
 
-            return fn(stmt, in_), kill_it
+    def successor(self, stmt, ifgoto_type=None):
+        """
+        Return the (edge type, statement) that would take over from stmt.
 
-        todo = []
-        todo.extend(terminal_nodes)
-        visited = []
-        while todo:
-            stmt = todo.pop(0)
-            if stmt in visited:
-                continue
-            visited.append(stmt)
-            in_ = set()
-            out, kill_it = out_stmt(stmt)
-            todo.extend([b[0] for b in backrefs[stmt]])
-            if kill_it:
-                self.remove(stmt, backrefs)
-
-    def remove(self, stmt, backrefs, ifgoto_type=None):
-        """Eliminate a statement from the graph."""
+        That is, the statement control passes to after stmt, and whether it
+        is reached by falling through or by a jump.
 
+        """
         assert stmt.type != lex.IFGOTO or ifgoto_type in (LINR, IFGOTO), \
                 "Need to know whether to use an IFGOTO's LINR or IFGOTO child."
 
         assert not (stmt.next[LINR] and stmt.next[GOTO])
 
-        for prev, edge_type in backrefs[stmt]:
+        if stmt.type == lex.IFGOTO and ifgoto_type == IFGOTO:
+            return GOTO, stmt.next[IFGOTO]
+        if stmt.next[LINR] is not None:
+            return LINR, stmt.next[LINR]
+        return GOTO, stmt.next[GOTO]
+
+    def can_remove(self, stmt, ifgoto_type=None):
+        """
+        True if stmt's parents can be rerouted to its successor.
+
+        Not so for an empty loop onto itself, nor where the program would
+        end in its place but for a conditional jump (or the start) needing
+        a target.
+
+        """
+        target = self.successor(stmt, ifgoto_type)[1]
+        if target is stmt:
+            return False
+        if target is None:
+            return stmt is not self.start and \
+                   stmt.num not in self.jump_pred[IFGOTO]
+        return True
+
+    def detach(self, stmt, ifgoto_type=None):
+        """
+        Unlink a statement from the graph, leaving it without edges.
+
+        Its parents are rerouted to its successor, which is returned.
+
+        """
+        target_type, target = self.successor(stmt, ifgoto_type)
+
+        assert target is not stmt, "Cannot remove an empty loop."
+
+        # drop `stmt`'s own edges first, freeing up `target`'s linear parent
+        # slot
+        parents = [(prev, edge_type) for prev, edge_type
+                   in self.predecessors(stmt) if prev is not stmt]
+        for edge_type in (LINR, GOTO, IFGOTO):
+            self.set_edge(stmt.num, edge_type, -1)
+
+        # each parent keeps its own edge type, except that a linear parent
+        # inherits `stmt`'s; this keeps every statement to one linear parent
+        for prev, edge_type in parents:
             if edge_type == IFGOTO:
-                prev.next[IFGOTO] = stmt.next[ifgoto_type]
+                prev.next[IFGOTO] = target
+            elif edge_type == GOTO:
+                prev.next[GOTO] = target
             else:
-                # parent either points via a LINR or GOTO, and only to the
-                # current stmt, so (I believe) it is safe to override with
-                # prejudice
-                for et in (LINR, GOTO):
-                    prev.next[et] = stmt.next[et]
-
-        # fix up the backrefs dict
-        if stmt.type == lex.IFGOTO:
-            target = stmt.next[ifgoto_type]
-        else:
-            for edge_type in (LINR, GOTO):
-                target = stmt.next[edge_type]
-                if target:
-                    break
+                prev.next[LINR] = None
+                prev.next[target_type] = target
+        self.stats.count('edges_rewritten', len(parents))
+
         if self.start == stmt:
             self.start = target
-        
-        backrefs[target].extend(backrefs[stmt])
-        del backrefs[stmt]
 
-        self.statements.remove(stmt)
+        return target
 
-    def CP(self, start=None, values=None, visited=None, backrefs=None, labels=None):
-        """Constant propagation."""
+    def remove(self, stmt, ifgoto_type=None):
+        """Eliminate a statement from the graph."""
+        self.detach(stmt, ifgoto_type)
+        self.kill(stmt)
+
+    def replace(self, old, new):
+        """Put statement new in old's place, taking over its node ID and edges."""
+        assert new.num == old.num and new.graph is None, \
+            "A replacement must have the same number, and be in no graph."
+        self.nodes[old.num] = new
+        new.graph = self
+        old.graph = None
+        if self.start is old:
+            self.start = new
+        self.version += 1
+
+    def hoist(self, stmts, header, inside):
+        """
+        Move statements to run, in order, just before header.
 
-        todo = [start or self.start]
-        values = values or dict()
-        visited = visited or set()
-        backrefs = backrefs or self.get_backrefs()
-        labels = labels or self.get_labels()
+        inside(stmt) tells whether an edge into the header from stmt stays
+        (as one of a loop's back edges); see `insert_before`.
 
-        while todo:
-            curr = todo.pop()
+        """
+        entry = header
+        for stmt in stmts:
+            target = self.detach(stmt)
+            if stmt is entry:
+                entry = target
 
-            if curr in visited:
-                continue
-            visited.add(curr)
+        self.insert_before(stmts, entry, inside)
+
+    def insert_before(self, stmts, header, inside):
+        """
+        Link statements without edges to run, in order, just before header.
+
+        inside(stmt) tells whether an edge into the header from stmt stays
+        (as one of a loop's back edges); all other edges into the header are
+        moved onto the first of the statements, as is the start.
+
+        """
+        head = stmts[0]
+        for prev, edge_type in self.predecessors(header):
+            if not inside(prev):
+                prev.next[edge_type] = head
+                self.stats.count('edges_rewritten')
+        if self.start == header:
+            self.start = head
+
+        for stmt, following in zip(stmts, stmts[1:]):
+            stmt.next[LINR] = following
+        if self.linear_parent(header) is None:
+            stmts[-1].next[LINR] = header
+        else:
+            stmts[-1].next[GOTO] = header
+
+    def insert_after(self, stmt, new):
+        """Link a statement without edges to run straight after stmt."""
+        target_type, target = self.successor(stmt)
+        stmt.next[target_type] = None
+        new.next[target_type] = target
+        stmt.next[LINR] = new
 
-            # anything with a label is a goto target, so cannot safely continue
-            # propagation
-            if curr in labels:
-                values = dict()
+    @instrumented
+    def CP(self):
+        """Constant (and copy) propagation."""
 
-            if isinstance(curr, (AssignStmt, AssignOpStmt, ReturnStmt)):
-                curr.update(values)
+        ssa = SSAForm(self, self.get_blocks(), self.get_dominators())
+        sccp = ConstantPropagation(self, ssa)
+        self.stats.count('iterations', sccp.iterations)
 
-            if isinstance(curr, IfGotoStmt):
+        changed = False
+        for stmt in self.statements:
+            if stmt not in sccp.executable:
+                continue
+            values = sccp.constants(stmt)
+            copies = ssa.copies.get(stmt, {})
+
+            if isinstance(stmt, IfGotoStmt):
                 # remove IFGOTOs if their condition is a constant
-                edge_type = curr.get_next(values)
+                edge_type = stmt.get_next(values)
                 if edge_type is not None:
-                    self.remove(curr, backrefs, edge_type)
-                    if curr in labels:
-                        labels = self.get_labels()
+                    if self.can_remove(stmt, edge_type):
+                        self.remove(stmt, edge_type)
+                        self.stats.count('branches_folded')
+                        self.stats.count('statements_removed')
+                        changed = True
+                elif stmt.cond in copies:
+                    self.replace(stmt, IfGotoStmt(stmt.num, stmt.label,
+                                                  copies[stmt.cond]))
+                    self.stats.count('copies_propagated')
+                    changed = True
+
+            elif isinstance(stmt, (AssignStmt, AssignOpStmt, ReturnStmt)):
+                if stmt.update(values):
+                    self.stats.count('substitutions')
+                    changed = True
+                # a variable copied from another can be read from that
+                # instead, where it still holds the same value
+                if copies and stmt.update(dict(copies)):
+                    self.stats.count('copies_propagated')
+                    changed = True
+
+        return changed
+
+    @instrumented
+    def CSE(self):
+        """Common subexpression elimination."""
+
+        numbering = ValueNumbering(self, self.get_blocks(),
+                                   self.get_dominators())
+
+        changed = False
+        for stmt, replacement in numbering.rewrites:
+            if replacement is None:
+                if self.can_remove(stmt):
+                    self.remove(stmt)
+                    self.stats.count('statements_removed')
+                    changed = True
+                continue
 
+            self.replace(stmt, replacement)
+            if replacement.type != stmt.type:
+                self.stats.count('expressions_eliminated')
             else:
-                # continue linearly
-                if curr.next[LINR]:
-                    todo.append(curr.next[LINR])
+                self.stats.count('substitutions')
+            changed = True
+
+        return changed
+
+    @instrumented
+    def LICM(self):
+        """Loop-invariant code motion."""
+
+        blocks = self.get_blocks()
+        dominators = self.get_dominators()
+        loops = self.get_loops()
+        liveness = None  # only wanted once there is something to hoist
+
+        # hoisting rewires the edges into a loop's header, after which the
+        # analyses no longer quite hold: only conservatively (liveness can
+        # only shrink, and the new statements before the header dominate all
+        # it did) for the loops around it, which can still be hoisted from,
+        # but not for any others leaving to the header; they wait for the
+        # next run
+        touched = bytearray(len(blocks))
+        block_of = blocks.block_of
+
+        changed = False
+        for loop in reversed(loops.loops):  # innermost first
+            if any(touched[outside.num] for inside, outside
+                   in loop.exits(blocks)):
+                continue
+            if not invariant_statements(loop, blocks):
+                continue
 
-                # check jump targets; this may be unsafe
-                for edge_type in (GOTO, IFGOTO):
-                    if curr.next[edge_type]:
-                        self.CP(curr.next[edge_type], deepcopy(values), visited, backrefs, labels)
+            if liveness is None:
+                liveness = Liveness(self, blocks=blocks)
+                self.stats.count('iterations', liveness.iterations)
+            stmts = hoistable(self, loop, blocks, dominators, liveness)
+            if not stmts:
+                continue
+
+            header = loop.header.first
+            touched[loop.header.num] = 1
+            self.hoist(stmts, header,
+                       lambda stmt: block_of[stmt.num] in loop.blocks)
+            self.stats.count('statements_hoisted', len(stmts))
+            changed = True
+
+        return changed
+
+    @instrumented
+    def SR(self):
+        """Strength reduction (and elimination) of induction variables."""
+
+        blocks = self.get_blocks()
+        loops = self.get_loops()
+        liveness = None  # only wanted once there is something to reduce
+        names = None
+
+        def fresh():
+            idx = len(names)
+            while 'iv{0}'.format(idx) in names:
+                idx += 1
+            name = 'iv{0}'.format(idx)
+            names.add(name)
+            return name
+
+        def new(cls, *args):
+            self.stats.count('statements_added')
+            return self.add(cls(len(self.nodes), *args))
+
+        # transforming a loop rewires it and the edges into its header, and
+        # adds statements the analyses know nothing of: loops holding or
+        # leaving to any block so touched wait for the next run
+        touched = bytearray(len(blocks))
+        block_of = blocks.block_of
+
+        # only loops with multiplications in can have anything to reduce
+        products = bytearray(len(blocks))
+        for block in blocks:
+            products[block.num] = any(
+                getattr(stmt, 'operator', None) == '*'
+                for stmt in block.statements)
+
+        changed = False
+        for loop in reversed(loops.loops):  # innermost first
+            if not any(products[num] for num in loop.blocks):
+                continue
+            if any(touched[num] for num in loop.blocks) or \
+               any(touched[outside.num] for inside, outside
+                   in loop.exits(blocks)):
+                continue
+            ivs = InductionVariables(loop, blocks)
+            if not ivs.derived:
+                continue
+
+            if liveness is None:
+                liveness = Liveness(self, blocks=blocks)
+                self.stats.count('iterations', liveness.iterations)
+                names = set(liveness.variables.names) | self.reserved
+            exit_live = 0
+            for inside, outside in loop.exits(blocks):
+                exit_live |= liveness.live_in[outside.first]
+
+            # keep a variable equal to each multiple, stepping it alongside
+            # the basic variable
+            preheader = []
+            updates = []    # (step, statement to follow it)
+            multiples = OrderedDict()  # basic var -> (factor, multiple var)
+            for (var, factor), stmts in ivs.derived.iteritems():
+                multiple = fresh()
+                preheader.append(new(AssignOpStmt, multiple, var, '*', factor))
+                increments = {}  # step -> (operator, operand)
+                for stmt, step in ivs.basic[var]:
+                    if step not in increments:
+                        if isinstance(factor, int):
+                            increments[step] = ('+', step * factor)
+                        elif step in (1, -1):
+                            increments[step] = ('+' if step > 0 else '-',
+                                                factor)
+                        else:
+                            scaled = fresh()
+                            preheader.append(new(AssignOpStmt, scaled,
+                                                 factor, '*', step))
+                            increments[step] = ('+', scaled)
+                    operator, increment = increments[step]
+                    updates.append((stmt, new(AssignOpStmt, multiple,
+                                              multiple, operator, increment)))
+
+                for stmt in stmts:
+                    self.replace(stmt, AssignStmt(stmt.num, stmt.var, multiple))
+                    self.stats.count('multiplications_reduced')
+                if isinstance(factor, int):
+                    multiples.setdefault(var, (factor, multiple))
+
+            # a basic variable only compared (and dead after the loop) can be
+            # replaced by a multiple in its comparisons, and dropped
+            eliminated = []
+            for var, (factor, multiple) in multiples.iteritems():
+                tests = ivs.tests(var)
+                if tests is None or \
+                        exit_live & (1 << liveness.variables.index[var]):
+                    continue
+
+                for stmt in tests:
+                    op1, op2 = stmt.operands
+                    bound = op2 if op1 == var else op1
+                    if isinstance(bound, int):
+                        bound *= factor
+                    else:
+                        scaled = fresh()
+                        preheader.append(new(AssignOpStmt, scaled, bound,
+                                             '*', factor))
+                        bound = scaled
+                    operands = (multiple, bound) if op1 == var \
+                               else (bound, multiple)
+                    operator = stmt.operator if factor > 0 \
+                               else COMPARISONS[stmt.operator]
+                    self.replace(stmt, AssignOpStmt(stmt.num, stmt.var,
+                                                    operands[0], operator,
+                                                    operands[1]))
+                    self.stats.count('tests_replaced')
+                eliminated.extend(stmt for stmt, step in ivs.basic[var])
+                self.stats.count('variables_eliminated')
+
+            self.insert_before(preheader, loop.header.first,
+                               lambda stmt: block_of[stmt.num] in loop.blocks)
+            for stmt, update in updates:
+                self.insert_after(stmt, update)
+            for stmt in eliminated:
+                self.remove(stmt)
+                self.stats.count('statements_removed')
+
+            for num in loop.blocks:
+                touched[num] = 1
+            changed = True
+
+        return changed
 
     def get_labels(self):
         """Returns a map of goto targets to unique numbers."""
@@ -360,16 +848,121 @@ class CFGraph(object):
 
         return labels
 
-    def generate(self):
-        gotos = self.get_labels()
+    def layout(self):
+        """
+        Order the reachable statements for output.
+
+        Returns the order, and a map of those statements needing an explicit
+        trailing goto to its target: those whose linear successor could not
+        be placed straight after them, and all but one of any statements that
+        fall off the end of the program (the other being placed last).  A
+        branch falls off the end too, when not taken.
+
+        Jumping to the last statement runs it, so with more than one end, the
+        last must be one whose running then has no observable effect: not a
+        branch, nor a statement that could trap.  Failing any such end, the
+        order ends with an assignment of no effect made for the purpose, in
+        no graph.
 
-        # start and the start node and print linearly where possible;
+        """
+        nodes = self.nodes
+        succ = self.succ
+        linr_pred = self.linr_pred
+        seen = reachable(self)
+        placed = bytearray(len(nodes))
+        queued = bytearray(len(nodes))
+
+        # start at the start node and follow linear edges where possible,
         # sticking goto targets on the todo stack
-        todo = [self.start]
-        visited = [self.start]
+        order = []
+        todo = [self.start.num]
+        queued[self.start.num] = 1
         while todo:
-            stmt = todo.pop()
+            num = todo.pop()
+            if order and not placed[num]:
+                # place the whole chain of linear edges leading to a target,
+                # not just its tail, so that all of it falls through
+                head = num
+                pred = linr_pred[head]
+                while pred >= 0 and pred != num and seen[pred] and \
+                        not placed[pred]:
+                    head = pred
+                    pred = linr_pred[head]
+                num = head
+            while num >= 0 and not placed[num]:
+                placed[num] = 1
+                order.append(nodes[num])
+                for edge_type in (GOTO, IFGOTO):
+                    target = succ[edge_type][num]
+                    if target >= 0 and not queued[target]:
+                        queued[target] = 1
+                        todo.append(target)
+                num = succ[LINR][num]
+                if num >= 0:
+                    queued[num] = 1
+
+        # only one statement can fall off the end; the rest jump to it
+        ends = [stmt for stmt in order
+                if stmt.type != lex.RETURN and succ[LINR][stmt.num] < 0 and
+                   succ[GOTO][stmt.num] < 0]
+        final = None
+        if len(ends) == 1:
+            final = ends[0]
+        elif ends:
+            harmless = [stmt for stmt in ends
+                        if stmt.type != lex.IFGOTO and not can_trap(stmt)]
+            if harmless:
+                final = harmless[-1]
+            else:
+                names = [var for stmt in ends for var in stmt.lhs + stmt.rhs
+                         if isinstance(var, str)]
+                final = AssignStmt(-1, names[0] if names else 'x', 0)
+        if final is not None:
+            if final.graph is self:
+                order.remove(final)
+            order.append(final)
+
+        jumps = {}
+        for i, stmt in enumerate(order):
+            target = stmt.next[LINR]
+            if target is None and stmt in ends and stmt is not final:
+                target = final
+            following = order[i + 1] if i + 1 < len(order) else None
+            if target is not None and target is not following:
+                jumps[stmt] = target
+
+        return order, jumps
+
+    def count_jumps(self, order, jumps):
+        """
+        Count the jumps in the code laid out as order with the given trailing
+        jumps, and by the profile (if any) how many times they are taken.
 
+        """
+        profile = self.profile
+        static = taken = 0
+        for stmt in order:
+            for target in (stmt.next[GOTO], stmt.next[IFGOTO], jumps.get(stmt)):
+                if target is not None:
+                    static += 1
+                    if profile is not None:
+                        taken += profile.weight(stmt, target)
+        self.stats.count('jumps', static)
+        if profile is not None:
+            self.stats.count('taken_jumps', taken)
+
+    @instrumented
+    def generate(self):
+        order, jumps = self.layout()
+        self.count_jumps(order, jumps)
+
+        gotos = self.get_labels()
+        for stmt in order:
+            target = jumps.get(stmt)
+            if target is not None and target not in gotos:
+                gotos[target] = len(gotos)
+
+        for stmt in order:
             label_num = gotos.get(stmt)
             if label_num is not None:
                 yield 'L{0}:'.format(label_num)
@@ -377,34 +970,75 @@ class CFGraph(object):
             for line in stmt.generate(gotos):
                 yield line
 
-            for edge_type in (GOTO, IFGOTO, LINR):
-                target = stmt.next[edge_type]
-                if target and target not in visited:
-                    todo.append(target)
-                    visited.append(target)
+            target = jumps.get(stmt)
+            if target is not None:
+                yield '  goto L{0};'.format(gotos[target])
 
-    def dotfile(self, fileobj):
-        """Write to fileobj a .dot (GraphViz) representation of the graph."""
+    def dotfile(self, fileobj, blocks=False, max_nodes=None):
+        """
+        Write to fileobj a .dot (GraphViz) representation of the graph.
 
-        fileobj.write('digraph CFGraph {\n')
+        With blocks, the nodes are basic blocks rather than statements.  With
+        max_nodes, only the first so many in reverse postorder (the nearest
+        the start) are drawn; edges to the rest lead to a single node counting
+        them.  Lines are written as they are formatted.
 
-        # declare all the nodes (typically staements)
-        fileobj.write('    start;\n')
-        for stmt in self.statements:
-            if stmt.type not in (lex.REFLABEL, lex.GOTO):
-                fileobj.write('    s{0} [label="{1}"] [shape="box"];\n'
-                              .format(stmt.num, stmt.stmt))
+        """
+        write = fileobj.write
+        hidden = (lex.REFLABEL, lex.GOTO)
+        if blocks:
+            block_graph = self.get_blocks()
+            nodes = [block for block in block_graph
+                     if any(stmt.type not in hidden
+                            for stmt in block.statements)]
+            entry = block_graph.entry
+            name = 'b{0}'.format
+            label = lambda block: ''.join(stmt.stmt + '\\l'
+                                          for stmt in block.statements
+                                          if stmt.type not in hidden)
+            targets = lambda block: block.succs
+        else:
+            if max_nodes is None:
+                nodes = self.statements
+            else:
+                nodes = reverse_postorder(self)
+            nodes = [stmt for stmt in nodes if stmt.type not in hidden]
+            entry = self.start
+            name = 's{0}'.format
+            label = lambda stmt: stmt.stmt
+            targets = self.successors
+
+        omitted = 0
+        if max_nodes is not None and len(nodes) > max_nodes:
+            omitted = len(nodes) - max_nodes
+            nodes = nodes[:max_nodes]
+        drawn = set(node.num for node in nodes)
+
+        write('digraph CFGraph {\n')
+
+        # declare all the nodes (typically statements)
+        write('    start;\n')
+        for node in nodes:
+            write('    {0} [label="{1}"] [shape="box"];\n'
+                  .format(name(node.num), label(node)))
+        if omitted:
+            write('    more [label="{0} more"] [shape="plaintext"];\n'
+                  .format(omitted))
 
         # declare all the edges
-        fileobj.write('    start -> s{0};\n'.format(self.start.num))
-        for stmt in self.statements:
-            for edge_type in (LINR, GOTO, IFGOTO):
-                target = stmt.next[edge_type]
-                if target:
-                    fileobj.write('    s{0} -> s{1};\n'
-                                  .format(stmt.num, target.num))
-
-        fileobj.write('}\n')
+        if entry is not None:
+            write('    start -> {0};\n'.format(name(entry.num)))
+        for node in nodes:
+            more = False  # one edge to the left-out nodes is enough
+            for target in targets(node):
+                if not omitted or target.num in drawn:
+                    write('    {0} -> {1};\n'.format(name(node.num),
+                                                    name(target.num)))
+                elif not more:
+                    write('    {0} -> more;\n'.format(name(node.num)))
+                    more = True
+
+        write('}\n')
 
     def __repr__(self):
         return '\n'.join([repr(stmt) for stmt in self.statements])
@@ -0,0 +1,242 @@
+from graph.blocks import BlockGraph
+from graph.statement import RegionStmt
+
+def uses(stmt):
+    """The variables read by stmt."""
+    return [var for var in stmt.rhs if isinstance(var, str)]
+
+def defs(stmt):
+    """The variables written by stmt."""
+    return stmt.lhs
+
+class VariableIndex(object):
+    """
+    Interns variable names, giving each a dense index.
+
+    A set of variables is then a single integer, bit `i` standing for the
+    variable with index `i`.
+
+    """
+    def __init__(self, graph=None):
+        self.index = {}
+        self.names = []
+        if graph is not None:
+            for stmt in graph.statements:
+                self.mask(defs(stmt))
+                self.mask(uses(stmt))
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, name):
+        idx = self.index.get(name)
+        if idx is None:
+            idx = self.index[name] = len(self.names)
+            self.names.append(name)
+        return idx
+
+    def mask(self, names):
+        """The bitmask of an iterable of names; interning any new ones."""
+        mask = 0
+        for name in names:
+            mask |= 1 << self.intern(name)
+        return mask
+
+    def unmask(self, mask):
+        """The set of names whose bits are set in mask."""
+        names = set()
+        idx = 0
+        while mask:
+            if mask & 1:
+                names.add(self.names[idx])
+            mask >>= 1
+            idx += 1
+        return names
+
+class BitVectorProblem(object):
+    """
+    A gen/kill dataflow problem over bitmasks, solved to a fixpoint.
+
+    Subclasses set `forward` and implement `transfer_sets`, returning the
+    (gen, kill) masks of a statement.  The meet is union.  After construction
+    `before[stmt]` and `after[stmt]` hold the masks on entry to and exit from
+    each statement (in program order, whatever the direction).
+
+    The transfer functions of each basic block's statements are composed
+    into one for the block, and only blocks go on the worklist; the facts of
+    the statements within are filled in once the blocks settle.  The
+    worklist is seeded in reverse postorder for forward problems and in
+    postorder for backward ones, so on reducible graphs most blocks settle
+    on their first visit.
+
+    """
+    forward = True
+
+    def __init__(self, graph, blocks=None):
+        self.graph = graph
+        self.blocks = blocks if blocks is not None else BlockGraph(graph)
+        self.iterations = 0
+
+        self.solve()
+
+    def transfer_sets(self, stmt):
+        raise NotImplementedError
+
+    def solve(self):
+        forward = self.forward
+        blocks = self.blocks.blocks
+
+        # summarise each block by composing its statements' (gen, keep)
+        # pairs in the direction of the analysis
+        local = []
+        gen = []
+        keep = []
+        for block in blocks:
+            sets = []
+            for stmt in block.statements:
+                g, k = self.transfer_sets(stmt)
+                sets.append((g, ~k))
+            local.append(sets)
+
+            block_gen, block_keep = 0, -1
+            for g, k in (sets if forward else reversed(sets)):
+                block_gen = g | (block_gen & k)
+                block_keep &= k
+            gen.append(block_gen)
+            keep.append(block_keep)
+
+        # `sources` are the blocks whose facts meet into a block, `sinks`
+        # those depending on it
+        succs = [[succ.num for succ in block.succs] for block in blocks]
+        preds = [[pred.num for pred in block.preds] for block in blocks]
+        sources, sinks = (preds, succs) if forward else (succs, preds)
+
+        meet = [0] * len(blocks)
+        result = [0] * len(blocks)
+
+        todo = range(len(blocks))  # popped from the end
+        if forward:
+            todo.reverse()
+        queued = [True] * len(blocks)
+        while todo:
+            i = todo.pop()
+            queued[i] = False
+            self.iterations += 1
+
+            m = 0
+            for j in sources[i]:
+                m |= result[j]
+            meet[i] = m
+
+            r = gen[i] | (m & keep[i])
+            if r != result[i]:
+                result[i] = r
+                for j in sinks[i]:
+                    if not queued[j]:
+                        queued[j] = True
+                        todo.append(j)
+
+        # run the settled facts through each block's statements
+        self.before = before = {}
+        self.after = after = {}
+        for block, sets in zip(blocks, local):
+            fact = meet[block.num]
+            if forward:
+                for stmt, (g, k) in zip(block.statements, sets):
+                    before[stmt] = fact
+                    fact = g | (fact & k)
+                    after[stmt] = fact
+            else:
+                for stmt, (g, k) in reversed(zip(block.statements, sets)):
+                    after[stmt] = fact
+                    fact = g | (fact & k)
+                    before[stmt] = fact
+
+class Liveness(BitVectorProblem):
+    """
+    Live variable analysis.
+
+    `live_in[stmt]` and `live_out[stmt]` are bitmasks over `self.variables`.
+
+    """
+    forward = False
+
+    def __init__(self, graph, variables=None, blocks=None):
+        self.variables = variables or VariableIndex(graph)
+        super(Liveness, self).__init__(graph, blocks)
+        self.live_in = self.before
+        self.live_out = self.after
+
+    def transfer_sets(self, stmt):
+        if isinstance(stmt, RegionStmt):
+            # what a region may assign it may also leave as it was, so that
+            # stays live through it
+            return self.variables.mask(stmt.reads), 0
+        return self.variables.mask(uses(stmt)), self.variables.mask(defs(stmt))
+
+    def is_dead(self, stmt):
+        """True if stmt assigns only to variables that are not live after it."""
+        kill = self.variables.mask(defs(stmt))
+        return bool(kill) and not (kill & self.live_out[stmt])
+
+    def live_out_names(self, stmt):
+        return self.variables.unmask(self.live_out[stmt])
+
+class ReachingDefinitions(BitVectorProblem):
+    """
+    Reaching definitions analysis.
+
+    Every assigning statement is a definition with a dense index into
+    `self.definitions`; `reach_in[stmt]` and `reach_out[stmt]` are bitmasks
+    over those indices.
+
+    """
+    forward = True
+
+    def __init__(self, graph, variables=None, blocks=None):
+        self.variables = variables or VariableIndex(graph)
+
+        self.definitions = []
+        self.def_index = {}
+        self.var_defs = [0] * len(self.variables)  # variable idx -> defs mask
+        for stmt in graph.statements:
+            if not defs(stmt):
+                continue
+            idx = self.def_index[stmt] = len(self.definitions)
+            self.definitions.append(stmt)
+            for name in defs(stmt):
+                var = self.variables.intern(name)
+                if var >= len(self.var_defs):
+                    self.var_defs.extend([0] * (var + 1 - len(self.var_defs)))
+                self.var_defs[var] |= 1 << idx
+
+        super(ReachingDefinitions, self).__init__(graph, blocks)
+        self.reach_in = self.before
+        self.reach_out = self.after
+
+    def transfer_sets(self, stmt):
+        idx = self.def_index.get(stmt)
+        if idx is None:
+            return 0, 0
+        kill = 0
+        for name in defs(stmt):
+            kill |= self.var_defs[self.variables.index[name]]
+        return 1 << idx, kill
+
+    def reaching(self, stmt, name=None):
+        """The definitions reaching the entry of stmt; optionally only of name."""
+        mask = self.reach_in.get(stmt, 0)
+        if name is not None:
+            var = self.variables.index.get(name)
+            if var is None or var >= len(self.var_defs):
+                return []
+            mask &= self.var_defs[var]
+
+        found = []
+        idx = 0
+        while mask:
+            if mask & 1:
+                found.append(self.definitions[idx])
+            mask >>= 1
+            idx += 1
+        return found
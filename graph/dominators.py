@@ -0,0 +1,250 @@
+"""
+Dominators and natural loops, over the basic blocks of a graph.
+
+Dominators are found with the iterative algorithm of Cooper, Harvey and
+Kennedy ("A Simple, Fast Dominance Algorithm"), which needs nothing but the
+blocks' reverse postorder numbering to converge in a couple of passes on
+the graphs programs produce.  Natural loops are then read off the back
+edges: those whose target dominates their source.
+
+"""
+from array import array
+
+class DominatorTree(object):
+    """
+    The dominator tree of a BlockGraph.
+
+    Only blocks reachable from the entry take part; `idom[num]` is the
+    number of the immediate dominator of block `num`, the entry being its
+    own, and -1 for unreachable blocks.
+
+    """
+    def __init__(self, blocks):
+        self.blocks = blocks
+        self.iterations = 0
+
+        size = len(blocks)
+        self.idom = idom = array('i', [-1]) * size
+        self.children = [[] for i in xrange(size)]
+        self.pre = array('i', [-1]) * size
+        self.post = array('i', [-1]) * size
+
+        entry = blocks.entry
+        if entry is None:
+            return
+
+        # blocks are numbered in reverse postorder, so a block's dominators
+        # all have lower numbers than it does
+        reachable = bytearray(size)
+        reachable[entry.num] = 1
+        stack = [entry]
+        while stack:
+            for succ in stack.pop().succs:
+                if not reachable[succ.num]:
+                    reachable[succ.num] = 1
+                    stack.append(succ)
+        order = [block for block in blocks.blocks
+                 if reachable[block.num] and block is not entry]
+
+        def intersect(a, b):
+            while a != b:
+                while a > b:
+                    a = idom[a]
+                while b > a:
+                    b = idom[b]
+            return a
+
+        idom[entry.num] = entry.num
+        changed = True
+        while changed:
+            changed = False
+            self.iterations += 1
+            for block in order:
+                new = -1
+                for pred in block.preds:
+                    if idom[pred.num] < 0:
+                        continue
+                    new = pred.num if new < 0 else intersect(pred.num, new)
+                if idom[block.num] != new:
+                    idom[block.num] = new
+                    changed = True
+
+        for block in order:
+            self.children[idom[block.num]].append(blocks.blocks[block.num])
+
+        # number the tree in pre- and postorder, so dominance is an O(1) test
+        # of one block's interval containing another's
+        counter = 0
+        stack = [(entry, 0)]
+        while stack:
+            block, child = stack.pop()
+            if child == 0:
+                self.pre[block.num] = counter
+                counter += 1
+            children = self.children[block.num]
+            if child < len(children):
+                stack.append((block, child + 1))
+                stack.append((children[child], 0))
+            else:
+                self.post[block.num] = counter
+                counter += 1
+
+    def immediate(self, block):
+        """The immediate dominator of block; None for the entry (or unreachable)."""
+        num = self.idom[block.num]
+        return self.blocks.blocks[num] if num >= 0 and num != block.num \
+               else None
+
+    def dominates(self, a, b):
+        """True if block a dominates block b (every block dominates itself)."""
+        if self.pre[a.num] < 0 or self.pre[b.num] < 0:
+            return False
+        return self.pre[a.num] <= self.pre[b.num] and \
+               self.post[b.num] <= self.post[a.num]
+
+    def frontiers(self):
+        """
+        The dominance frontier of every block, as lists of block numbers.
+
+        A block's frontier holds the joins just past its dominance: the
+        blocks it does not strictly dominate, but which have a predecessor it
+        dominates.  Each join is found by walking up the tree from each of
+        its predecessors to its immediate dominator.  The entry is a join
+        too if anything jumps back to it, as it is also entered at the start.
+
+        """
+        idom = self.idom
+        entry = self.blocks.entry
+        frontiers = [[] for i in xrange(len(idom))]
+        for block in self.blocks:
+            if idom[block.num] < 0:
+                continue
+            preds = [pred.num for pred in block.preds if idom[pred.num] >= 0]
+            if block is entry:
+                stop = -1  # above the root of the tree
+            elif len(preds) > 1:
+                stop = idom[block.num]
+            else:
+                continue
+            for runner in preds:
+                while runner != stop:
+                    frontier = frontiers[runner]
+                    if frontier and frontier[-1] == block.num:
+                        break  # walked on from here for block already
+                    frontier.append(block.num)
+                    if runner == entry.num:
+                        break
+                    runner = idom[runner]
+        return frontiers
+
+    def stmt_dominates(self, a, b):
+        """True if statement a dominates statement b."""
+        blocks = self.blocks
+        block_a = blocks.block_of[a.num]
+        block_b = blocks.block_of[b.num]
+        if block_a < 0 or block_b < 0:
+            return False
+        if block_a == block_b:
+            return self.pre[block_a] >= 0 and \
+                   blocks.position[a.num] <= blocks.position[b.num]
+        return self.dominates(blocks.blocks[block_a], blocks.blocks[block_b])
+
+class Loop(object):
+    """
+    A natural loop: a header block, and the blocks which reach one of its
+    latches (the sources of its back edges) without passing through it.
+
+    """
+    __slots__ = ('header', 'blocks', 'latches', 'parent', 'children', 'depth')
+
+    def __init__(self, header, blocks, latches):
+        self.header = header
+        self.blocks = blocks    # set of block numbers
+        self.latches = latches  # list of blocks
+        self.parent = None
+        self.children = []
+        self.depth = 1
+
+    def __contains__(self, block):
+        return block.num in self.blocks
+
+    def exits(self, block_graph):
+        """The (inside, outside) block pairs of the edges leaving the loop."""
+        edges = []
+        for num in sorted(self.blocks):
+            block = block_graph.blocks[num]
+            edges.extend((block, succ) for succ in block.succs
+                         if succ.num not in self.blocks)
+        return edges
+
+    def __repr__(self):
+        return '<Loop header #{0} | {1} blocks | depth {2} >'.format(
+            self.header.num, len(self.blocks), self.depth)
+
+class LoopNest(object):
+    """
+    The natural loops of a graph, with their nesting.
+
+    Loops sharing a header are merged into one.  `loops` lists them outermost
+    first, and `loop_of[num]` is the index in `loops` of the innermost loop
+    holding block `num`, or -1.
+
+    """
+    def __init__(self, dominators):
+        self.dominators = dominators
+        self.blocks = blocks = dominators.blocks
+        self.loops = []
+        self.loop_of = array('i', [-1]) * len(blocks)
+
+        latches = {}  # header number -> latch blocks
+        for block in blocks:
+            for succ in block.succs:
+                if dominators.dominates(succ, block):
+                    latches.setdefault(succ.num, []).append(block)
+
+        found = []
+        for header_num in sorted(latches):
+            header = blocks.blocks[header_num]
+            body = set([header_num])
+            stack = [latch for latch in latches[header_num]
+                     if latch.num not in body]
+            body.update(latch.num for latch in stack)
+            while stack:
+                for pred in stack.pop().preds:
+                    if pred.num not in body and dominators.pre[pred.num] >= 0:
+                        body.add(pred.num)
+                        stack.append(pred)
+            found.append(Loop(header, body, latches[header_num]))
+
+        # outer loops are strictly bigger than those they contain, so going
+        # from biggest to smallest each loop's parent is the innermost loop
+        # yet seen to hold its header
+        found.sort(key=lambda loop: (-len(loop.blocks), loop.header.num))
+        for loop in found:
+            parent = self.loop_of[loop.header.num]
+            if parent >= 0:
+                loop.parent = self.loops[parent]
+                loop.parent.children.append(loop)
+                loop.depth = loop.parent.depth + 1
+
+            idx = len(self.loops)
+            self.loops.append(loop)
+            for num in loop.blocks:
+                self.loop_of[num] = idx
+
+    def __len__(self):
+        return len(self.loops)
+
+    def __iter__(self):
+        return iter(self.loops)
+
+    def innermost(self, stmt):
+        """The innermost loop holding statement stmt, or None."""
+        num = self.blocks.block_of[stmt.num]
+        idx = self.loop_of[num] if num >= 0 else -1
+        return self.loops[idx] if idx >= 0 else None
+
+    def depth(self, stmt):
+        """The loop nesting depth of statement stmt (0 outside any loop)."""
+        loop = self.innermost(stmt)
+        return loop.depth if loop is not None else 0
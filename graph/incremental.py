@@ -0,0 +1,746 @@
+"""
+Compiling a program again as it is edited, redoing only what an edit affects.
+
+The program is cut into regions: runs of whole statements which no jump
+enters or leaves, so that control only enters a region at its start and
+only leaves it by falling off its end (or returning).  Regions nest: the
+statements of a loop can hold regions of their own, which no jump crosses
+but the loop's.  Each region is optimised as a graph of its own, in which
+the regions directly within it stand as RegionStmts (reading and assigning
+whatever their source does, but otherwise opaque), and which ends in an
+ExitStmt reading the variables live after it; its code, with the code of
+the regions within spliced in where their RegionStmts were, is then the
+region's.  A RegionStmt stands for a whole run of regions within with
+nothing between, and leaves out the variables nothing but the run
+mentions; so a graph stays about as big as the region's own source.
+
+So these facts are what flows between regions: the constants on entry to
+each, and the variables live after it.  For the outermost regions, which
+follow one another, constants flow forwards (found by SCCP over each
+region's graph) and liveness backwards (over each region's optimised
+code); a region within another takes both from the optimised graph of the
+one around it.  A region's code is kept keyed by its facts and its own
+source, which has the regions within it only as the variables they read
+and assign.  So after an edit only the regions edited are compiled again,
+those around them whose regions' variables the edit changed (unless the
+code kept for them still serves, as when the variable is new to them), and
+those the facts they produce changed for; facts stop flowing on as soon as
+they stop changing, which is usually at the next region along.
+
+A region runs between two cuts crossed by the same jumps (as told by
+hashing the set of them), no jump then entering or leaving it.  The places
+those jumps allow a cut are each taken with a chance growing with the
+statements since the last such place, and decided by hashing the text of
+the statement there, so that regions run to about REGION_STATEMENTS
+statements; and as that depends on nothing but the code nearby, an edit
+can only move the cuts next to it.  The source is split into statements at
+their semicolons, and only those from the first to the last changed since
+the previous version are parsed again.
+
+Nothing but constants and liveness crosses between regions (CSE cannot
+reuse an expression computed in the region before, say, and constants a
+region within another leaves are not known after it), so the code can be a
+little worse than that of compiling the program whole; which is what this
+comes to for a program with nowhere to cut.
+
+"""
+import random
+import re
+import zlib
+from collections import namedtuple
+from timeit import default_timer as clock
+
+from graph import JumpSyntaxError
+from graph.cfg import CFGraph
+from graph.dataflow import defs, uses, Liveness
+from graph.parser import parse
+from graph.passes import PassManager, get_pipeline
+from graph.sccp import ConstantPropagation
+from graph.statement import ExitStmt, GotoStmt, IfGotoStmt, LabelStmt
+from graph.statement import RegionStmt
+from graph.stats import Stats
+from graph.traversal import reachable
+
+REGION_STATEMENTS = 128  # the average length of a region, where jumps allow
+
+LABEL_RE = re.compile(r'\bL(\d+)')  # the labels of generated code
+
+# what a region's source says of its end, given the constants on entry to it:
+# the constants its variables then hold, and whether control gets there
+Analysis = namedtuple('Analysis', 'constants falls_through')
+
+# a region optimised: its generated lines (with labels from L0, and a line
+# `#i` where the code of the region within it numbered i goes) and how many
+# labels they use, the variables live on entry to it, how the optimiser
+# went, for each region within it the (constants, live out) it is to be
+# compiled with (or None if its code is gone), and the variables its code
+# assigns which its source does not
+Compilation = namedtuple('Compilation', 'lines labels live_in converged '
+                                        'iterations within added')
+
+# the outcome of compiling a version of a program: its generated lines, the
+# number of regions it was cut into and how many of them had to be
+# optimised, the (first, last) source lines of each stretch of those,
+# whether all the code came from converged optimisations, and the time taken
+Update = namedtuple('Update',
+                    'lines regions recompiled compiled converged time')
+
+class Span(object):
+    """Where a region is in a version of the program: chunks lo to hi."""
+    __slots__ = ('lo', 'hi', 'within', 'region')
+
+    def __init__(self, lo, hi):
+        self.lo = lo
+        self.hi = hi
+        self.within = []  # the spans directly within it, in order
+        self.region = None
+
+class Region(object):
+    """
+    A region's own source, and the analyses and compilations of it kept.
+
+    `pieces` are the source before, between and after the regions within
+    it, and `within` the summaries of those.  `read` and `assigned` are the
+    sets of variables it reads and assigns, and `variables` both: all that
+    the constants it starts with can matter for.
+
+    `basis` is the region with the same pieces in the version before, if
+    any, the regions within which may have had other variables; as what
+    was worked out for it can serve this one too, if those are variables
+    its code never touches, or keeps live anyway.
+
+    """
+    def __init__(self, pieces, within, basis=None):
+        self.pieces = pieces
+        self.within = within
+        self.basis = basis
+        read = set()
+        assigned = set()
+        self.size = 0  # its own statements
+        for piece in pieces:
+            statements = parse(piece) if piece else []
+            self.size += len(statements)
+            for stmt in statements:
+                read.update(uses(stmt))
+                assigned.update(defs(stmt))
+        self.own = frozenset(read | assigned)  # its own statements' variables
+        for inner_read, inner_assigned in within:
+            read |= inner_read
+            assigned |= inner_assigned
+        self.read = frozenset(read)
+        self.assigned = frozenset(assigned)
+        self.variables = self.read | self.assigned
+
+        self.analyses = {}      # constants -> Analysis
+        self.compilations = {}  # (constants, live out) -> Compilation
+        self.used = set()       # the keys of both used by this update
+        self.used_before = set()  # and by the last update using the region
+        self.relabelled = None  # (compilation, first label, lines) last made
+
+    @property
+    def summary(self):
+        """What the region stands as in the graph of the one around it."""
+        return self.read, self.assigned
+
+    def graph(self, constants, live_out, stats):
+        """
+        The region's graph, started with constants (a frozenset of items)
+        and ended reading live_out, unless that is None.
+
+        Each run of regions within with nothing between stands as one
+        RegionStmt, as they would be no more use to the passes apart; and
+        with only the variables that something else in the graph mentions
+        too, the rest being the run's alone (which the graph then reserves).
+
+        """
+        statements = []
+        runs = []  # the indices of the regions within, by run
+        for i, piece in enumerate(self.pieces):
+            if i:
+                if i == 1 or self.pieces[i - 1]:
+                    statements.append(len(runs))  # (its place, for now)
+                    runs.append([i - 1])
+                else:
+                    runs[-1].append(i - 1)
+            if piece:
+                statements.extend(parse(piece))
+
+        seen = set(self.own)
+        if live_out is not None:
+            seen.update(live_out)
+        shared = set(seen)
+        summaries = [self.run_summary(run) for run in runs]
+        for read, assigned in summaries:
+            variables = read | assigned
+            shared |= variables & seen
+            seen |= variables
+
+        for num, stmt in enumerate(statements):
+            if isinstance(stmt, int):
+                read, assigned = summaries[stmt]
+                stmt = statements[num] = RegionStmt(
+                    num, runs[stmt], read & shared, assigned & shared)
+            stmt.num = num
+        if live_out is not None:
+            statements.append(ExitStmt(len(statements), sorted(live_out)))
+        graph = CFGraph(statements, stats)
+        graph.entry_constants = dict(constants)
+        graph.reserved = seen - shared
+        return graph
+
+    def run_summary(self, indices):
+        """The variables a run of regions within read, and those assigned."""
+        read = set()
+        assigned = set()
+        for index in indices:
+            read |= self.within[index][0]
+            assigned |= self.within[index][1]
+        return read, assigned
+
+    def analyse(self, constants, propagate, stats):
+        """The Analysis of the region, entered with constants."""
+        self.used.add(constants)
+        analysis = self.analyses.get(constants)
+        if analysis is None and self.basis is not None and \
+                self.assigns_untouched():
+            # what the regions within now also assign is not known after
+            # them, and so not after this region, as ever
+            analysis = self.basis.analyses.get(self.basis.narrow(constants))
+            if analysis is not None:
+                self.analyses[constants] = analysis
+        if analysis is None:
+            # (the variables only regions within assign are not known after
+            # them, so need not be asked about)
+            graph = self.graph(constants, self.assigned & self.own, stats)
+            end = graph.nodes[-1]
+            if propagate:
+                sccp = ConstantPropagation(graph)
+                analysis = Analysis(sccp.constants(end),
+                                    end in sccp.executable)
+            else:
+                analysis = Analysis({}, bool(reachable(graph)[end.num]))
+            self.analyses[constants] = analysis
+        return analysis
+
+    def compile(self, constants, live_out, level, max_iterations, stats):
+        """
+        Return the region's Compilation, entered with constants and with
+        live_out live after it (None if nothing follows), and whether it was
+        compiled now.
+
+        Of live_out, only the variables the region mentions matter, bar that
+        those it adds must not take the name of any; so only those key its
+        compilations, unless one then clashes.
+
+        """
+        mentioned = live_out & self.variables if live_out is not None \
+                    else None
+        key = (constants, mentioned)
+        compilation = self.compilations.get(key)
+        if compilation is not None and live_out and \
+                not compilation.added.isdisjoint(live_out):
+            key = (constants, live_out)
+            compilation = self.compilations.get(key)
+        if compilation is None and self.basis is not None:
+            compilation = self.adapt(constants, live_out)
+            if compilation is not None:
+                if live_out and not compilation.added.isdisjoint(live_out):
+                    key = (constants, live_out)
+                self.compilations[key] = compilation
+        self.used.add(key)
+        if compilation is not None:
+            return compilation, False
+
+        graph = self.graph(constants, key[1], stats)
+        manager = PassManager(graph, level, max_iterations)
+        converged = manager.run()
+        lines = list(graph.generate())
+
+        labels = 0
+        for line in lines:
+            for match in LABEL_RE.finditer(line):
+                labels = max(labels, int(match.group(1)) + 1)
+        blocks = graph.get_blocks()
+        liveness = Liveness(graph, blocks=blocks)
+        live_in = set(liveness.variables.unmask(
+            liveness.live_in[graph.start]))
+
+        # the facts each region within starts from, as the optimised code
+        # around it has them
+        within = [None] * len(self.within)
+        seen = reachable(graph)
+        added = set()
+        for stmt in graph.nodes:
+            if seen[stmt.num]:
+                added.update(defs(stmt))
+        boxes = [stmt for stmt in graph.nodes
+                 if isinstance(stmt, RegionStmt) and seen[stmt.num]]
+        if boxes:
+            sccp = ConstantPropagation(graph) \
+                   if 'CP' in get_pipeline(level) else None
+            idle = self.idle_loops(graph, boxes)
+            for box in boxes:
+                entry = sccp.constants(box) \
+                        if sccp is not None and box in sccp.executable \
+                        else {}
+                out = frozenset(liveness.live_out_names(box)) \
+                      if graph.successors(box) else None
+
+                # the variables of a run's own, left out of its RegionStmt,
+                # are untouched but by it: so they hold what they did on
+                # entry, until it assigns them, and are only live after it
+                # if it may run again
+                read, assigned = self.run_summary(box.indices)
+                alone = graph.reserved & (read | assigned)
+                again = reachable(graph, graph.successors(box))[box.num]
+                live_in |= alone & read
+                if sccp is not None and box in sccp.executable:
+                    entry.update((var, value) for var, value in constants
+                                 if var in alone and
+                                 not (again and var in assigned))
+                if again:
+                    out |= alone & read
+
+                # and through a run of them, as through so many RegionStmts
+                entries = []
+                for index in box.indices:
+                    read, assigned = self.within[index]
+                    entries.append(frozenset(
+                        item for item in entry.iteritems()
+                        if item[0] in read or item[0] in assigned))
+                    for var in assigned:
+                        entry.pop(var, None)
+                for index in reversed(box.indices):
+                    read, assigned = self.within[index]
+                    if box in idle:
+                        # a loop of nothing but regions within, which code
+                        # that keeps nothing of theirs cannot express (as
+                        # DCE keeps such statements); so keep what they
+                        # assign
+                        within[index] = (entries.pop(), out | assigned)
+                    else:
+                        within[index] = (entries.pop(), out)
+                    out = read | (out or frozenset())
+
+        compilation = self.compilations[key] = Compilation(
+            lines, labels, frozenset(live_in), converged, manager.iterations,
+            tuple(within), frozenset(added - self.variables))
+        return compilation, True
+
+    def idle_loops(self, graph, boxes):
+        """The boxes (RegionStmts) of graph on loops through boxes alone."""
+        idle = set()
+        for box in boxes:
+            seen = set()
+            stack = [box]
+            while stack and box not in idle:
+                for succ in graph.successors(stack.pop()):
+                    if succ is box:
+                        idle.add(box)
+                    elif isinstance(succ, RegionStmt) and succ not in seen:
+                        seen.add(succ)
+                        stack.append(succ)
+        return idle
+
+    def narrow(self, constants):
+        """Those of constants which the region's variables can matter for."""
+        return frozenset(item for item in constants
+                         if item[0] in self.variables)
+
+    def assigns_untouched(self):
+        """
+        Whether the regions within only assign more than they did in the
+        basis of variables that the basis never touches.
+
+        """
+        for (read, assigned), (old_read, old_assigned) in \
+                zip(self.within, self.basis.within):
+            if not (assigned - old_assigned).isdisjoint(self.basis.variables):
+                return False
+        return True
+
+    def adapt(self, constants, live_out):
+        """
+        A compilation of the basis, with the same facts, which serves as one
+        of this region; or None.
+
+        It does if each region within which now reads a variable more either
+        has it live after it anyway, or has it passed to it untouched from
+        the start; and if each which now assigns a variable more assigns one
+        the basis never touches, which nothing after it reads.  The first
+        sort are then live on entry, too.
+
+        """
+        basis = self.basis
+        old = basis.variables
+        mentioned = live_out & old if live_out is not None else None
+        constants = basis.narrow(constants)
+        compilation = basis.compilations.get((constants, mentioned))
+        if compilation is not None and live_out and \
+                not compilation.added.isdisjoint(live_out):
+            compilation = basis.compilations.get((constants, live_out))
+        if compilation is None:
+            return None
+
+        untouched = set()  # read more, from the start
+        for i, ((read, assigned), (old_read, old_assigned)) in \
+                enumerate(zip(self.within, basis.within)):
+            facts = compilation.within[i]
+            if facts is None:
+                continue  # its code is gone
+            out = facts[1] or frozenset()
+            for var in read - old_read:
+                # (a region within which is a loop of nothing else is told
+                # what it assigns is live after it, whether or not it is)
+                if var in out and var not in old_assigned:
+                    continue
+                if var in old or var in compilation.added:
+                    return None
+                untouched.add(var)
+            for var in assigned - old_assigned:
+                if var in old or var in compilation.added or \
+                        live_out is not None and var in live_out or \
+                        any(var in other[0]
+                            for j, other in enumerate(self.within) if j != i):
+                    return None
+        return compilation._replace(live_in=compilation.live_in | untouched)
+
+    def lines(self, compilation, first):
+        """The lines of a compilation of the region, with labels from first."""
+        if not first:
+            return compilation.lines
+        if self.relabelled is None or \
+                self.relabelled[0] is not compilation or \
+                self.relabelled[1] != first:
+            relabel = lambda match: 'L{0}'.format(int(match.group(1)) + first)
+            self.relabelled = (compilation, first,
+                               [LABEL_RE.sub(relabel, line)
+                                if 'L' in line else line
+                                for line in compilation.lines])
+        return self.relabelled[2]
+
+    def prune(self):
+        """
+        Forget the analyses and compilations used by neither this update nor
+        the last one using the region (so that undoing an edit is quick).
+
+        """
+        used = self.used | self.used_before
+        for cache in (self.analyses, self.compilations):
+            for key in cache.keys():
+                if key not in used:
+                    del cache[key]
+        self.used_before = self.used
+        self.used = set()
+        self.basis = None
+
+class IncrementalCompiler(object):
+    """
+    Compiles successive versions of a program, reusing what it can of the
+    compilation of each for the next.
+
+    """
+    def __init__(self, level='O2', max_iterations=None, stats=None):
+        self.level = level
+        self.propagate = 'CP' in get_pipeline(level)
+        self.max_iterations = max_iterations
+        self.stats = stats if stats is not None else Stats()
+
+        self.chunks = []   # the source split at semicolons
+        # the (label, jump target, draw) of each chunk's statement, its draw
+        # being its text's hash modulo REGION_STATEMENTS
+        self.jumps = []
+        self.regions = {}  # (pieces, within) -> Region
+        self.previous = {}  # those of the version before
+        self.bases = {}    # pieces -> a Region of this version with them
+
+    def split(self, text):
+        """
+        Split text into the source of each statement, returning them and the
+        (label, jump target, draw) of each; reparsing only those changed.
+
+        """
+        chunks = text.split(';')
+        if chunks.pop().strip() or not chunks:
+            # either a statement missing its semicolon, or no statement at
+            # all; have the parser (or the graph) say which
+            parse(text)
+            CFGraph([])
+
+        old = self.chunks
+        size = min(len(old), len(chunks))
+        lo = 0
+        while lo < size and old[lo] == chunks[lo]:
+            lo += 1
+        hi = 0
+        while hi < size - lo and old[-1 - hi] == chunks[-1 - hi]:
+            hi += 1
+
+        changed = chunks[lo:len(chunks) - hi]
+        try:
+            statements = parse(';'.join(changed) + ';') if changed else []
+        except JumpSyntaxError:
+            parse(text)  # to report the error where it is in the whole
+            raise
+
+        jumps = []
+        label = None
+        for stmt in statements:
+            if isinstance(stmt, LabelStmt):
+                label = stmt.name
+                continue
+            target = stmt.label if isinstance(stmt, (GotoStmt, IfGotoStmt)) \
+                     else None
+            draw = zlib.crc32(changed[len(jumps)]) % REGION_STATEMENTS
+            jumps.append((label, target, draw))
+            label = None
+        assert len(jumps) == len(changed)
+        self.stats.count('statements_parsed', len(jumps))
+
+        return chunks, self.jumps[:lo] + jumps + self.jumps[len(old) - hi:]
+
+    def cut(self, jumps):
+        """
+        Return the Spans of the outermost regions, in order, with those
+        within them.
+
+        """
+        labels = {}
+        for i, (label, target, draw) in enumerate(jumps):
+            if label is not None:
+                labels[label] = i
+
+        # crossing[i] is the XOR of random numbers for the jumps starting to
+        # cross the cut before chunk i and those no longer crossing it; so
+        # XORing them up gives a hash of the set of jumps crossing each cut
+        crossing = [0] * (len(jumps) + 1)
+        bits = random.Random(0).getrandbits
+        for i, (label, target, draw) in enumerate(jumps):
+            if target is not None:
+                j = labels.get(target, i)  # (a missing label fails later)
+                if i != j:
+                    tag = bits(64)
+                    crossing[min(i, j) + 1] ^= tag
+                    crossing[max(i, j) + 1] ^= tag
+
+        # a region runs between two cuts crossed by the same jumps; those
+        # crossed by none are the outermost
+        spans = []
+        last = {0: 0}  # hash -> the latest cut with it
+        near = {0: 0}  # hash -> the latest point with it, cut or not
+        crossed = 0
+        for i in xrange(1, len(jumps)):
+            crossed ^= crossing[i]
+            gap = i - near.get(crossed, i - 1)
+            near[crossed] = i
+            if jumps[i][2] < gap:
+                if crossed in last:
+                    spans.append(Span(last[crossed], i))
+                last[crossed] = i
+        spans.append(Span(last[0], len(jumps)))
+
+        # and as the jumps crossing a region's ends are the same, any other
+        # region is either within it or apart from it
+        spans.sort(key=lambda span: (span.lo, -span.hi))
+        outermost = []
+        stack = []
+        for span in spans:
+            while stack and stack[-1].hi <= span.lo:
+                stack.pop()
+            (stack[-1].within if stack else outermost).append(span)
+            stack.append(span)
+        return outermost
+
+    def place(self, span, chunks, regions):
+        """Find (or make) the Region of span, and those within it."""
+        pieces = []
+        within = []
+        at = span.lo
+        for inner in span.within:
+            self.place(inner, chunks, regions)
+            pieces.append(';'.join(chunks[at:inner.lo]) + ';'
+                          if at < inner.lo else '')
+            within.append(inner.region.summary)
+            at = inner.hi
+        pieces.append(';'.join(chunks[at:span.hi]) + ';'
+                      if at < span.hi else '')
+
+        key = (tuple(pieces), tuple(within))
+        region = regions.get(key) or self.regions.get(key) or \
+                 self.previous.get(key)
+        if region is None:
+            region = Region(pieces, within, self.bases.get(key[0]))
+        regions[key] = region
+        span.region = region
+
+    def update(self, text):
+        """
+        Compile a version of the program, returning an Update.
+
+        Raises JumpSyntaxError if the source is not a valid program, leaving
+        the compiler as it was.
+
+        """
+        start = clock()
+        with self.stats.measure('update'):
+            update = self._update(text)
+        return update._replace(time=clock() - start)
+
+    def _update(self, text):
+        chunks, jumps = self.split(text)
+        outermost = self.cut(jumps)
+
+        regions = {}
+        for span in outermost:
+            self.place(span, chunks, regions)
+
+        # constants flow forwards from the start, so far as control does
+        constants = {}
+        entered = []  # (span, constants on entry) of those reached
+        for span in outermost:
+            region = span.region
+            entry = frozenset((var, constants[var])
+                              for var in region.variables if var in constants)
+            entered.append((span, entry))
+            analysis = region.analyse(entry, self.propagate, self.stats)
+            if not analysis.falls_through:
+                break
+            for var in region.assigned:
+                if var in analysis.constants:
+                    constants[var] = analysis.constants[var]
+                else:
+                    constants.pop(var, None)
+
+        # then liveness backwards from the end of the last region reached,
+        # compiling the regions whose source (or whose facts) changed
+        compilations = []
+        live = None
+        for span, entry in reversed(entered):
+            compilation, fresh = self.compile(span, (entry, live))
+            compilations.append((compilation, fresh))
+            if live is not None:
+                live = compilation.live_in | \
+                       (live - span.region.variables)
+            else:
+                live = compilation.live_in
+        compilations.reverse()
+
+        # and the code, compiling the regions within as it is reached
+        lines = []
+        emitted = []  # (span, compilation, whether compiled now)
+        first_label = 0
+        for (span, entry), (compilation, fresh) in zip(entered, compilations):
+            first_label = self.emit(span, compilation, fresh, first_label,
+                                    lines, emitted)
+        lines = self.join_labels(lines)
+        compiled = [span for span, compilation, fresh in emitted if fresh]
+
+        count = sum(len(self.regions_of(span)) for span in outermost)
+        self.stats.count('regions', count)
+        self.stats.count('regions_compiled', len(compiled))
+
+        for region in regions.itervalues():
+            region.prune()
+        self.chunks = chunks
+        self.jumps = jumps
+        self.previous = self.regions
+        self.regions = regions
+        self.bases = dict((key[0], region)
+                          for key, region in regions.iteritems())
+
+        return Update(lines, count, len(compiled),
+                      self.source_lines(chunks, compiled),
+                      all(c.converged for s, c, f in emitted), None)
+
+    def compile(self, span, facts):
+        """Compile the region of span given its facts, if not already."""
+        compilation, fresh = span.region.compile(
+            facts[0], facts[1], self.level, self.max_iterations, self.stats)
+        if fresh:
+            self.stats.count('statements_compiled', span.region.size)
+        return compilation, fresh
+
+    def emit(self, span, compilation, fresh, first, lines, emitted):
+        """
+        Append the code of span's region to lines, with labels from first,
+        and those of the regions within it; returning the next label free.
+
+        """
+        emitted.append((span, compilation, fresh))
+        following = first + compilation.labels
+        for line in span.region.lines(compilation, first):
+            if line[0] != '#':
+                lines.append(line)
+                continue
+            index = int(line[1:])
+            inner = span.within[index]
+            inner_compilation, inner_fresh = self.compile(
+                inner, compilation.within[index])
+            following = self.emit(inner, inner_compilation, inner_fresh,
+                                  following, lines, emitted)
+        return following
+
+    def join_labels(self, lines):
+        """
+        Merge each label straight after another into it.
+
+        The code of a region ends in a label where jumps go to its ExitStmt,
+        and that of the code after it can start with one.
+
+        """
+        labelled = [i for i, line in enumerate(lines) if line[0] == 'L']
+        aliases = {}
+        for i, j in reversed(zip(labelled, labelled[1:])):
+            if j == i + 1:
+                second = lines[j][:-1]
+                aliases[lines[i][:-1]] = aliases.get(second, second)
+        if not aliases:
+            return lines
+
+        relabel = lambda match: aliases.get(match.group(0), match.group(0))
+        return [LABEL_RE.sub(relabel, line) if 'goto' in line else line
+                for line in lines
+                if line[0] != 'L' or line[:-1] not in aliases]
+
+    def regions_of(self, span):
+        """The spans of span and those within it, at any depth."""
+        spans = [span]
+        for inner in span.within:
+            spans.extend(self.regions_of(inner))
+        return spans
+
+    def source_lines(self, chunks, spans):
+        """
+        The (first, last) source lines of the statements of spans' own
+        source, merging neighbours.
+
+        """
+        ranges = []
+        for span in spans:
+            at = span.lo
+            for inner in span.within:
+                if at < inner.lo:
+                    ranges.append((at, inner.lo))
+                at = inner.hi
+            if at < span.hi:
+                ranges.append((at, span.hi))
+        ranges.sort()
+
+        # chunk i starts on the line of the semicolon ending chunk i - 1
+        merged = []
+        line = 1
+        done = 0  # the chunks whose newlines `line` counts
+        for lo, hi in ranges:
+            for chunk in chunks[done:lo]:
+                line += chunk.count('\n')
+            text = chunks[lo]
+            first = line + text.count('\n', 0,
+                                      len(text) - len(text.lstrip()))
+            for chunk in chunks[lo:hi]:
+                line += chunk.count('\n')
+            done = hi
+            if merged and merged[-1][1] >= first - 1:
+                merged[-1] = (merged[-1][0], line)
+            else:
+                merged.append((first, line))
+        return merged
@@ -0,0 +1,102 @@
+"""
+The induction variables of natural loops.
+
+A basic induction variable is one the loop only ever steps by a literal,
+as in `i = i + 1`; a derived one is a multiple `i * k` of a basic one, by a
+literal or by a variable the loop does not assign.  Keeping a variable
+equal to `i * k` needs only an addition of `c * k` wherever `i` is stepped
+by `c`, so the multiplications can go (the reduction in strength), and
+where `i` is then only compared, against values not changing in the loop,
+the comparisons can be made of the multiple instead and `i` dropped.
+
+Division is left be: integer division does not distribute over addition.
+
+"""
+from collections import OrderedDict
+
+from graph.dataflow import defs, uses
+from graph.licm import loop_statements
+from graph.statement import AssignOpStmt
+
+COMPARISONS = {'<': '>', '>': '<', '==': '=='}  # operator -> mirrored
+
+def step(stmt, var):
+    """The literal stmt steps var by, as in `var = var + 1`; or None."""
+    if not isinstance(stmt, AssignOpStmt) or stmt.var != var:
+        return None
+    op1, op2 = stmt.operands
+    if stmt.operator == '+':
+        if op1 == var and isinstance(op2, int):
+            return op2
+        if op2 == var and isinstance(op1, int):
+            return op1
+    elif stmt.operator == '-':
+        if op1 == var and isinstance(op2, int):
+            return -op2
+    return None
+
+class InductionVariables(object):
+    """
+    The induction variables of a loop.
+
+    `basic` maps each basic induction variable to the (statement, step)
+    pairs of its assignments, and `derived` each (variable, factor) to the
+    statements computing `variable * factor`, both in the order of the
+    loop's statements.
+
+    """
+    def __init__(self, loop, blocks):
+        self.loop = loop
+        self.statements = loop_statements(loop, blocks)
+
+        self.assigned = OrderedDict()  # variable -> statements assigning it
+        for stmt in self.statements:
+            for var in defs(stmt):
+                self.assigned.setdefault(var, []).append(stmt)
+
+        self.basic = OrderedDict()
+        for var, stmts in self.assigned.iteritems():
+            steps = [step(stmt, var) for stmt in stmts]
+            if None not in steps:
+                self.basic[var] = zip(stmts, steps)
+
+        self.derived = OrderedDict()
+        for stmt in self.statements:
+            if not isinstance(stmt, AssignOpStmt) or stmt.operator != '*':
+                continue
+            op1, op2 = stmt.operands
+            for var, factor in ((op1, op2), (op2, op1)):
+                if var in self.basic and factor != var and \
+                        factor not in (0, 1) and self.invariant(factor):
+                    self.derived.setdefault((var, factor), []).append(stmt)
+                    break
+
+    def invariant(self, operand):
+        """True if operand is a literal, or a variable the loop never assigns."""
+        return isinstance(operand, int) or operand not in self.assigned
+
+    def tests(self, var):
+        """
+        Return the statements comparing var against invariants, if all the
+        loop does with var is step it, compare it and take multiples of it;
+        or None.
+
+        """
+        multiples = set(stmt for (basic, factor), stmts
+                        in self.derived.iteritems() if basic == var
+                        for stmt in stmts)
+        tests = []
+        for stmt in self.statements:
+            if var not in uses(stmt) or stmt in multiples:
+                continue
+            if var in defs(stmt) and var in self.basic:
+                continue  # a step
+            if isinstance(stmt, AssignOpStmt):
+                op1, op2 = stmt.operands
+                other = op2 if op1 == var else op1
+                if stmt.operator in COMPARISONS and other != var and \
+                        self.invariant(other):
+                    tests.append(stmt)
+                    continue
+            return None
+        return tests
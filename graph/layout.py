@@ -0,0 +1,74 @@
+"""
+Edge frequencies, to lay the generated code out by.
+
+Only one edge into each statement can fall through to it, the others being
+jumps, and JE picks which: the most frequently taken.  Frequencies come from
+an EdgeProfile -- counts of the edges taken by a run of the program (see
+`graph.vm`), or loaded from a JSON file of them -- or, failing one, from a
+StaticProfile's guess that edges deeper in loops are taken more often.
+
+Profiles identify statements by their node IDs in the optimised graph, so a
+saved profile only fits the same program optimised the same way.
+
+"""
+import hashlib
+import json
+
+class EdgeProfile(object):
+    """How many times each edge, given by (source num, target num), was taken."""
+    def __init__(self, counts=None):
+        self.counts = dict(counts or {})
+
+    def __len__(self):
+        return len(self.counts)
+
+    def add(self, source, target, n=1):
+        key = (source.num, target.num)
+        self.counts[key] = self.counts.get(key, 0) + n
+
+    def weight(self, source, target):
+        return self.counts.get((source.num, target.num), 0)
+
+    def edges(self):
+        """The [source num, target num, count] of each edge, in order."""
+        return sorted([source, target, n]
+                      for (source, target), n in self.counts.iteritems())
+
+    def digest(self):
+        return hashlib.sha1(json.dumps(self.edges())).hexdigest()
+
+    @classmethod
+    def load(cls, fileobj):
+        """Read a profile written by `dump`."""
+        try:
+            data = json.load(fileobj)
+            return cls(((int(source), int(target)), int(n))
+                       for source, target, n in data['edges'])
+        except (ValueError, KeyError, TypeError):
+            raise ValueError("Not an edge profile.")
+
+    def dump(self, fileobj):
+        json.dump({'edges': self.edges()}, fileobj)
+        fileobj.write('\n')
+
+class StaticProfile(object):
+    """
+    Guessed edge frequencies, for want of a profile.
+
+    An edge counts 10 ** the depth of the innermost loop holding both its
+    ends: so back edges outweigh those entering a loop, and those staying in
+    a loop outweigh those leaving it.  The loops are found when first needed.
+
+    """
+    def __init__(self, graph):
+        self.graph = graph
+        self.loops = None
+
+    def weight(self, source, target):
+        if self.loops is None:
+            self.loops = self.graph.get_loops()
+        loop = self.loops.innermost(source)
+        block = self.loops.blocks.block_of[target.num]
+        while loop is not None and block not in loop.blocks:
+            loop = loop.parent
+        return 10 ** loop.depth if loop is not None else 1
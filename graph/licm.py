@@ -0,0 +1,109 @@
+"""
+Finding the statements which can be hoisted out of a natural loop.
+
+An assignment `x = e` in a loop is invariant if each variable `e` reads is
+either assigned nowhere in the loop or only by another invariant statement.
+It can be moved to just before the loop's header (and so run once per entry
+to the loop, rather than once per iteration) if further:
+
+  - it is the loop's only assignment to `x`, and `x` is not live on entry to
+    the header, so every use of `x` in the loop already sees its value;
+  - it dominates every exit from the loop, or `x` is dead at each of them,
+    so code after the loop cannot tell it ran when it would not have;
+  - it cannot trap, as a division by anything but a non-zero literal could.
+
+"""
+from graph.dataflow import defs, uses
+from graph.statement import AssignStmt, AssignOpStmt
+
+def can_trap(stmt):
+    """True if stmt could fail at runtime, eg. by dividing by zero."""
+    return getattr(stmt, 'operator', None) == '/' and \
+           not (isinstance(stmt.operands[1], int) and stmt.operands[1] != 0)
+
+def loop_statements(loop, blocks):
+    """The statements of loop, in block (reverse post-) order."""
+    return [stmt for num in sorted(loop.blocks)
+            for stmt in blocks.blocks[num].statements]
+
+def invariant_statements(loop, blocks, safe=None):
+    """
+    Return the loop-invariant assignments of loop, in the order of its blocks.
+
+    Only those passing safe(stmt), if given, are considered, and so only
+    they can make the statements reading their variables invariant.
+
+    """
+    statements = loop_statements(loop, blocks)
+    assigned = {}  # variable -> number of assignments to it in the loop
+    for stmt in statements:
+        for var in defs(stmt):
+            assigned[var] = assigned.get(var, 0) + 1
+
+    candidates = [stmt for stmt in statements
+                  if isinstance(stmt, (AssignStmt, AssignOpStmt)) and
+                  assigned[stmt.var] == 1 and not can_trap(stmt) and
+                  (safe is None or safe(stmt))]
+
+    # each one found can make invariant those reading what it assigns
+    found = set()
+    invariant = set()
+    changed = True
+    while changed:
+        changed = False
+        for stmt in candidates:
+            if stmt in found:
+                continue
+            if all(var in invariant or var not in assigned
+                   for var in uses(stmt)):
+                found.add(stmt)
+                invariant.add(stmt.var)
+                changed = True
+
+    return [stmt for stmt in candidates if stmt in found]
+
+def hoistable(graph, loop, blocks, dominators, liveness):
+    """
+    Return the statements of loop which can be hoisted out of it, in the
+    order they must then run in.
+
+    blocks, dominators and liveness are those analyses of graph.
+
+    """
+    variables = liveness.variables
+    header_live = liveness.live_in[loop.header.first]
+    exits = loop.exits(blocks)
+    exit_live = 0
+    for inside, outside in exits:
+        exit_live |= liveness.live_in[outside.first]
+
+    def safe(stmt):
+        bit = 1 << variables.index[stmt.var]
+        if header_live & bit:
+            return False
+        if exit_live & bit:
+            block = blocks.block(stmt)
+            return all(dominators.dominates(block, inside)
+                       for inside, outside in exits)
+        return True
+
+    stmts = invariant_statements(loop, blocks, safe)
+
+    # a cycle cannot be left with no statements at all, which would happen to
+    # one (without exits, so never to be left) made only of hoisted ones;
+    # leave such a rarity be
+    hoisted = set(stmts)
+    settled = set()  # those followed by a statement staying in the loop
+    for stmt in stmts:
+        path = set()
+        follower = stmt
+        while follower in hoisted and follower not in settled:
+            if follower in path:
+                return []
+            path.add(follower)
+            follower = graph.successor(follower)[1]
+        if follower is None:
+            return []
+        settled.update(path)
+
+    return stmts
@@ -0,0 +1,199 @@
+"""
+A hand-written frontend for Jump, building statements straight from source.
+
+It accepts exactly the language of Jump.g, but needs neither the ANTLR
+runtime nor a parse tree.  Statements are numbered as the children of an
+ANTLR PROGRAM tree would be.
+
+Well-formed source is matched a whole statement at a time by one regular
+expression, and the Statements built straight from its groups.  Should that
+fail, a conventional tokenizer and recursive descent parser take over, to
+find and report the syntax error.
+
+"""
+import re
+
+from graph import JumpSyntaxError
+from graph.statement import AssignStmt, AssignOpStmt, GotoStmt, IfGotoStmt
+from graph.statement import LabelStmt, ReturnStmt
+
+TOKEN_RE = re.compile(r'''
+    (?P<WS>[ \t\n\r\f]+)
+  | (?P<NUM>-?[0-9]+)
+  | (?P<IDENT>[a-z][a-z0-9]*)
+  | (?P<LABEL>[A-Z][A-Z0-9]*)
+  | (?P<OP>==|[-+*/<>])
+  | (?P<SCOL>;)
+  | (?P<COL>:)
+  | (?P<EQUAL>=)
+  | (?P<ERROR>.)
+''', re.VERBOSE | re.DOTALL)
+
+KEYWORDS = {
+    'goto': 'GOTO',
+    'return': 'RETURN',
+    'if': 'IF',
+}
+
+EOF = 'EOF'
+
+# one whole statement (with its label, if any), tokenized as ANTLR would:
+# keywords are not identifiers, and a '-' before a digit starts a NUM
+_WS = r'[ \t\n\r\f]*'
+_NOT_KEYWORD = r'(?!(?:goto|return|if)(?![a-z0-9]))'
+_END_KEYWORD = r'(?![a-z0-9])'
+_EXPR = r'(?:(-?[0-9]+)|' + _NOT_KEYWORD + r'([a-z][a-z0-9]*))'
+_LABEL = r'([A-Z][A-Z0-9]*)'
+STATEMENT_RE = re.compile(
+    _WS + '(?:' + _LABEL + _WS + ':' + _WS + ')?(?:' +
+    # groups 2-7: IDENT = expr [OP expr]
+    _NOT_KEYWORD + r'([a-z][a-z0-9]*)' + _WS + '=(?!=)' + _WS + _EXPR +
+    '(?:' + _WS + r'(==|[+*/<>]|-(?![0-9]))' + _WS + _EXPR + ')?' +
+    # group 8: goto LABEL
+    '|goto' + _END_KEYWORD + _WS + _LABEL +
+    # groups 9-11: if expr goto LABEL
+    '|if' + _END_KEYWORD + _WS + _EXPR + _WS + 'goto' + _END_KEYWORD + _WS +
+    _LABEL +
+    # groups 12-13: return expr
+    '|return' + _END_KEYWORD + _WS + _EXPR +
+    ')' + _WS + ';')
+
+def position(text, pos):
+    """The (line, column) of an offset into text, as ANTLR reports them."""
+    line = text.count('\n', 0, pos) + 1
+    column = pos - (text.rfind('\n', 0, pos) + 1)
+    return line, column
+
+def tokenize(text):
+    """Return a list of (type, text, offset) tokens, ending with an EOF token."""
+    tokens = []
+    for match in TOKEN_RE.finditer(text):
+        kind = match.lastgroup
+        if kind == 'WS':
+            continue
+        value = match.group()
+        if kind == 'IDENT':
+            kind = KEYWORDS.get(value, kind)
+        elif kind == 'ERROR':
+            line, column = position(text, match.start())
+            raise JumpSyntaxError(
+                "line {0}:{1} no viable alternative at character {2!r}"
+                .format(line, column, value))
+        tokens.append((kind, value, match.start()))
+
+    tokens.append((EOF, '<EOF>', len(text)))
+    return tokens
+
+class Parser(object):
+    def __init__(self, text):
+        self.text = text
+        self.tokens = tokenize(text)
+        self.idx = 0
+
+    def error(self, message):
+        kind, value, pos = self.tokens[self.idx]
+        line, column = position(self.text, pos)
+        raise JumpSyntaxError("line {0}:{1} {2} {3!r}".format(
+            line, column, message, value))
+
+    def expect(self, kind):
+        token = self.tokens[self.idx]
+        if token[0] != kind:
+            self.error("expecting {0}, found".format(kind))
+        self.idx += 1
+        return token[1]
+
+    def expr(self):
+        kind, value, pos = self.tokens[self.idx]
+        if kind == 'NUM':
+            self.idx += 1
+            return int(value)
+        if kind == 'IDENT':
+            self.idx += 1
+            return str(value)
+        self.error("expecting IDENT or NUM, found")
+
+    def parse(self):
+        """Return the program's list of Statements."""
+        tokens = self.tokens
+        statements = []
+
+        while tokens[self.idx][0] != EOF:
+            if tokens[self.idx][0] == 'LABEL':
+                name = tokens[self.idx][1]
+                self.idx += 1
+                self.expect('COL')
+                statements.append(LabelStmt(len(statements), name))
+
+            statements.append(self.stmt(len(statements)))
+            self.expect('SCOL')
+
+        return statements
+
+    def stmt(self, num):
+        kind, value, pos = self.tokens[self.idx]
+
+        if kind == 'IDENT':
+            self.idx += 1
+            self.expect('EQUAL')
+            source = self.expr()
+            if self.tokens[self.idx][0] != 'OP':
+                return AssignStmt(num, str(value), source)
+            operator = self.expect('OP')
+            return AssignOpStmt(num, str(value), source, operator, self.expr())
+
+        if kind == 'GOTO':
+            self.idx += 1
+            return GotoStmt(num, self.expect('LABEL'))
+
+        if kind == 'IF':
+            self.idx += 1
+            cond = self.expr()
+            self.expect('GOTO')
+            return IfGotoStmt(num, self.expect('LABEL'), cond)
+
+        if kind == 'RETURN':
+            self.idx += 1
+            return ReturnStmt(num, self.expr())
+
+        self.error("no viable alternative at input")
+
+def parse(text):
+    """Parse Jump source text, returning its list of Statements."""
+    statements = []
+    append = statements.append
+    match = STATEMENT_RE.match
+    pos = 0
+    end = len(text.rstrip(' \t\n\r\f'))
+
+    while pos < end:
+        m = match(text, pos)
+        if m is None:
+            # let the full parser find (and report) the problem
+            return Parser(text).parse()
+        pos = m.end()
+
+        (label, var, num1, ident1, operator, num2, ident2, goto_label,
+         if_num, if_ident, if_label, ret_num, ret_ident) = m.groups()
+
+        if label is not None:
+            append(LabelStmt(len(statements), label))
+
+        num = len(statements)
+        if var is not None:
+            source = int(num1) if num1 is not None else ident1
+            if operator is None:
+                append(AssignStmt(num, var, source))
+            else:
+                op2 = int(num2) if num2 is not None else ident2
+                append(AssignOpStmt(num, var, source, operator, op2))
+        elif goto_label is not None:
+            append(GotoStmt(num, goto_label))
+        elif if_label is not None:
+            cond = int(if_num) if if_num is not None else if_ident
+            append(IfGotoStmt(num, if_label, cond))
+        else:
+            append(ReturnStmt(num, int(ret_num) if ret_num is not None
+                                   else ret_ident))
+
+    return statements
@@ -0,0 +1,91 @@
+# the passes run at each optimisation level, in pipeline order
+PIPELINES = {
+    'O0': (),
+    'O1': ('UCE', 'JE', 'DCE'),
+    'O2': ('UCE', 'JE', 'DCE', 'CP', 'CSE', 'LICM', 'SR'),
+}
+
+# when a pass changes the graph, the passes whose input it may have changed
+# (and so which need to run again)
+INVALIDATES = {
+    'UCE': ('JE', 'DCE', 'CP'),           # fewer parents, uses and paths
+    'JE': (),                             # only swaps LINR and GOTO edges
+    'DCE': ('JE',),                       # rerouted edges
+    'CP': ('UCE', 'JE', 'DCE', 'CSE',
+           'LICM', 'SR'),                 # folded branches; substituted uses
+    'CSE': ('JE', 'DCE', 'CP', 'LICM',
+            'SR'),                        # rerouted edges; copied uses
+    'LICM': ('JE', 'CSE', 'LICM', 'SR'),  # rerouted edges; loops left over
+    'SR': ('JE', 'DCE', 'CP', 'CSE',
+           'LICM', 'SR'),                 # new statements; loops left over
+}
+
+def get_pipeline(pipeline):
+    """Resolve a pipeline given by level name (eg. 'O2') or sequence of passes."""
+    if isinstance(pipeline, basestring):
+        if pipeline not in PIPELINES:
+            raise ValueError("Unknown optimisation level '{0}'.".format(pipeline))
+        return PIPELINES[pipeline]
+
+    for name in pipeline:
+        if name not in INVALIDATES:
+            raise ValueError("Unknown pass '{0}'.".format(name))
+    return tuple(pipeline)
+
+class PassManager(object):
+    """
+    Runs a pipeline of CFGraph passes to a fixpoint.
+
+    Every pass returns whether it changed the graph.  Only passes marked dirty
+    are run; initially all of them, and afterwards those invalidated by a pass
+    that made a change.  The fixpoint is reached when no pass is dirty, or
+    given up on after `max_iterations` rounds over the pipeline.
+
+    """
+    def __init__(self, graph, pipeline='O2', max_iterations=None, debug=False):
+        self.graph = graph
+        self.pipeline = get_pipeline(pipeline)
+        self.max_iterations = max_iterations
+        self.debug = debug
+
+        self.iterations = 0
+        self.converged = False
+        self.runs = []  # (pass name, changed) in the order they ran
+
+    def run(self):
+        """Optimise the graph; returns True if the fixpoint was reached."""
+        with self.graph.stats.measure('optimise') as entry:
+            converged = self._run()
+            self.graph.stats.count('iterations', self.iterations)
+        if any(changed for name, changed in self.runs):
+            entry.changed += 1
+        return converged
+
+    def _run(self):
+        dirty = set(self.pipeline)
+
+        while dirty:
+            if self.max_iterations is not None and \
+                    self.iterations >= self.max_iterations:
+                return False
+            self.iterations += 1
+
+            for name in self.pipeline:
+                if name not in dirty:
+                    continue
+                dirty.discard(name)
+
+                changed = getattr(self.graph, name)()
+                self.runs.append((name, changed))
+
+                if self.debug:
+                    print
+                    print "  ---> Post-{0}:".format(name)
+                    print self.graph
+
+                if changed:
+                    dirty.update(n for n in INVALIDATES[name]
+                                 if n in self.pipeline)
+
+        self.converged = True
+        return True
@@ -0,0 +1,185 @@
+"""
+Compiling a CFGraph to Python, for running programs at speed.
+
+The reachable basic blocks of the graph become one Python function: every
+variable a local (read before being assigned, it holds 0), operators written
+inline, and control passed between blocks by a dispatch loop on the number
+of the block to run next, found by a binary tree of comparisons.  A block
+jumping back to itself, as a tight loop does, loops within its own branch
+of the tree instead.
+
+Instructions are counted by the block, so max_steps is checked on entry to
+each block: a run that would exceed it partway through a block fails before
+starting the block.  Otherwise runs behave as those of `graph.vm`, and give
+the same Executions.
+
+Compiled functions are cached by a digest of their source, so compiling the
+same program again only costs translating it.
+
+"""
+import hashlib
+from collections import OrderedDict
+
+from graph import JumpRuntimeError
+from graph import LINR, GOTO, IFGOTO
+from graph.licm import can_trap
+from graph.statement import AssignStmt, AssignOpStmt, IfGotoStmt, ReturnStmt
+from graph.traversal import reachable
+from graph.vm import Execution
+
+CACHE_SIZE = 32  # compiled functions kept
+
+_cache = OrderedDict()  # source digest -> function, least recently used first
+
+def operand(value):
+    """The Python expression for a literal or variable."""
+    return 'v_' + value if isinstance(value, str) else str(value)
+
+class Translator(object):
+    """Writes the Python source of the function running a graph."""
+    def __init__(self, graph):
+        self.graph = graph
+        self.lines = []
+
+        seen = reachable(graph)
+        self.blocks = graph.get_blocks()
+        self.order = [block for block in self.blocks
+                      if seen[block.first.num]]
+        self.index = dict((block.num, i) for i, block in enumerate(self.order))
+
+        variables = set()
+        for block in self.order:
+            for stmt in block.statements:
+                variables.update(stmt.lhs)
+                variables.update(var for var in stmt.rhs
+                                 if isinstance(var, str))
+        self.variables = sorted(variables)
+
+    def emit(self, depth, line):
+        self.lines.append('    ' * depth + line)
+
+    def source(self):
+        emit = self.emit
+        emit(0, 'def program(limit):')
+        for var in self.variables:
+            emit(1, '{0} = 0'.format(operand(var)))
+        emit(1, 'steps = 0')
+        emit(1, 'at = -1  # statement of the last division, for errors')
+        if not self.order:
+            emit(1, 'return None, steps, False')
+            return '\n'.join(self.lines) + '\n'
+
+        emit(1, 'block = 0')
+        emit(1, 'try:')
+        emit(2, 'while True:')
+        self.dispatch(0, len(self.order), 3)
+        emit(1, 'except ZeroDivisionError:')
+        emit(2, 'raise JumpRuntimeError('
+                '"Division by zero in statement #{0}.".format(at))')
+        return '\n'.join(self.lines) + '\n'
+
+    def dispatch(self, lo, hi, depth):
+        """Write the code choosing between (and running) blocks lo to hi."""
+        if hi - lo == 1:
+            self.block(self.order[lo], depth)
+            return
+        mid = (lo + hi) // 2
+        self.emit(depth, 'if block < {0}:'.format(mid))
+        self.dispatch(lo, mid, depth + 1)
+        self.emit(depth, 'else:')
+        self.dispatch(mid, hi, depth + 1)
+
+    def block(self, block, depth):
+        emit = self.emit
+        last = block.last
+        looping = block.first in self.graph.successors(last)
+        if looping:
+            emit(depth, 'while True:')
+            depth += 1
+
+        emit(depth, 'steps += {0}'.format(len(block.statements)))
+        emit(depth, 'if steps > limit:')
+        emit(depth + 1, 'raise JumpRuntimeError('
+                        '"Exceeded {0} steps.".format(limit))')
+        for stmt in block.statements:
+            self.statement(stmt, depth)
+
+        if isinstance(last, ReturnStmt):
+            return
+        following = last.next[LINR] or last.next[GOTO]
+        if isinstance(last, IfGotoStmt):
+            emit(depth, 'if {0}:'.format(operand(last.cond)))
+            self.goto(block, last.next[IFGOTO], depth + 1, looping)
+            emit(depth, 'else:')
+            self.goto(block, following, depth + 1, looping)
+        else:
+            self.goto(block, following, depth, looping)
+
+    def goto(self, block, target, depth, looping):
+        """Write the code passing control from block to statement target."""
+        if target is None:
+            # fell off the end of the program
+            self.emit(depth, 'return None, steps, False')
+        elif looping and target is block.first:
+            self.emit(depth, 'continue')
+        else:
+            self.emit(depth, 'block = {0}'.format(
+                self.index[self.blocks.block_of[target.num]]))
+            if looping:
+                self.emit(depth, 'break')
+
+    def statement(self, stmt, depth):
+        emit = self.emit
+        if isinstance(stmt, AssignStmt):
+            emit(depth, '{0} = {1}'.format(operand(stmt.var),
+                                           operand(stmt.source)))
+        elif isinstance(stmt, AssignOpStmt):
+            if can_trap(stmt):
+                emit(depth, 'at = {0}'.format(stmt.num))
+            op1, op2 = stmt.operands
+            emit(depth, '{0} = {1} {2} {3}'.format(
+                operand(stmt.var), operand(op1), stmt.operator, operand(op2)))
+        elif isinstance(stmt, ReturnStmt):
+            emit(depth, 'return int({0}), steps, True'.format(
+                operand(stmt.var)))
+        # IFGOTOs branch at the end of their blocks; labels and the like
+        # just pass control on
+
+def translate(graph):
+    """Return the Python source of a function `program(limit)` running graph."""
+    return Translator(graph).source()
+
+def load(source):
+    """Compile source as written by translate, returning its function."""
+    digest = hashlib.sha1(source).hexdigest()
+    function = _cache.pop(digest, None)
+    if function is None:
+        namespace = {'JumpRuntimeError': JumpRuntimeError}
+        exec compile(source, '<jump {0}>'.format(digest[:12]), 'exec') \
+            in namespace
+        function = namespace['program']
+        while len(_cache) >= CACHE_SIZE:
+            _cache.popitem(last=False)
+    _cache[digest] = function
+    return function
+
+class CompiledProgram(object):
+    """A CFGraph compiled to a Python function."""
+    def __init__(self, graph):
+        self.source = translate(graph)
+        self.function = load(self.source)
+
+    def run(self, max_steps=None):
+        """
+        Execute the program, returning an Execution.
+
+        Raises JumpRuntimeError on division by zero, or if more than max_steps
+        instructions would be executed.
+
+        """
+        limit = max_steps if max_steps is not None else float('inf')
+        return Execution(*self.function(limit))
+
+def execute(graph, max_steps=None):
+    """Compile a CFGraph to Python and run it, returning an Execution."""
+    return CompiledProgram(graph).run(max_steps)
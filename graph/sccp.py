@@ -0,0 +1,170 @@
+from graph import LINR, GOTO, IFGOTO
+from graph.ssa import SSAForm, Value
+from graph.statement import AssignStmt, IfGotoStmt
+from graph.statement import fold
+
+class _Sentinel(object):
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+# the constant lattice; every value is TOP (not yet seen assigned), an int
+# constant, or BOTTOM (may be more than one)
+TOP = _Sentinel('TOP')
+BOTTOM = _Sentinel('BOTTOM')
+
+def meet(a, b):
+    if a is TOP:
+        return b
+    if b is TOP or a == b:
+        return a
+    return BOTTOM
+
+class ConstantPropagation(object):
+    """
+    Sparse conditional constant propagation, over SSA form.
+
+    Every Value of the SSAForm has a lattice value: TOP to start with, but
+    BOTTOM for the entry values, nothing being known about variables on
+    entry to the program (bar the graph's `entry_constants`), and for the
+    values the SSAForm knows nothing of.  Only blocks reached along edges
+    proven executable are evaluated; after that, a statement or phi is only
+    evaluated again when a value it reads drops in the lattice, as found by
+    following def-use chains, so the work done is proportional to the number
+    of uses rather than to the size of the program times the iterations to a
+    fixpoint.
+    Constants flow around loops, and branches on a constant condition leave
+    their other side unexecuted.
+
+    """
+    def __init__(self, graph, ssa=None):
+        self.graph = graph
+        self.ssa = ssa if ssa is not None else SSAForm(graph)
+        self.blocks = self.ssa.blocks
+        self.lattice = {}  # Value -> lattice value, TOP if absent
+        self.edges = set()  # executable (pred num, block num); pred -1 at entry
+        self.reached = bytearray(len(self.blocks))
+        self.executable = set()  # the statements of reached blocks
+        self.iterations = 0
+
+        self.flow = []  # edges found executable, to follow
+        self.work = []  # statements and phis reading values that dropped
+        self.solve()
+
+    def solve(self):
+        blocks = self.blocks
+        entry = blocks.entry
+        if entry is None:
+            return
+
+        constants = self.graph.entry_constants
+        for value in self.ssa.entry.itervalues():
+            self.lattice[value] = constants.get(value.var, BOTTOM)
+        for value in self.ssa.unknown:
+            self.lattice[value] = BOTTOM
+
+        reached = self.reached
+        block_of = blocks.block_of
+        self.flow.append((-1, entry.num))
+        while self.flow or self.work:
+            if self.flow:
+                edge = self.flow.pop()
+                if edge in self.edges:
+                    continue
+                self.edges.add(edge)
+                num = edge[1]
+                for phi in self.ssa.phis[num]:
+                    self.visit_phi(phi)
+                if not reached[num]:
+                    reached[num] = 1
+                    for stmt in blocks.blocks[num].statements:
+                        self.visit(stmt)
+            else:
+                item = self.work.pop()
+                if isinstance(item, Value):
+                    if reached[item.block.num]:
+                        self.visit_phi(item)
+                elif reached[block_of[item.num]]:
+                    self.visit(item)
+
+        for block in blocks:
+            if reached[block.num]:
+                self.executable.update(block.statements)
+
+    def lower(self, value, new):
+        """Drop value to (its meet with) new, queueing its uses if it moved."""
+        old = self.lattice.get(value, TOP)
+        new = meet(old, new)
+        if new != old:
+            self.lattice[value] = new
+            self.work.extend(value.uses)
+
+    def operand(self, stmt, operand):
+        """The lattice value of an operand of stmt."""
+        if isinstance(operand, str):
+            return self.lattice.get(self.ssa.used[stmt][operand], TOP)
+        return operand
+
+    def evaluate(self, stmt):
+        """The lattice value stmt assigns."""
+        if isinstance(stmt, AssignStmt):
+            return self.operand(stmt, stmt.source)
+
+        ops = [self.operand(stmt, op) for op in stmt.operands]
+        if BOTTOM in ops:
+            return BOTTOM
+        if TOP in ops:
+            return TOP
+        value = fold(stmt.operator, ops[0], ops[1])
+        return value if value is not None else BOTTOM
+
+    def successors(self, stmt):
+        """The successors of stmt that may execute."""
+        if not isinstance(stmt, IfGotoStmt):
+            return self.graph.successors(stmt)
+
+        cond = self.operand(stmt, stmt.cond)
+        if cond is TOP:
+            return []
+        taken = [stmt.next[IFGOTO]]
+        fallthrough = [stmt.next[LINR], stmt.next[GOTO]]
+        if cond is BOTTOM:
+            targets = taken + fallthrough
+        else:
+            targets = taken if cond != 0 else fallthrough
+        return [t for t in targets if t is not None]
+
+    def visit(self, stmt):
+        self.iterations += 1
+        value = self.ssa.defined.get(stmt)
+        if value is not None and self.lattice.get(value) is not BOTTOM:
+            self.lower(value, self.evaluate(stmt))
+
+        blocks = self.blocks
+        num = blocks.block_of[stmt.num]
+        if stmt is blocks.blocks[num].last:
+            self.flow.extend((num, blocks.block_of[succ.num])
+                             for succ in self.successors(stmt))
+
+    def visit_phi(self, phi):
+        if self.lattice.get(phi) is BOTTOM:
+            return  # as low as it goes
+        self.iterations += 1
+        num = phi.block.num
+        preds = phi.block.preds
+        value = TOP
+        for i, arg in enumerate(phi.args):
+            pred = preds[i].num if i < len(preds) else -1
+            if arg is not None and (pred, num) in self.edges:
+                value = meet(value, self.lattice.get(arg, TOP))
+        self.lower(phi, value)
+
+    def constants(self, stmt):
+        """A map of the variables stmt reads which hold a known constant."""
+        lattice = self.lattice
+        return dict((var, lattice[value])
+                    for var, value in self.ssa.used.get(stmt, {}).iteritems()
+                    if lattice.get(value, TOP) is not TOP and
+                       lattice[value] is not BOTTOM)
@@ -0,0 +1,261 @@
+"""
+Static single assignment form, as a view over a graph.
+
+Each assignment of a variable defines a new Value of it, and where different
+values of a variable meet, at a join, a phi defines another; so every use of
+a variable reads exactly one Value, and each Value knows every statement
+(and phi) reading it.  Passes can then follow these def-use chains straight
+from a definition to its uses, rather than iterating over the whole program
+until the facts about every variable at every statement settle.
+
+Phis are placed at the iterated dominance frontiers of the blocks assigning
+a variable, and only for variables read in some block before being assigned
+in it (those which never are cannot be live at any join).  Values are then
+named by a walk over the dominator tree, keeping a stack of the values of
+each variable where the walk is.  Variables read before any assignment read
+their entry Value.
+
+The graph itself is left as it is: statements keep their variable names, and
+phis are only ever held here.  Going back out of SSA form is then a matter of
+every value of a variable coalescing into the variable again, which holds so
+long as passes rewriting uses never leave two values of one variable live at
+once.  Replacing a use with a literal cannot, nor can replacing a copy's
+variable with its source where the source still holds the copied value,
+which is what `copies` records.
+
+"""
+from graph.dataflow import defs, uses
+from graph.statement import AssignStmt, AssignOpStmt, RegionStmt
+
+class Value(object):
+    """
+    One value of a variable: defined by `stmt`, by a phi at the start of
+    `block`, or (with neither) the variable's value on entry to the program.
+
+    A phi's `args` are the Values flowing in from each of its block's preds
+    in turn, or None from those that are unreachable; and for the entry
+    block, lastly the entry Value.  `uses` lists the statements and phis
+    reading the value.  Values are numbered in the order they are made.
+
+    """
+    __slots__ = ('var', 'num', 'stmt', 'block', 'args', 'uses')
+
+    def __init__(self, var, num, stmt=None, block=None):
+        self.var = var
+        self.num = num
+        self.stmt = stmt
+        self.block = block
+        self.args = None
+        self.uses = []
+
+    @property
+    def is_phi(self):
+        return self.block is not None
+
+    def __repr__(self):
+        return '{0}_{1}'.format(self.var, self.num)
+
+class SSAForm(object):
+    """
+    The SSA form of a graph's reachable statements.
+
+    `defined[stmt]` is the Value an assignment stmt assigns, and `used[stmt]`
+    maps each variable stmt reads to the Value it reads; `phis[num]` lists
+    the phis at the start of block `num`.  The Values assigned by anything
+    else (a RegionStmt, whose code passes cannot see) are listed in
+    `unknown`, as little being known of them as of entry values.  Where a
+    variable stmt reads was copied from another, which still holds the same
+    value at stmt, `copies[stmt]` maps the first to the second (the earliest
+    source, along a chain of copies).
+
+    """
+    def __init__(self, graph, blocks=None, dominators=None):
+        self.graph = graph
+        self.blocks = blocks if blocks is not None else graph.get_blocks()
+        self.dominators = dominators if dominators is not None \
+                          else graph.get_dominators()
+
+        self.values = []
+        self.entry = {}  # variable -> entry Value
+        self.defined = {}
+        self.unknown = []
+        self.used = {}
+        self.copies = {}
+        self.phis = [[] for block in self.blocks]
+
+        if self.blocks.entry is not None:
+            self.place_phis()
+            self.rename()
+
+    def new_value(self, var, stmt=None, block=None):
+        value = Value(var, len(self.values), stmt, block)
+        self.values.append(value)
+        return value
+
+    def place_phis(self):
+        reached = self.dominators.pre
+        assigned = {}    # variable -> blocks assigning it
+        upward = set()   # variables read in a block before being assigned
+        for block in self.blocks:
+            if reached[block.num] < 0:
+                continue
+            local = set()
+            for stmt in block.statements:
+                upward.update(var for var in uses(stmt) if var not in local)
+                for var in defs(stmt):
+                    local.add(var)
+                    assigned.setdefault(var, []).append(block.num)
+
+        self.upward = upward
+        frontiers = self.dominators.frontiers()
+        entry = self.blocks.entry
+        blocks = self.blocks.blocks
+        for var in sorted(upward):
+            has_phi = set()
+            todo = list(assigned.get(var, ()))
+            queued = set(todo)
+            while todo:
+                for num in frontiers[todo.pop()]:
+                    if num in has_phi:
+                        continue
+                    has_phi.add(num)
+                    block = blocks[num]
+                    phi = self.new_value(var, block=block)
+                    phi.args = [None] * (len(block.preds) +
+                                         (block is entry))
+                    self.phis[num].append(phi)
+                    if num not in queued:
+                        queued.add(num)
+                        todo.append(num)
+
+    def value_of(self, var, stacks):
+        """The Value of var where the walk is."""
+        stack = stacks.get(var)
+        if stack:
+            return stack[-1]
+        value = self.entry.get(var)
+        if value is None:
+            value = self.entry[var] = self.new_value(var)
+        return value
+
+    def rename(self):
+        children = self.dominators.children
+        entry = self.blocks.entry
+        used = self.used
+        defined = self.defined
+        copies = self.copies
+        upward = self.upward
+        block_of = self.blocks.block_of
+        stacks = {}   # variable -> its Values, innermost last
+        log = []      # variables pushed onto, to pop on leaving a block
+        copy_of = {}  # Value of a copy -> the Value copied
+
+        # the entry block's phis take the entry values as their last args
+        for phi in self.phis[entry.num]:
+            phi.args[-1] = value = self.value_of(phi.var, stacks)
+            value.uses.append(phi)
+
+        stack = [(entry, None)]
+        while stack:
+            block, mark = stack.pop()
+            if mark is not None:
+                while len(log) > mark:
+                    stacks[log.pop()].pop()
+                continue
+            stack.append((block, len(log)))
+
+            for phi in self.phis[block.num]:
+                stacks.setdefault(phi.var, []).append(phi)
+                log.append(phi.var)
+
+            for stmt in block.statements:
+                read = set(uses(stmt))
+                if read:
+                    reads = used[stmt] = {}
+                    for var in read:
+                        value = reads[var] = self.value_of(var, stacks)
+                        value.uses.append(stmt)
+
+                        # follow copies back to the earliest variable still
+                        # holding the value; which only the stacks of those
+                        # with phis tell, bar for values from this block
+                        source = None
+                        while value in copy_of:
+                            value = copy_of[value]
+                            if value.var not in upward and \
+                                    (value.stmt is None or
+                                     block_of[value.stmt.num] != block.num):
+                                continue
+                            held = stacks.get(value.var)
+                            if held and held[-1] is value or \
+                                    not held and self.entry.get(value.var) \
+                                    is value:
+                                source = value.var
+                        if source is not None:
+                            copies.setdefault(stmt, {})[var] = source
+
+                for var in defs(stmt):
+                    value = self.new_value(var, stmt)
+                    if isinstance(stmt, (AssignStmt, AssignOpStmt)):
+                        defined[stmt] = value
+                    else:
+                        self.unknown.append(value)
+                    stacks.setdefault(var, []).append(value)
+                    log.append(var)
+                    if isinstance(stmt, AssignStmt) and \
+                            isinstance(stmt.source, str):
+                        copy_of[value] = used[stmt][stmt.source]
+
+            for succ in block.succs:
+                i = succ.preds.index(block)
+                for phi in self.phis[succ.num]:
+                    phi.args[i] = value = self.value_of(phi.var, stacks)
+                    value.uses.append(phi)
+
+            stack.extend((child, None)
+                         for child in reversed(children[block.num]))
+
+    def dead(self, required=None):
+        """
+        Return the reachable assignments whose values are not needed, in
+        program order.
+
+        Values are needed by branches, returns and whatever else is not an
+        assignment, by statements passing required(stmt) if given (which are
+        never dead), and by whatever defines the values those need, through
+        statements and phis alike.  A RegionStmt only needs the value of a
+        variable it may assign, which it may leave as it was, if what it
+        leaves is needed.
+
+        """
+        required = required or (lambda stmt: False)
+        needed = set()
+        todo = []
+
+        def need(stmt, variables=None):
+            for var, value in self.used.get(stmt, {}).iteritems():
+                if value not in needed and \
+                        (variables is None or var in variables):
+                    needed.add(value)
+                    todo.append(value)
+
+        for stmt in self.used:
+            if isinstance(stmt, RegionStmt):
+                need(stmt, stmt.reads)
+            elif stmt not in self.defined or required(stmt):
+                need(stmt)
+        while todo:
+            value = todo.pop()
+            if isinstance(value.stmt, RegionStmt):
+                need(value.stmt, (value.var,))
+            elif value.stmt is not None:
+                need(value.stmt)
+            elif value.is_phi:
+                for arg in value.args:
+                    if arg is not None and arg not in needed:
+                        needed.add(arg)
+                        todo.append(arg)
+
+        return sorted((stmt for stmt, value in self.defined.iteritems()
+                       if value not in needed and not required(stmt)),
+                      key=lambda stmt: stmt.num)
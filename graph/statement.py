@@ -1,6 +1,6 @@
 import operator as op
 
-import build.JumpLexer as lex
+from graph import tokens as lex
 
 from graph import JumpSyntaxError
 from graph import LINR, GOTO, IFGOTO
@@ -15,6 +15,14 @@ OPERATORS = {
     '==': op.eq,
 }
 
+def fold(operator, op1, op2):
+    """Evaluate `op1 operator op2` on literals; None if it cannot be folded."""
+    try:
+        result = OPERATORS[operator](op1, op2)
+    except ZeroDivisionError:
+        return None
+    return int(result)
+
 def get_varlit(node, force=None):
     if force is None or node.type == force:
         if node.type == lex.NUM:
@@ -24,14 +32,95 @@ def get_varlit(node, force=None):
 
     raise JumpSyntaxError("Inappropriate type '{0}'.".format(node.type))
 
+class Edges(object):
+    """
+    The [LINR, GOTO, IFGOTO] successors of a statement, as a list-like view.
+
+    The edges themselves live in the arrays of the statement's CFGraph; a
+    statement in no graph has none, and cannot be given any.
+
+    """
+    __slots__ = ('stmt',)
+
+    def __init__(self, stmt):
+        self.stmt = stmt
+
+    def __getitem__(self, edge_type):
+        graph = self.stmt.graph
+        if graph is None:
+            return None
+        target = graph.succ[edge_type][self.stmt.num]
+        return graph.nodes[target] if target >= 0 else None
+
+    def __setitem__(self, edge_type, target):
+        graph = self.stmt.graph
+        if graph is None:
+            raise ValueError("Statement #{0} is not in a graph."
+                             .format(self.stmt.num))
+        graph.set_edge(self.stmt.num, edge_type,
+                       target.num if target is not None else -1)
+
+    def __len__(self):
+        return 3
+
+    def __iter__(self):
+        graph = self.stmt.graph
+        if graph is None:
+            return iter((None, None, None))
+        nodes = graph.nodes
+        num = self.stmt.num
+        return iter([nodes[edges[num]] if edges[num] >= 0 else None
+                     for edges in graph.succ])
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return repr(list(self))
+
 class Statement(object):
-    """Has a statement for evaluation and a list of pointers to the next Statements"""
-    def __init__(self, node, num):
+    """
+    Has a statement for evaluation and a view of pointers to the next Statements
+
+    A statement's `num` is its node ID in its graph (`graph.nodes[num]`).
+
+    """
+    __slots__ = ('num', 'graph')
+
+    type = None
+
+    def __init__(self, num):
         self.num = num
-        self.type = node.type
-        self.stmt = node.toStringTree()
-        self.next = [None, None, None]  # LINR, GOTO, IFGOTO
-        self.lhs = self.rhs = []
+        self.graph = None
+
+    @property
+    def next(self):
+        """The statement's [LINR, GOTO, IFGOTO] successors."""
+        return Edges(self)
+
+    @next.setter
+    def next(self, targets):
+        edges = Edges(self)
+        for edge_type, target in enumerate(targets):
+            edges[edge_type] = target
+
+    @property
+    def lhs(self):
+        """The variables the statement assigns to."""
+        return []
+
+    @property
+    def rhs(self):
+        """The operands the statement reads."""
+        return []
+
+    @property
+    def stmt(self):
+        """The statement in the form of the parse tree's toStringTree()."""
+        return '({0})'.format(' '.join(str(part) for part in self.tree()))
 
     def generate(self, gotos):
         if self.next[GOTO]:
@@ -48,14 +137,27 @@ class Statement(object):
                     self.stmt)
 
 class ReturnStmt(Statement):
-    def __init__(self, node, num):
-        super(ReturnStmt, self).__init__(node, num)
-        self.var = get_varlit(node.children[0],)
-        self.rhs = [self.var]
+    __slots__ = ('var',)
+
+    type = lex.RETURN
+
+    def __init__(self, num, var):
+        super(ReturnStmt, self).__init__(num)
+        self.var = var
+
+    @property
+    def rhs(self):
+        return [self.var] if isinstance(self.var, str) else []
+
+    def tree(self):
+        return ('return', self.var)
 
     def update(self, values):
-        if isinstance(self.var, str):
-            self.var = values.get(self.var, self.var)
+        """Replace the returned variable with a literal, if in values."""
+        if isinstance(self.var, str) and self.var in values:
+            self.var = values[self.var]
+            return True
+        return False
 
     def generate(self, gotos):
         yield '  return {0};'.format(self.var)
@@ -63,16 +165,34 @@ class ReturnStmt(Statement):
             yield line
 
 class AssignStmt(Statement):
-    def __init__(self, node, num):
-        super(AssignStmt, self).__init__(node, num)
-        self.var = get_varlit(node.children[0], lex.IDENT)
-        self.lhs = [self.var]
-        self.source = get_varlit(node.children[1])
-        self.rhs = [self.source] if isinstance(self.source, str) else []
+    __slots__ = ('var', 'source')
+
+    type = lex.ASSIGN
+
+    def __init__(self, num, var, source):
+        super(AssignStmt, self).__init__(num)
+        self.var = var
+        self.source = source
+
+    @property
+    def lhs(self):
+        return [self.var]
+
+    @property
+    def rhs(self):
+        return [self.source] if isinstance(self.source, str) else []
+
+    def tree(self):
+        return ('ASSIGN', self.var, self.source)
 
     def update(self, values):
-        """Replace RHS variables with literals, if in values; cull any LHS vars."""
+        """
+        Replace RHS variables with literals, if in values; cull any LHS vars.
+
+        Returns True if any RHS variable was replaced.
 
+        """
+        rhs = self.rhs
         if isinstance(self.source, str):
             self.source = values.get(self.source, self.source)
         if self.var in values:
@@ -83,24 +203,44 @@ class AssignStmt(Statement):
         elif self.var in values:
             del values[self.var]
 
+        return self.rhs != rhs
+
     def generate(self, gotos):
         yield '  {0} = {1};'.format(self.var, self.source)
         for line in super(AssignStmt, self).generate(gotos):
             yield line
 
 class AssignOpStmt(Statement):
-    def __init__(self, node, num):
-        super(AssignOpStmt, self).__init__(node, num)
-        self.var = get_varlit(node.children[0], lex.IDENT)
-        self.lhs = [self.var]
-        self.operator = node.children[2].text
-        self.operands = [get_varlit(node.children[1]),
-                         get_varlit(node.children[3])]
-        self.rhs = [oper for oper in self.operands if isinstance(oper, str)]
+    __slots__ = ('var', 'operator', 'operands')
+
+    type = lex.ASSIGNOP
+
+    def __init__(self, num, var, op1, operator, op2):
+        super(AssignOpStmt, self).__init__(num)
+        self.var = var
+        self.operator = operator
+        self.operands = [op1, op2]
+
+    @property
+    def lhs(self):
+        return [self.var]
+
+    @property
+    def rhs(self):
+        return [oper for oper in self.operands if isinstance(oper, str)]
+
+    def tree(self):
+        return ('ASSIGNOP', self.var, self.operands[0], self.operator,
+                self.operands[1])
 
     def update(self, values):
-        """Replace RHS variables with literals, if in values; cull any LHS vars."""
+        """
+        Replace RHS variables with literals, if in values; cull any LHS vars.
+
+        Returns True if any RHS variable was replaced.
 
+        """
+        rhs = self.rhs
         for i, op in enumerate(self.operands):
             if isinstance(op, str):
                 self.operands[i] = values.get(self.operands[i], self.operands[i])
@@ -108,17 +248,17 @@ class AssignOpStmt(Statement):
         op1 = self.operands[0]
         op2 = self.operands[1]
 
+        result = None
         if isinstance(op1, int) and isinstance(op2, int):
-            result = OPERATORS[self.operator](op1, op2)
-            if result is True:
-                result = 1
-            elif result is False:
-                result = 0
-            assert isinstance(result, int)
+            result = fold(self.operator, op1, op2)
+
+        if result is not None:
             values[self.var] = result
         elif self.var in values:
             del values[self.var]
 
+        return self.rhs != rhs
+
     def generate(self, gotos):
         yield '  {0} = {1} {2} {3};'.format(self.var, self.operands[0],
                                             self.operator, self.operands[1])
@@ -126,15 +266,27 @@ class AssignOpStmt(Statement):
             yield line
 
 class IfGotoStmt(Statement):
-    def __init__(self, node, num):
-        super(IfGotoStmt, self).__init__(node, num)
-        self.cond = get_varlit(node.children[1],)
-        self.rhs = [self.cond]
+    __slots__ = ('label', 'cond')
+
+    type = lex.IFGOTO
+
+    def __init__(self, num, label, cond):
+        super(IfGotoStmt, self).__init__(num)
+        self.label = label  # the target's label in the source
+        self.cond = cond
+
+    @property
+    def rhs(self):
+        return [self.cond]
+
+    def tree(self):
+        return ('IFGOTO', self.label, self.cond)
 
     def get_next(self, values):
         """Returns None if next is undecidable."""
-        if self.cond in values:
-            return IFGOTO if values[self.cond] != 0 else LINR
+        cond = values.get(self.cond, self.cond)
+        if isinstance(cond, int):
+            return IFGOTO if cond != 0 else LINR
         return None
 
     def generate(self, gotos):
@@ -143,29 +295,120 @@ class IfGotoStmt(Statement):
             yield line
 
 class GotoStmt(Statement):
+    __slots__ = ('label',)
+
+    type = lex.GOTO
+
+    def __init__(self, num, label):
+        super(GotoStmt, self).__init__(num)
+        self.label = label  # the target's label in the source
+
+    def tree(self):
+        return ('goto', self.label)
+
     def generate(self, gotos):
         yield '  goto L{0};'.format(self.next[GOTO])
 
 class LabelStmt(Statement):
-    def __init__(self, node, num):
-        super(LabelStmt, self).__init__(node, num)
-        self.name = node.text
+    __slots__ = ('name',)
+
+    type = lex.REFLABEL
+
+    def __init__(self, num, name):
+        super(LabelStmt, self).__init__(num)
+        self.name = name
+
+    def tree(self):
+        return ('REFLABEL', self.name)
 
     def generate(self, gotos):
         yield '  {0};'.format(self.name)
         for line in super(LabelStmt, self).generate(gotos):
             yield line
 
+class ExitStmt(Statement):
+    """
+    The end of a part of a program compiled apart from the rest, reading the
+    variables live after it.
+
+    It stands for the code following the part, so that passes keep what
+    that code needs; it generates nothing, as that code follows anyway.
+
+    """
+    __slots__ = ('variables',)
+
+    type = None
+
+    def __init__(self, num, variables):
+        super(ExitStmt, self).__init__(num)
+        self.variables = list(variables)
+
+    @property
+    def rhs(self):
+        return list(self.variables)
+
+    def tree(self):
+        return ('EXIT',) + tuple(self.variables)
+
+    def generate(self, gotos):
+        return iter(())
+
+class RegionStmt(Statement):
+    """
+    Parts of a program compiled apart, one straight after another, standing
+    in the graph of the code around them: as if reading the variables they
+    read, and assigning those they may assign.  As they may also leave those
+    as they were, its operands are both; but liveness only flows through the
+    latter.
+
+    It generates a marker line, `#index`, for the code of each part (by its
+    index) to replace.
+
+    """
+    __slots__ = ('indices', 'reads', 'writes')
+
+    type = None
+
+    def __init__(self, num, indices, reads, writes):
+        super(RegionStmt, self).__init__(num)
+        self.indices = list(indices)
+        self.reads = sorted(reads)
+        self.writes = sorted(writes)
+
+    @property
+    def lhs(self):
+        return list(self.writes)
+
+    @property
+    def rhs(self):
+        return sorted(set(self.reads) | set(self.writes))
+
+    def tree(self):
+        return ('REGION',) + tuple(self.indices)
+
+    def generate(self, gotos):
+        for index in self.indices:
+            yield '#{0}'.format(index)
+        for line in super(RegionStmt, self).generate(gotos):
+            yield line
+
 def get_statement(node, num):
+    """Build the Statement for a node of the ANTLR parse tree."""
+    children = node.children
     if node.type == lex.ASSIGN:
-        return AssignStmt(node, num)
+        return AssignStmt(num, get_varlit(children[0], lex.IDENT),
+                          get_varlit(children[1]))
     elif node.type == lex.ASSIGNOP:
-        return AssignOpStmt(node, num)
+        return AssignOpStmt(num, get_varlit(children[0], lex.IDENT),
+                            get_varlit(children[1]), children[2].text,
+                            get_varlit(children[3]))
     elif node.type == lex.GOTO:
-        return GotoStmt(node, num)
+        assert children[0].type == lex.LABEL
+        return GotoStmt(num, children[0].text)
     elif node.type == lex.IFGOTO:
-        return IfGotoStmt(node, num)
+        assert children[0].type == lex.LABEL
+        return IfGotoStmt(num, children[0].text, get_varlit(children[1],))
     elif node.type == lex.RETURN:
-        return ReturnStmt(node, num)
+        return ReturnStmt(num, get_varlit(children[0],))
     elif node.type == lex.REFLABEL:
-        return LabelStmt(node, num)
+        return LabelStmt(num, children[0].text)
@@ -0,0 +1,117 @@
+import inspect
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+from timeit import default_timer as clock
+
+class PassStats(object):
+    """Accumulated measurements of one pass (or other stage) of the optimiser."""
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.changed = 0  # calls which reported changing the graph
+        self.time = 0.0   # wall time, in seconds
+        self.counters = OrderedDict()
+
+    def as_dict(self):
+        return OrderedDict([
+            ('calls', self.calls),
+            ('changed', self.changed),
+            ('time', self.time),
+            ('counters', OrderedDict(self.counters)),
+        ])
+
+class Stats(object):
+    """
+    Timings and counters for the stages of a compilation.
+
+    Stages are measured with `measure`; counters bumped with `count` are
+    attributed to the innermost stage being measured.
+
+    """
+    def __init__(self):
+        self.passes = OrderedDict()
+        self._active = []
+
+    def __getitem__(self, name):
+        entry = self.passes.get(name)
+        if entry is None:
+            entry = self.passes[name] = PassStats(name)
+        return entry
+
+    @contextmanager
+    def measure(self, name, call=True):
+        entry = self[name]
+        if call:
+            entry.calls += 1
+        self._active.append(entry)
+        start = clock()
+        try:
+            yield entry
+        finally:
+            entry.time += clock() - start
+            self._active.pop()
+
+    def count(self, counter, n=1):
+        if self._active and n:
+            counters = self._active[-1].counters
+            counters[counter] = counters.get(counter, 0) + n
+
+    def as_dict(self):
+        return OrderedDict((name, entry.as_dict())
+                           for name, entry in self.passes.iteritems())
+
+    def merge(self, data):
+        """Add in the measurements of another Stats, given by its as_dict()."""
+        for name, values in data.iteritems():
+            entry = self[name]
+            entry.calls += values['calls']
+            entry.changed += values['changed']
+            entry.time += values['time']
+            for counter, n in values['counters'].iteritems():
+                entry.counters[counter] = entry.counters.get(counter, 0) + n
+
+    def report(self):
+        """Yield the lines of a human-readable table of the measurements."""
+        yield '{0:<16} {1:>6} {2:>7} {3:>10}  {4}'.format(
+            'stage', 'calls', 'changed', 'time (ms)', 'counters')
+        for name, entry in self.passes.iteritems():
+            counters = ', '.join('{0}={1}'.format(k, v)
+                                 for k, v in entry.counters.iteritems())
+            yield '{0:<16} {1:>6} {2:>7} {3:>10.3f}  {4}'.format(
+                name, entry.calls, entry.changed, entry.time * 1000, counters)
+
+def instrumented(method):
+    """
+    Measure calls of a CFGraph method in the graph's `stats`.
+
+    Methods returning True count as having changed the graph.  Generator
+    methods (eg. `generate`) are timed only while they run, not while their
+    consumer does.
+
+    """
+    name = method.__name__
+
+    if inspect.isgeneratorfunction(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            gen = method(self, *args, **kwargs)
+            call = True
+            while True:
+                with self.stats.measure(name, call):
+                    try:
+                        item = next(gen)
+                    except StopIteration:
+                        return
+                call = False
+                yield item
+        return wrapper
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.stats.measure(name) as entry:
+            result = method(self, *args, **kwargs)
+        if result:
+            entry.changed += 1
+        return result
+    return wrapper
@@ -0,0 +1,47 @@
+"""
+Token types of the Jump grammar, without importing the ANTLR runtime.
+
+The values are read from the `Jump.tokens` file ANTLR writes alongside the
+generated parser, so they agree with the types in ANTLR trees; without a
+build they fall back to the defaults below (which the hand-written frontend
+is equally happy with).
+
+"""
+import os
+import re
+
+SCOL = 4
+COL = 5
+EQUAL = 6
+GOTO = 7
+RETURN = 8
+IF = 9
+PROGRAM = 10
+ASSIGN = 11
+ASSIGNOP = 12
+STATEMENT = 13
+OPEQUAL = 14
+IFGOTO = 15
+REFLABEL = 16
+LABEL = 17
+IDENT = 18
+NUM = 19
+OP = 20
+WS = 21
+
+TOKENS_FILE = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'build', 'Jump.tokens')
+
+def _load(path):
+    try:
+        with open(path) as f:
+            lines = f.readlines()
+    except IOError:
+        return
+
+    for line in lines:
+        match = re.match(r'([A-Z][A-Z_]*)=(\d+)$', line.strip())
+        if match:
+            globals()[match.group(1)] = int(match.group(2))
+
+_load(TOKENS_FILE)
@@ -0,0 +1,103 @@
+"""
+Walks over the edge arrays of a CFGraph.
+
+Nodes are visited by ID and marked in a bytearray, so every walk is linear
+in the size of the graph, and iterative, so arbitrarily deep graphs are fine.
+
+"""
+from collections import deque
+
+def reachable(graph, roots=None):
+    """
+    Mark the nodes reachable from roots (by default, the start node).
+
+    Returns a bytearray indexed by node ID, 1 for reachable nodes.
+
+    """
+    if roots is None:
+        roots = [graph.start] if graph.start is not None else []
+
+    succ = graph.succ
+    seen = bytearray(len(graph.nodes))
+    stack = []
+    for root in roots:
+        if not seen[root.num]:
+            seen[root.num] = 1
+            stack.append(root.num)
+
+    while stack:
+        num = stack.pop()
+        for edges in succ:
+            target = edges[num]
+            if target >= 0 and not seen[target]:
+                seen[target] = 1
+                stack.append(target)
+
+    return seen
+
+def breadth_first(graph, root=None):
+    """
+    Return the (statement, distance) pairs of a breadth-first walk.
+
+    Distances are in edges from root (by default, the start node), and only
+    nodes reachable from it are included.
+
+    """
+    root = root if root is not None else graph.start
+    if root is None:
+        return []
+
+    nodes = graph.nodes
+    succ = graph.succ
+    seen = bytearray(len(nodes))
+    seen[root.num] = 1
+    found = []
+    todo = deque([(root.num, 0)])
+    while todo:
+        num, dist = todo.popleft()
+        found.append((nodes[num], dist))
+        for edges in succ:
+            target = edges[num]
+            if target >= 0 and not seen[target]:
+                seen[target] = 1
+                todo.append((target, dist + 1))
+
+    return found
+
+def reverse_postorder(graph):
+    """
+    Return the graph's statements in reverse postorder.
+
+    Statements not reachable from the start node are appended afterwards (in
+    their own reverse postorder) so analyses still cover them.
+
+    """
+    nodes = graph.nodes
+    succ = graph.succ
+    visited = bytearray(len(nodes))
+    order = []
+
+    roots = [graph.start.num] if graph.start is not None else []
+    roots.extend(stmt.num for stmt in graph.statements)
+    for root in roots:
+        if visited[root]:
+            continue
+        visited[root] = 1
+        postorder = []
+        stack = [(root, 0)]  # (node, edge type to try next)
+        while stack:
+            node, edge_type = stack.pop()
+            while edge_type < len(succ):
+                child = succ[edge_type][node]
+                edge_type += 1
+                if child >= 0 and not visited[child]:
+                    visited[child] = 1
+                    stack.append((node, edge_type))
+                    stack.append((child, 0))
+                    break
+            else:
+                postorder.append(node)
+
+        order.extend(nodes[num] for num in reversed(postorder))
+
+    return order
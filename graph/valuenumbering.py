@@ -0,0 +1,239 @@
+"""
+Value numbering, over the dominator tree.
+
+Each distinct value the program computes is given a number: every literal,
+every variable's value where it is not known to equal anything else, and
+every operation on numbered values.  Two expressions with the same number
+compute the same value, so a later one can be replaced by a variable still
+holding it (or a literal), and an assignment of the value a variable holds
+already can go.  Operations on literals are folded, and identities such as
+`x + 0`, `x * 1` and `x - x` simplified, before they are numbered.
+
+Numbers of expressions hold anywhere, but which variables hold which
+numbers depends on the point in the program.  The walk over the dominator
+tree starts each block with what held at the end of its immediate dominator,
+less every variable assigned on some path between the two; so a run of
+blocks each with a single predecessor is numbered as one, and a value
+computed before a branch or loop is still known after it, unless changed.
+
+"""
+from graph.blocks import BlockGraph
+from graph.dominators import DominatorTree
+from graph.statement import AssignStmt, AssignOpStmt, IfGotoStmt, ReturnStmt
+from graph.statement import fold
+
+COMMUTATIVE = frozenset(['+', '*', '=='])
+MIRRORED = {'>': '<'}  # `a > b` is numbered as `b < a`
+
+class ValueNumbering(object):
+    """
+    Value numbering of a graph's reachable statements.
+
+    `rewrites` lists the (statement, replacement) pairs of every statement
+    which can be simplified: the replacement is a new statement (with the
+    same `num`) computing the same value more simply, or None if the
+    statement can be dropped altogether.
+
+    """
+    def __init__(self, graph, blocks=None, dominators=None):
+        self.graph = graph
+        self.blocks = blocks if blocks is not None else BlockGraph(graph)
+        self.dominators = dominators if dominators is not None \
+                          else DominatorTree(self.blocks)
+        self.rewrites = []
+
+        self.count = 0
+        self.numbers = {}   # ('#', literal) or (operator, number, number) -> number
+        self.constant = {}  # number -> literal
+        self.holders = {}   # number -> variables assigned it, in order
+        self.current = {}   # variable -> number, where the walk is
+        self.log = []       # (variable, previous number) of changes to current
+
+        self.walk()
+
+    def walk(self):
+        dominators = self.dominators
+        entry = self.blocks.entry
+        if entry is None:
+            return
+
+        stack = [(entry, None)]
+        while stack:
+            block, mark = stack.pop()
+            if mark is not None:
+                self.undo(mark)
+                continue
+
+            stack.append((block, len(self.log)))
+            for var in self.assigned_between(block):
+                self.assign(var, None)
+            for stmt in block.statements:
+                self.number(stmt)
+            stack.extend((child, None)
+                         for child in reversed(dominators.children[block.num]))
+
+    def assigned_between(self, block):
+        """The variables assigned on paths from block's immediate dominator."""
+        dominators = self.dominators
+        idom = dominators.idom[block.num]
+        if idom == block.num or [pred.num for pred in block.preds] == [idom]:
+            return set()
+
+        assigned = set()
+        seen = set([idom])
+        stack = [block]
+        while stack:
+            for pred in stack.pop().preds:
+                if pred.num not in seen and dominators.pre[pred.num] >= 0:
+                    seen.add(pred.num)
+                    stack.append(pred)
+                    for stmt in pred.statements:
+                        assigned.update(stmt.lhs)
+        return assigned
+
+    def undo(self, mark):
+        log = self.log
+        current = self.current
+        while len(log) > mark:
+            var, number = log.pop()
+            if number is None:
+                current.pop(var, None)
+            else:
+                current[var] = number
+
+    def assign(self, var, number):
+        """Record that var now holds value number (None for unknown)."""
+        self.log.append((var, self.current.get(var)))
+        if number is None:
+            self.current.pop(var, None)
+            return
+        self.current[var] = number
+        holders = self.holders.setdefault(number, [])
+        if var not in holders:
+            holders.append(var)
+
+    def lookup(self, key):
+        """The number of key, numbering it if new."""
+        number = self.numbers.get(key)
+        if number is None:
+            number = self.numbers[key] = self.count
+            self.count += 1
+            if key[0] == '#':
+                self.constant[number] = key[1]
+        return number
+
+    def value(self, operand):
+        """The number of the value of a literal or variable, where the walk is."""
+        if isinstance(operand, int):
+            return self.lookup(('#', operand))
+        number = self.current.get(operand)
+        if number is None:
+            # unknown here; but the same unknown until assigned
+            number = self.count
+            self.count += 1
+            self.assign(operand, number)
+        return number
+
+    def name(self, number, default=None):
+        """
+        The best operand for value number: a literal, or else default if
+        given, or else its first holder.
+
+        Operands are only ever replaced by literals, then; replacing a read
+        of one variable with another holding the same value is left to copy
+        propagation (see `CFGraph.CP`), which knows better which will do.
+
+        """
+        if number in self.constant:
+            return self.constant[number]
+        if default is not None:
+            return default
+        current = self.current
+        for var in self.holders.get(number, ()):
+            if current.get(var) == number:
+                return var
+        return default
+
+    def evaluate(self, op1, operator, op2):
+        """
+        Return the number of `op1 operator op2`, and the operand it reduces
+        to if it can be simplified to one (or else None).
+
+        """
+        num1 = self.value(op1)
+        num2 = self.value(op2)
+        lit1 = self.constant.get(num1)
+        lit2 = self.constant.get(num2)
+
+        result = None
+        if lit1 is not None and lit2 is not None:
+            result = fold(operator, lit1, lit2)
+        elif operator == '+' and lit1 == 0 or operator == '*' and lit1 == 1:
+            return num2, self.name(num2, op2)
+        elif operator in ('+', '-') and lit2 == 0 or \
+                operator in ('*', '/') and lit2 == 1:
+            return num1, self.name(num1, op1)
+        elif operator == '*' and 0 in (lit1, lit2):
+            result = 0
+        elif num1 == num2 and operator in ('-', '<', '>', '=='):
+            result = int(operator == '==')
+        if result is not None:
+            return self.lookup(('#', result)), result
+
+        if operator in MIRRORED:
+            operator, num1, num2 = MIRRORED[operator], num2, num1
+        if operator in COMMUTATIVE and num2 < num1:
+            num1, num2 = num2, num1
+        number = self.lookup((operator, num1, num2))
+        return number, self.name(number)
+
+    def number(self, stmt):
+        """Number stmt's value, noting any rewrite of it."""
+        num = stmt.num
+        replacement = stmt
+
+        if isinstance(stmt, AssignStmt):
+            number = self.value(stmt.source)
+            source = self.name(number, stmt.source)
+            if source != stmt.source:
+                replacement = AssignStmt(num, stmt.var, source)
+
+        elif isinstance(stmt, AssignOpStmt):
+            op1, op2 = stmt.operands
+            number, source = self.evaluate(op1, stmt.operator, op2)
+            if source is not None:
+                replacement = AssignStmt(num, stmt.var, source)
+            else:
+                op1 = self.name(self.value(op1), op1)
+                op2 = self.name(self.value(op2), op2)
+                if [op1, op2] != stmt.operands:
+                    replacement = AssignOpStmt(num, stmt.var, op1,
+                                               stmt.operator, op2)
+
+        elif isinstance(stmt, (IfGotoStmt, ReturnStmt)):
+            attr = 'cond' if isinstance(stmt, IfGotoStmt) else 'var'
+            operand = getattr(stmt, attr)
+            if isinstance(operand, str):
+                operand = self.name(self.value(operand), operand)
+                if operand != getattr(stmt, attr):
+                    replacement = IfGotoStmt(num, stmt.label, operand) \
+                                  if attr == 'cond' \
+                                  else ReturnStmt(num, operand)
+            return self.note(stmt, replacement)
+
+        else:
+            # anything else assigning (as a RegionStmt may) leaves its
+            # variables holding who knows what
+            for var in stmt.lhs:
+                self.assign(var, None)
+            return
+
+        if self.current.get(stmt.var) == number:
+            replacement = None  # assigns what the variable holds already
+        else:
+            self.assign(stmt.var, number)
+        self.note(stmt, replacement)
+
+    def note(self, stmt, replacement):
+        if replacement is not stmt:
+            self.rewrites.append((stmt, replacement))
@@ -0,0 +1,223 @@
+from collections import namedtuple
+
+from graph import JumpRuntimeError
+from graph import LINR, GOTO, IFGOTO
+from graph.statement import AssignStmt, AssignOpStmt, IfGotoStmt, ReturnStmt
+from graph.statement import OPERATORS
+from graph.traversal import reachable, reverse_postorder
+
+# opcodes; every instruction is a tuple (opcode, dest, a, b, next, alt), where
+# dest, a and b are register numbers, `next` is the index of the following
+# instruction (-1 to halt) and `alt` is the operator function of an OP, or the
+# branch target of an IF
+MOVE, OP, IF, RET = range(4)
+
+Execution = namedtuple('Execution', 'value steps returned')
+
+class Program(object):
+    """
+    A CFGraph compiled to a flat array of instructions.
+
+    Variables and literals are all given registers (literals are loaded once,
+    before the run), so instructions need never tell them apart; jumps are
+    resolved to instruction indices.  Variables read before being assigned
+    hold 0.
+
+    """
+    def __init__(self, graph):
+        self.registers = {}  # variable name or literal -> register
+        self.initial = []    # initial register contents
+        self.code = []
+        self.stmts = []      # the statement each instruction came from
+
+        if graph.start is not None:
+            self.compile(graph)
+
+    def register(self, operand):
+        reg = self.registers.get(operand)
+        if reg is None:
+            reg = self.registers[operand] = len(self.initial)
+            self.initial.append(operand if isinstance(operand, int) else 0)
+        return reg
+
+    def compile(self, graph):
+        # only statements reachable from the start are executable; they come
+        # first in reverse postorder, the start given pc 0
+        seen = reachable(graph)
+        self.stmts = [stmt for stmt in reverse_postorder(graph)
+                      if seen[stmt.num]]
+        pc = dict((stmt, i) for i, stmt in enumerate(self.stmts))
+
+        def target(stmt):
+            return pc[stmt] if stmt is not None else -1
+
+        for stmt in self.stmts:
+            following = target(stmt.next[LINR] or stmt.next[GOTO])
+
+            if isinstance(stmt, AssignStmt):
+                insn = (MOVE, self.register(stmt.var),
+                        self.register(stmt.source), None, following, None)
+            elif isinstance(stmt, AssignOpStmt):
+                a, b = stmt.operands
+                insn = (OP, self.register(stmt.var), self.register(a),
+                        self.register(b), following, OPERATORS[stmt.operator])
+            elif isinstance(stmt, IfGotoStmt):
+                insn = (IF, None, self.register(stmt.cond), None, following,
+                        target(stmt.next[IFGOTO]))
+            elif isinstance(stmt, ReturnStmt):
+                insn = (RET, None, self.register(stmt.var), None, -1, None)
+            else:
+                # labels and the like; just pass control on
+                insn = (MOVE, self.register(0), self.register(0), None,
+                        following, None)
+
+            self.code.append(insn)
+
+    def run(self, max_steps=None, profile=None):
+        """
+        Execute the program, returning an Execution.
+
+        Raises JumpRuntimeError on division by zero, or if more than max_steps
+        instructions would be executed.  If profile (an EdgeProfile) is given,
+        the edges taken are counted into it, even if the run fails.
+
+        """
+        if profile is not None:
+            return self.profile_run(max_steps, profile)
+
+        code = self.code
+        regs = list(self.initial)
+        limit = max_steps if max_steps is not None else -1
+        steps = 0
+        pc = 0 if code else -1
+
+        try:
+            while pc >= 0:
+                if steps == limit:
+                    raise JumpRuntimeError(
+                        "Exceeded {0} steps.".format(max_steps))
+                steps += 1
+
+                opcode, dest, a, b, following, alt = code[pc]
+                if opcode == OP:
+                    regs[dest] = alt(regs[a], regs[b])
+                    pc = following
+                elif opcode == MOVE:
+                    regs[dest] = regs[a]
+                    pc = following
+                elif opcode == IF:
+                    pc = alt if regs[a] else following
+                else:
+                    return Execution(int(regs[a]), steps, True)
+        except ZeroDivisionError:
+            raise JumpRuntimeError("Division by zero in statement #{0}."
+                                   .format(self.stmts[pc].num))
+
+        # fell off the end of the program
+        return Execution(None, steps, False)
+
+    def profile_run(self, max_steps, profile):
+        """As `run`, counting how often each instruction runs and branches."""
+        code = self.code
+        regs = list(self.initial)
+        limit = max_steps if max_steps is not None else -1
+        steps = 0
+        pc = 0 if code else -1
+        visits = [0] * len(code)
+        branches = [0] * len(code)  # times each IF jumped
+
+        try:
+            while pc >= 0:
+                visits[pc] += 1
+                if steps == limit:
+                    raise JumpRuntimeError(
+                        "Exceeded {0} steps.".format(max_steps))
+                steps += 1
+
+                opcode, dest, a, b, following, alt = code[pc]
+                if opcode == OP:
+                    regs[dest] = alt(regs[a], regs[b])
+                    pc = following
+                elif opcode == MOVE:
+                    regs[dest] = regs[a]
+                    pc = following
+                elif opcode == IF:
+                    if regs[a]:
+                        branches[pc] += 1
+                        pc = alt
+                    else:
+                        pc = following
+                else:
+                    return Execution(int(regs[a]), steps, True)
+        except ZeroDivisionError:
+            raise JumpRuntimeError("Division by zero in statement #{0}."
+                                   .format(self.stmts[pc].num))
+        finally:
+            self.count_edges(visits, branches, pc, profile)
+
+        return Execution(None, steps, False)
+
+    def count_edges(self, visits, branches, last, profile):
+        """
+        Add to profile the edges taken in a run, given the times each
+        instruction ran and each IF jumped, and the instruction it stopped at.
+
+        """
+        stmts = self.stmts
+        for pc, (opcode, dest, a, b, following, alt) in enumerate(self.code):
+            n = visits[pc]
+            if pc == last:
+                n -= 1  # stopped there, not passing control on
+            if not n or opcode == RET:
+                continue
+            if opcode == IF:
+                if branches[pc]:
+                    profile.add(stmts[pc], stmts[alt], branches[pc])
+                n -= branches[pc]
+            if n and following >= 0:
+                profile.add(stmts[pc], stmts[following], n)
+
+def execute(graph, max_steps=None, profile=None):
+    """Compile and run a CFGraph, returning an Execution."""
+    return Program(graph).run(max_steps, profile)
+
+def interpret(graph, max_steps=None):
+    """
+    Run a CFGraph by walking its statements, returning an Execution.
+
+    The plainest evaluation there is -- variables in a dict, operators looked
+    up by name at every step -- kept as a reference for the faster engines.
+
+    """
+    values = {}
+    limit = max_steps if max_steps is not None else -1
+    steps = 0
+
+    def value(operand):
+        return values.get(operand, 0) if isinstance(operand, str) else operand
+
+    stmt = graph.start
+    while stmt is not None:
+        if steps == limit:
+            raise JumpRuntimeError("Exceeded {0} steps.".format(max_steps))
+        steps += 1
+
+        if isinstance(stmt, ReturnStmt):
+            return Execution(int(value(stmt.var)), steps, True)
+        if isinstance(stmt, AssignStmt):
+            values[stmt.var] = value(stmt.source)
+        elif isinstance(stmt, AssignOpStmt):
+            op1, op2 = stmt.operands
+            try:
+                values[stmt.var] = OPERATORS[stmt.operator](value(op1),
+                                                            value(op2))
+            except ZeroDivisionError:
+                raise JumpRuntimeError("Division by zero in statement #{0}."
+                                       .format(stmt.num))
+        elif isinstance(stmt, IfGotoStmt) and value(stmt.cond):
+            stmt = stmt.next[IFGOTO]
+            continue
+        stmt = stmt.next[LINR] or stmt.next[GOTO]
+
+    # fell off the end of the program
+    return Execution(None, steps, False)
@@ -1,41 +1,820 @@
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import socket
+import SocketServer
 import sys
+import tempfile
+import threading
+import time
+import traceback
+from collections import namedtuple, OrderedDict
+from contextlib import contextmanager
+from cStringIO import StringIO
+from itertools import islice
+from timeit import default_timer as clock
 
-import antlr3
-from build.JumpLexer import JumpLexer
-from build.JumpParser import JumpParser
+from graph import JumpRuntimeError, JumpSyntaxError
+from graph.cache import CompileCache, MemoryCache
+from graph.cache import DEFAULT_DIR, DEFAULT_ENTRIES, DEFAULT_SIZE
 from graph.cfg import CFGraph
+from graph.incremental import IncrementalCompiler
+from graph.layout import EdgeProfile
+from graph.parser import parse as parse_fast
+from graph.passes import PassManager, PIPELINES
+from graph import pycompile
+from graph.stats import Stats
+from graph.vm import execute
 
-def main(fileobj):
-    char_stream = antlr3.ANTLRInputStream(fileobj)
-    tokens = antlr3.CommonTokenStream(JumpLexer(char_stream))
-    parser = JumpParser(tokens)
-    root = parser.prog()
-
-    graph = CFGraph(root.tree)
-
-    optimised = False
-    code = [line for line in graph.generate()]
-    while not optimised:
-        graph.optimise(True)
-        current_code = [line for line in graph.generate()]
-        if code == current_code:
-            optimised = True
+FRONTENDS = ('antlr', 'fast')
+
+SOURCE_EXT = '.jmp'
+OUTPUT_EXT = '.out'
+DOT_EXT = '.dot'
+DOT_FILE = 'cfg.dot'  # where a single program's dot file goes by default
+
+TRAIN_STEPS = 10 ** 6  # default bound on training runs
+WATCH_INTERVAL = 0.5  # seconds between looks at watched files
+BUFFER_SIZE = 1 << 16   # bytes, for output files
+CHUNK_LINES = 4096  # lines generated at a time, when also caching them
+
+Compilation = namedtuple('Compilation',
+                         'output dot graph converged iterations profile')
+
+# how to draw a dot file: by blocks rather than statements, and with at most
+# max_nodes nodes (None for all)
+DotOptions = namedtuple('DotOptions', 'blocks max_nodes')
+
+# how --run executes the optimised program
+ENGINES = {'vm': execute, 'python': pycompile.execute}
+
+def parse(fileobj, stats=None, frontend='antlr'):
+    """
+    Parse the Jump program in fileobj, returning its CFGraph.
+
+    The 'antlr' frontend uses the generated parser; the 'fast' one is the
+    hand-written frontend in graph.parser, which never imports ANTLR at all.
+
+    """
+    stats = stats if stats is not None else Stats()
+
+    if frontend == 'fast':
+        with stats.measure('parse'):
+            statements = parse_fast(fileobj.read())
+        with stats.measure('build'):
+            return CFGraph(statements, stats)
+
+    import antlr3
+    from build.JumpLexer import JumpLexer
+    from build.JumpParser import JumpParser
+
+    with stats.measure('parse'):
+        char_stream = antlr3.ANTLRInputStream(fileobj)
+        tokens = antlr3.CommonTokenStream(JumpLexer(char_stream))
+        parser = JumpParser(tokens)
+        root = parser.prog()
+
+    with stats.measure('build'):
+        return CFGraph.from_tree(root.tree, stats)
+
+def write_lines(lines, fileobj):
+    for line in lines:
+        fileobj.write(line)
+        fileobj.write('\n')
+
+class Tee(object):
+    """A file writing to each of files in turn."""
+    def __init__(self, *files):
+        self.files = files
+
+    def write(self, text):
+        for f in self.files:
+            f.write(text)
+
+@contextmanager
+def replacing(path):
+    """
+    Open a temporary file for the new contents of path, renamed over path
+    once the block succeeds; should it fail, path is left as it was.
+
+    Yields None for a path of None, and opens what is not a regular file (a
+    device or pipe, say) as it is.
+
+    """
+    if path is None:
+        yield None
+        return
+    path = os.path.realpath(path)
+    if os.path.exists(path) and not os.path.isfile(path):
+        with open(path, 'w', BUFFER_SIZE) as f:
+            yield f
+        return
+
+    try:
+        mode = os.stat(path).st_mode & 0777
+    except OSError:
+        mask = os.umask(0)
+        os.umask(mask)
+        mode = 0666 & ~mask
+    directory, name = os.path.split(path)
+    fd, temp = tempfile.mkstemp(prefix='.' + name + '.', suffix='.tmp',
+                                dir=directory)
+    try:
+        with os.fdopen(fd, 'w', BUFFER_SIZE) as f:
+            yield f
+        os.chmod(temp, mode)
+        os.rename(temp, path)
+    except:
+        os.remove(temp)
+        raise
+
+def compile_source(text, stats=None, level='O2', max_iterations=None,
+                   debug=False, frontend='antlr', cache=None, need_graph=False,
+                   profile=None, train=False, max_steps=None, out=None,
+                   dot=None, dot_out=None):
+    """
+    Optimise the Jump program in text, returning a Compilation.
+
+    The generated code is written to out as it is generated, if given, and
+    otherwise returned as the Compilation's list of lines.  A dot file is
+    only drawn if dot (a DotOptions) is given: likewise to dot_out, or else
+    returned as the Compilation's text.
+
+    With a cache, a hit skips parsing and optimisation altogether (leaving
+    the Compilation's graph None) unless need_graph; results which reached a
+    fixpoint are stored for next time, written to the cache as they are to
+    out and dot_out.  Debugging output bypasses the cache.
+
+    Code is laid out by profile (an EdgeProfile) if given.  With train, the
+    optimised program is instead run (for up to max_steps instructions) to
+    collect a profile, which it is then laid out by (max_steps defaulting to
+    TRAIN_STEPS, as a program need not halt); training bypasses the cache, as
+    the run is the point.
+
+    """
+    stats = stats if stats is not None else Stats()
+
+    key = None
+    if cache is not None and not debug and not train:
+        digest = profile.digest() if profile is not None else None
+        key = cache.key(text, level=level, max_iterations=max_iterations,
+                        frontend=frontend, profile=digest,
+                        dot=list(dot) if dot is not None else None)
+        if not need_graph:
+            with stats.measure('cache'):
+                entry = cache.get(key, dot=dot is not None)
+                stats.count('hits' if entry else 'misses')
+            if entry:
+                output, dot_text = entry
+                if out is not None:
+                    write_lines(output, out)
+                    output = None
+                if dot_out is not None and dot_text is not None:
+                    dot_out.write(dot_text)
+                    dot_text = None
+                return Compilation(output, dot_text, None, True, 0, profile)
+
+    graph = parse(StringIO(text), stats, frontend)
+    graph.profile = profile
+
+    manager = PassManager(graph, level, max_iterations, debug)
+    converged = manager.run()
+
+    if train:
+        steps = max_steps if max_steps is not None else TRAIN_STEPS
+        graph.profile = train_profile(graph, stats, steps)
+        graph.JE()
+
+    entry = cache.writer(key) if key is not None and converged else None
+    try:
+        output = None
+        if out is None:
+            output = list(graph.generate())
+            if entry is not None:
+                entry.add(output)
+        elif entry is None:
+            write_lines(graph.generate(), out)
+        else:
+            lines = graph.generate()
+            chunk = list(islice(lines, CHUNK_LINES))
+            while chunk:
+                write_lines(chunk, out)
+                entry.add(chunk)
+                chunk = list(islice(lines, CHUNK_LINES))
+
+        dot_text = None
+        if dot is not None:
+            if dot_out is None:
+                buf = StringIO()
+                graph.dotfile(buf, dot.blocks, dot.max_nodes)
+                dot_text = buf.getvalue()
+                if entry is not None:
+                    entry.write(dot_text)
+            else:
+                graph.dotfile(Tee(dot_out, entry) if entry is not None
+                              else dot_out, dot.blocks, dot.max_nodes)
+    except:
+        if entry is not None:
+            entry.discard()
+        raise
+
+    if entry is not None:
+        with stats.measure('cache', call=False):
+            entry.commit()
+
+    return Compilation(output, dot_text, graph, converged,
+                       manager.iterations, graph.profile)
+
+def train_profile(graph, stats, max_steps=None):
+    """
+    Run graph, returning an EdgeProfile of the edges it takes.
+
+    A run that fails (counted as such) still profiles the edges taken until
+    then.
+
+    """
+    profile = EdgeProfile()
+    with stats.measure('train'):
+        try:
+            execute(graph, max_steps, profile)
+        except JumpRuntimeError:
+            stats.count('runs_failed')
+        stats.count('edges', len(profile))
+    return profile
+
+def main(fileobj, level='O2', max_iterations=None, debug=False, stats=None,
+         run=False, frontend='antlr', max_steps=None, cache=None,
+         profile=None, train=False, save_profile=None, output=None,
+         dot=None, dot_path=DOT_FILE, engine='vm'):
+    """
+    Optimise the program in fileobj, writing it to the file named output (or
+    stdout), and its dot file (if dot, a DotOptions) to dot_path.  Those
+    files are only replaced if the program compiles.
+
+    """
+    text = fileobj.read()
+    with replacing(output or None) as out, \
+            replacing(dot_path if dot is not None else None) as dot_out:
+        result = compile_source(text, stats, level, max_iterations, debug,
+                                frontend, cache, need_graph=run,
+                                profile=profile, train=train,
+                                max_steps=max_steps,
+                                out=out if out is not None else sys.stdout,
+                                dot=dot, dot_out=dot_out)
+    if out is None:
+        sys.stdout.flush()
+
+    if not result.converged:
+        print >> sys.stderr, 'Warning: no fixpoint after {0} iterations.' \
+                             .format(result.iterations)
+
+    if save_profile:
+        with open(save_profile, 'w') as f:
+            result.profile.dump(f)
+
+    if run:
+        execution = ENGINES[engine](result.graph, max_steps)
+        print >> sys.stderr, 'Returned {0} after {1} instructions.' \
+                             .format(execution.value, execution.steps)
+
+def find_sources(inputs):
+    """
+    Expand a list of files, directories and glob patterns into source files.
+
+    Directories are searched recursively for *.jmp files.  Raises IOError for
+    an input that names nothing.
+
+    """
+    sources = []
+    for name in inputs:
+        if os.path.isdir(name):
+            for dirpath, dirnames, filenames in os.walk(name):
+                dirnames.sort()
+                sources.extend(os.path.join(dirpath, filename)
+                               for filename in sorted(filenames)
+                               if filename.endswith(SOURCE_EXT))
+        elif os.path.exists(name):
+            sources.append(name)
         else:
-            code = current_code
-    
-    print "\n".join(code)
+            matches = sorted(glob.glob(name))
+            if not matches:
+                raise IOError("No such file or directory: '{0}'".format(name))
+            sources.extend(find_sources(matches))
 
-    with open('cfg.dot', 'w') as f:
-        graph.dotfile(f)
+    # keep the first mention of any file
+    seen = set()
+    return [path for path in sources
+            if not (os.path.abspath(path) in seen or
+                    seen.add(os.path.abspath(path)))]
+
+def compile_file(job):
+    """
+    Compile one file of a batch, writing its output (and any dot file) beside
+    it; which are only replaced if it compiles.
+
+    job is a (path, options) pair, options being the keyword arguments of
+    main() (without stats).  Returns a dict describing the outcome; exceptions
+    are reported in it rather than raised, so one bad file cannot take down
+    the pool.
+
+    """
+    path, options = job
+    stats = Stats()
+    result = dict(path=path, ok=False, error=None, warning=None,
+                  execution=None, run_error=None, time=0.0, stats=None,
+                  kept=None)
+    base = os.path.splitext(path)[0]
+
+    start = clock()
+    try:
+        with open(path) as f:
+            text = f.read()
+        dot = options['dot']
+        with replacing(base + OUTPUT_EXT) as out, \
+                replacing(base + DOT_EXT if dot is not None else None) \
+                as dot_out:
+            compiled = compile_source(text, stats, options['level'],
+                                      options['max_iterations'],
+                                      frontend=options['frontend'],
+                                      cache=options['cache'],
+                                      need_graph=options['run'],
+                                      train=options['train'],
+                                      max_steps=options['max_steps'],
+                                      out=out, dot=dot, dot_out=dot_out)
+        if not compiled.converged:
+            result['warning'] = 'no fixpoint after {0} iterations' \
+                                .format(compiled.iterations)
+
+        result['ok'] = True
+        if options['run']:
+            engine = ENGINES[options['engine']]
+            result['execution'] = tuple(engine(compiled.graph,
+                                               options['max_steps']))
+    except JumpRuntimeError as e:
+        result['run_error'] = str(e)
+    except JumpSyntaxError as e:
+        result['error'] = 'syntax error: {0}'.format(e)
+    except Exception as e:
+        result['error'] = '{0}: {1}'.format(type(e).__name__, e)
+        result['traceback'] = traceback.format_exc()
+
+    if not result['ok'] and os.path.exists(base + OUTPUT_EXT):
+        result['kept'] = base + OUTPUT_EXT
+    result['time'] = clock() - start
+    result['stats'] = stats.as_dict()
+    return result
+
+def batch(sources, jobs=None, stats=None, **options):
+    """
+    Compile many files in a pool of worker processes, summarising to stderr.
+
+    Each foo.jmp is written to foo.out, and its graph (if options['dot']) to
+    foo.dot; those of files which fail to compile are left as they were.
+    Returns the number of files which failed to compile.
+
+    Workers put compilations in the cache without evicting any, as each
+    would have to measure it all to; that is done once, at the end.
+
+    """
+    stats = stats if stats is not None else Stats()
+    cache = options['cache']
+    if cache is not None:
+        options = dict(options, cache=CompileCache(cache.directory, None))
+    work = [(path, options) for path in sources]
+
+    start = clock()
+    pool = multiprocessing.Pool(jobs)
+    try:
+        results = pool.imap(compile_file, work)
+        failed = 0
+        for result in results:
+            stats.merge(result['stats'])
+            if result['ok']:
+                line = 'ok    {0} ({1:.3f}s)'.format(result['path'],
+                                                     result['time'])
+                if result['warning']:
+                    line += ' warning: ' + result['warning']
+                if result['execution']:
+                    value, steps, returned = result['execution']
+                    line += ' returned {0} after {1} instructions'.format(
+                        value, steps)
+                if result['run_error']:
+                    line += ' run failed: ' + result['run_error']
+            else:
+                failed += 1
+                line = 'FAIL  {0}: {1}'.format(result['path'],
+                                               result['error'])
+                if result['kept']:
+                    line += ' ({0} is from before)'.format(result['kept'])
+                if 'traceback' in result:
+                    line += '\n' + result['traceback'].rstrip()
+            print >> sys.stderr, line
+    finally:
+        pool.close()
+        pool.join()
+        if cache is not None:
+            cache.evict()
+
+    print >> sys.stderr, '{0} compiled, {1} failed, in {2:.3f}s.'.format(
+        len(sources) - failed, failed, clock() - start)
+    return failed
+
+def watch(sources, interval=WATCH_INTERVAL, output=None, stats=None,
+          level='O2', max_iterations=None):
+    """
+    Optimise each of sources whenever it changes, until interrupted.
+
+    Each foo.jmp is written to foo.out (or a single source to output, if
+    given), and recompiled by an IncrementalCompiler of its own, so that
+    after an edit only the regions the edit affects are optimised again.
+    Which those were, by their source lines, is reported to stderr, as is a
+    version that does not compile or an output that cannot be written (the
+    last output being left as it was).
+
+    """
+    stats = stats if stats is not None else Stats()
+    compilers = dict((path, IncrementalCompiler(level, max_iterations, stats))
+                     for path in sources)
+    versions = {}  # path -> the (mtime, size) of the version last seen
+
+    try:
+        while True:
+            for path in sources:
+                try:
+                    status = os.stat(path)
+                except OSError:
+                    continue  # mid-save, say; look again next time
+                version = (status.st_mtime, status.st_size)
+                if versions.get(path) == version:
+                    continue
+                versions[path] = version
+
+                try:
+                    with open(path) as f:
+                        text = f.read()
+                except (IOError, OSError):
+                    del versions[path]  # gone since; look again next time
+                    continue
+                try:
+                    update = compilers[path].update(text)
+                except JumpSyntaxError as e:
+                    print >> sys.stderr, '{0}: syntax error: {1}'.format(
+                        path, e)
+                    continue
+
+                target = output or os.path.splitext(path)[0] + OUTPUT_EXT
+                try:
+                    with replacing(target) as out:
+                        write_lines(update.lines, out)
+                except (IOError, OSError) as e:
+                    print >> sys.stderr, '{0}: cannot write {1}: {2}'.format(
+                        path, target, e)
+                    continue
+
+                line = '{0}: re-optimised {1} of {2} regions'.format(
+                    path, update.recompiled, update.regions)
+                if update.compiled:
+                    line += ' (lines {0})'.format(', '.join(
+                        '{0}-{1}'.format(first, last) if first != last
+                        else str(first)
+                        for first, last in update.compiled))
+                line += ' in {0:.3f}s'.format(update.time)
+                if not update.converged:
+                    line += ' warning: no fixpoint'
+                print >> sys.stderr, line
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+
+def load_frontend(frontend):
+    """Import what frontend parses with, so that the first parse need not."""
+    if frontend == 'antlr':
+        import antlr3
+        import build.JumpLexer
+        import build.JumpParser
+
+class ThreadingUnixStreamServer(SocketServer.ThreadingMixIn,
+                                SocketServer.UnixStreamServer):
+    daemon_threads = True
+
+def is_integer(value):
+    """Whether a value decoded from JSON is an integer (which no bool is)."""
+    return isinstance(value, (int, long)) and not isinstance(value, bool)
+
+class CompileServer(object):
+    """
+    Compiles programs on request, for as long as it is kept running.
+
+    Requests and responses are JSON objects, one per line.  A request holds
+    the program's `source`, and may set its `level` ("O0" to "O2"),
+    `frontend`, `max_iterations` and `dot` (true, or an object with `blocks`
+    and `max_nodes`), overriding the server's defaults; an `id`, echoed back;
+    and `stats`, to have the compilation's timings and counters returned.
+
+    The response holds `ok` and, if not, an `error`.  Otherwise it holds the
+    generated `output`, the `dot` text if asked for, whether the optimiser
+    `converged` (and after how many `iterations`) and whether the compilation
+    was `cached`.
+
+    Requests are answered one at a time, so several clients can share a
+    server (and its cache), but each waits its turn.
+
+    """
+    def __init__(self, cache=None, stats=None, level='O2',
+                 frontend='antlr', max_iterations=None, dot=None):
+        self.cache = cache
+        self.stats = stats if stats is not None else Stats()
+        self.defaults = dict(level=level, frontend=frontend,
+                             max_iterations=max_iterations, dot=dot)
+        self.lock = threading.Lock()
+        load_frontend(frontend)
+
+    def options(self, request):
+        """The compile_source options of request, raising ValueError if bad."""
+        options = dict(self.defaults)
+        for name in ('level', 'frontend', 'max_iterations', 'dot'):
+            if request.get(name) is not None:
+                options[name] = request[name]
+
+        if options['level'] not in PIPELINES:
+            raise ValueError('no optimisation level {0}'
+                             .format(options['level']))
+        if options['frontend'] not in FRONTENDS:
+            raise ValueError('no frontend {0}'.format(options['frontend']))
+        if options['max_iterations'] is not None and \
+                not is_integer(options['max_iterations']):
+            raise ValueError('max_iterations is not an integer')
+
+        dot = options['dot']
+        if dot is True:
+            dot = DotOptions(False, None)
+        elif isinstance(dot, dict):
+            dot = DotOptions(bool(dot.get('blocks')), dot.get('max_nodes'))
+            if dot.max_nodes is not None and not is_integer(dot.max_nodes):
+                raise ValueError('dot max_nodes is not an integer')
+        elif not isinstance(dot, (DotOptions, type(None))):
+            dot = None  # false
+        options['dot'] = dot
+        return options
+
+    def respond(self, line):
+        """Answer one request, given as a line of JSON, returning a dict."""
+        response = OrderedDict([('id', None), ('ok', False)])
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError('not an object')
+            response['id'] = request.get('id')
+            source = request.get('source')
+            if not isinstance(source, basestring):
+                raise ValueError('no source')
+            options = self.options(request)
+        except ValueError as e:
+            response['error'] = 'bad request: {0}'.format(e)
+            return response
+
+        stats = Stats()
+        try:
+            with self.lock:
+                compiled = compile_source(source.encode('utf-8'), stats,
+                                          cache=self.cache, **options)
+        except JumpSyntaxError as e:
+            response['error'] = 'syntax error: {0}'.format(e)
+        except Exception as e:
+            response['error'] = '{0}: {1}'.format(type(e).__name__, e)
+        else:
+            response['ok'] = True
+            response['output'] = ''.join(line + '\n'
+                                         for line in compiled.output)
+            response['dot'] = compiled.dot
+            response['converged'] = compiled.converged
+            response['iterations'] = compiled.iterations
+            response['cached'] = compiled.graph is None
+
+        data = stats.as_dict()
+        if request.get('stats'):
+            response['stats'] = data
+        with self.lock:
+            self.stats.merge(data)
+        return response
+
+    def serve(self, infile, outfile):
+        """Answer the requests read from infile, until it ends."""
+        for line in iter(infile.readline, ''):
+            if line.strip():
+                outfile.write(json.dumps(self.respond(line)) + '\n')
+                outfile.flush()
+
+    def serve_socket(self, path):
+        """Answer the requests of clients of a Unix socket, until interrupted."""
+        server = self
+
+        class Handler(SocketServer.StreamRequestHandler):
+            def handle(self):
+                try:
+                    server.serve(self.rfile, self.wfile)
+                except socket.error:
+                    pass  # the client went away
+
+        listener = ThreadingUnixStreamServer(path, Handler)
+        try:
+            listener.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            listener.server_close()
+            os.remove(path)
+
+def get_argparser():
+    parser = argparse.ArgumentParser(
+        description='Optimise a Jump program, printing the result.  Given '
+                    'several files, directories or globs, each foo.jmp is '
+                    'instead written to foo.out (and with --dot, foo.dot), '
+                    'in parallel.')
+    parser.add_argument('inputs', nargs='*', metavar='filename',
+                        help='the program(s) to optimise (default: stdin)')
+    parser.add_argument('--batch', action='store_true',
+                        help='use batch mode even for a single file')
+    parser.add_argument('-j', '--jobs', type=int, default=None, metavar='N',
+                        help='worker processes for batch mode (default: '
+                             'one per CPU)')
+    parser.add_argument('-o', '--output', metavar='FILE',
+                        help='write the optimised program to FILE (default: '
+                             'stdout)')
+    parser.add_argument('--dot', action='store_true',
+                        help='write the control flow graph as GraphViz to '
+                             '{0} (or in batch mode, foo.dot)'.format(DOT_FILE))
+    parser.add_argument('--dot-blocks', action='store_true',
+                        help='with --dot, draw basic blocks, not statements')
+    parser.add_argument('--dot-max-nodes', type=int, default=None,
+                        metavar='N',
+                        help='with --dot, draw at most N nodes (those nearest '
+                             'the start)')
+    parser.add_argument('--frontend', default='antlr', choices=FRONTENDS,
+                        help="parser to use; 'fast' avoids loading ANTLR "
+                             "(default: %(default)s)")
+    parser.add_argument('-O', dest='level', default='2',
+                        choices=[level[1:] for level in sorted(PIPELINES)],
+                        help='optimisation level (default: %(default)s)')
+    parser.add_argument('--max-iterations', type=int, default=None,
+                        metavar='N',
+                        help='give up on the fixpoint after N rounds')
+    parser.add_argument('--debug', action='store_true',
+                        help='print the graph after every pass')
+    parser.add_argument('--run', action='store_true',
+                        help='execute the optimised program, reporting its '
+                             'return value and instruction count to stderr')
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='vm',
+                        help='with --run, execute in the VM, or compiled to '
+                             'Python (default: %(default)s)')
+    parser.add_argument('--max-steps', type=int, default=None, metavar='N',
+                        help='with --run or --train, give up after N '
+                             'instructions (default for --train: {0})'
+                             .format(TRAIN_STEPS))
+    parser.add_argument('--profile', metavar='FILE',
+                        help='lay the code out by the edge profile in FILE '
+                             '(as written by --save-profile)')
+    parser.add_argument('--train', action='store_true',
+                        help='run the optimised program to profile it, and '
+                             'lay the code out by that')
+    parser.add_argument('--save-profile', metavar='FILE',
+                        help='with --train, write the profile to FILE')
+    parser.add_argument('--watch', action='store_true',
+                        help='keep running, optimising each file again '
+                             'whenever it changes (only the parts an edit '
+                             'affects) to foo.out, or -o for a single file; '
+                             'parses with the fast frontend')
+    parser.add_argument('--interval', type=float, default=WATCH_INTERVAL,
+                        metavar='SECONDS',
+                        help='with --watch, how often to look for changes '
+                             '(default: %(default)s)')
+    parser.add_argument('--server', action='store_true',
+                        help='compile the programs of JSON requests read from '
+                             'stdin, one per line, answering each on stdout')
+    parser.add_argument('--socket', metavar='PATH',
+                        help='like --server, but answer clients of a Unix '
+                             'socket created at PATH')
+    parser.add_argument('--server-cache', type=int, default=DEFAULT_ENTRIES,
+                        metavar='N',
+                        help='with --server or --socket, keep the last N '
+                             'compilations in memory (default: %(default)s)')
+    parser.add_argument('--no-cache', dest='cache', action='store_false',
+                        help='neither use nor update the compilation cache')
+    parser.add_argument('--cache-dir', default=DEFAULT_DIR, metavar='DIR',
+                        help='where to cache compilations (default: '
+                             '%(default)s)')
+    parser.add_argument('--cache-size', type=int,
+                        default=DEFAULT_SIZE // (1024 * 1024), metavar='MB',
+                        help='evict cached compilations beyond this size '
+                             '(default: %(default)s)')
+    parser.add_argument('--stats', action='store_true',
+                        help='print per-pass timings and counters to stderr')
+    parser.add_argument('--stats-json', metavar='FILE',
+                        help='write per-pass timings and counters to FILE')
+    return parser
 
 
 if __name__ == '__main__':
-    if len(sys.argv) > 3 or (len(sys.argv) == 1 and sys.argv[1] in ('-h', '--help')):
-        print >> sys.stderr, 'Usage: {0} [filename]'.format(sys.argv[0])
-        sys.exit(1)
+    argparser = get_argparser()
+    args = argparser.parse_args()
+    if args.save_profile and not args.train:
+        argparser.error('--save-profile needs --train')
+    if args.profile and args.train:
+        argparser.error('--profile and --train cannot be used together')
+    profile = None
+    if args.profile:
+        try:
+            with open(args.profile) as f:
+                profile = EdgeProfile.load(f)
+        except (IOError, ValueError) as e:
+            argparser.error('cannot read profile {0}: {1}'
+                            .format(args.profile, e))
+    if (args.dot_blocks or args.dot_max_nodes is not None) and \
+            not args.dot:
+        argparser.error('--dot-blocks and --dot-max-nodes need --dot')
+    stats = Stats()
+    options = dict(level='O' + args.level,
+                   max_iterations=args.max_iterations,
+                   stats=stats,
+                   run=args.run,
+                   engine=args.engine,
+                   frontend=args.frontend,
+                   max_steps=args.max_steps,
+                   train=args.train,
+                   dot=DotOptions(args.dot_blocks, args.dot_max_nodes)
+                       if args.dot else None,
+                   cache=CompileCache(args.cache_dir,
+                                      args.cache_size * 1024 * 1024)
+                         if args.cache else None)
+
+    batch_mode = args.batch or len(args.inputs) > 1 or \
+                 any(not os.path.isfile(name) for name in args.inputs)
+    failed = 0
 
-    if len(sys.argv) == 2:
-        with open(sys.argv[1]) as f:
-            main(f)
+    if args.server or args.socket:
+        if args.inputs or args.batch or args.output or args.debug or \
+                args.run or args.train or args.profile or args.watch:
+            argparser.error('--server and --socket take programs from '
+                            'requests, and only their optimisation options')
+        if args.socket and os.path.exists(args.socket):
+            argparser.error('{0} already exists'.format(args.socket))
+        server = CompileServer(MemoryCache(args.server_cache, options['cache']),
+                               stats, options['level'], options['frontend'],
+                               options['max_iterations'], options['dot'])
+        if args.socket:
+            server.serve_socket(args.socket)
+        else:
+            server.serve(sys.stdin, sys.stdout)
+    elif args.watch:
+        if not args.inputs:
+            argparser.error('--watch needs files to watch')
+        if args.debug or args.run or args.train or args.profile or \
+                args.save_profile or args.dot:
+            argparser.error('--watch only optimises; --debug, --run, '
+                            '--train, --profile and --dot cannot be used')
+        if args.interval <= 0:
+            argparser.error('--interval must be positive')
+        try:
+            sources = find_sources(args.inputs)
+        except IOError as e:
+            argparser.error(str(e))
+        if args.output and len(sources) > 1:
+            argparser.error('watching several files writes foo.out beside '
+                            'each foo.jmp; -o cannot be used')
+        watch(sources, args.interval, args.output, stats, options['level'],
+              options['max_iterations'])
+    elif batch_mode:
+        if args.debug:
+            argparser.error('--debug cannot be used in batch mode')
+        if args.profile or args.save_profile:
+            argparser.error('profiles are per program; --profile and '
+                            '--save-profile cannot be used in batch mode')
+        if args.output:
+            argparser.error('batch mode writes foo.out beside each foo.jmp; '
+                            '-o cannot be used')
+        try:
+            sources = find_sources(args.inputs)
+        except IOError as e:
+            argparser.error(str(e))
+        failed = batch(sources, args.jobs, **options)
+    elif args.inputs:
+        with open(args.inputs[0]) as f:
+            main(f, debug=args.debug, profile=profile,
+                 save_profile=args.save_profile, output=args.output,
+                 **options)
     else:
-        main(sys.stdin)
+        main(sys.stdin, debug=args.debug, profile=profile,
+             save_profile=args.save_profile, output=args.output,
+             **options)
+
+    if args.stats:
+        for line in stats.report():
+            print >> sys.stderr, line
+    if args.stats_json:
+        with open(args.stats_json, 'w') as f:
+            json.dump(stats.as_dict(), f, indent=2)
+            f.write('\n')
+
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,156 @@
+"""
+Seeded generator of random Jump programs, for exercising the optimiser.
+
+Programs are always valid Jump and always terminate: loops count up to a
+small trip count on a reserved counter, and every other jump goes forwards.
+
+"""
+import argparse
+import random
+import sys
+
+ARITH_OPS = ('+', '-', '+', '-', '*', '/')
+COMPARE_OPS = ('<', '>', '==')
+
+class ProgramGenerator(object):
+    """
+    Knobs:
+      statements      approximate number of statements to generate
+      variables       number of distinct (live) program variables
+      loop_depth      maximum nesting depth of loops
+      branch_density  chance of a forward conditional branch per statement
+      label_density   chance of an (unreferenced) label per statement
+      dead_ratio      chance of a dead or unreachable statement per statement
+      seed            random seed; equal knobs and seeds give equal programs
+
+    """
+    def __init__(self, statements=1000, variables=20, loop_depth=2,
+                 branch_density=0.1, label_density=0.05, dead_ratio=0.1,
+                 seed=0):
+        self.statements = statements
+        self.variables = ['v{0}'.format(i) for i in range(max(variables, 1))]
+        self.loop_depth = loop_depth
+        self.branch_density = branch_density
+        self.label_density = label_density
+        self.dead_ratio = dead_ratio
+        self.random = random.Random(seed)
+
+        self.lines = []
+        self.labels = 0
+        self.dead = 0
+
+    def generate(self):
+        """Return the program as a list of lines."""
+        self.lines = []
+        for var in self.variables:
+            self.emit('{0} = {1}'.format(var, self.random.randint(-9, 9)))
+
+        self.region(0, self.statements - len(self.lines) - 1)
+
+        self.emit('return {0}'.format(self.variables[0]))
+        return self.lines
+
+    def emit(self, stmt, label=None):
+        if label is None and self.random.random() < self.label_density:
+            label = self.new_label('X')
+        if label is None:
+            self.lines.append('  {0};'.format(stmt))
+        else:
+            self.lines.append('{0}:'.format(label))
+            self.lines.append('  {0};'.format(stmt))
+
+    def new_label(self, prefix):
+        self.labels += 1
+        return '{0}{1}'.format(prefix, self.labels)
+
+    def operand(self):
+        if self.random.random() < 0.3:
+            return str(self.random.randint(-9, 9))
+        return self.random.choice(self.variables)
+
+    def expression(self):
+        kind = self.random.random()
+        if kind < 0.2:
+            return self.operand()
+
+        op = self.random.choice(ARITH_OPS)
+        if op in ('*', '/'):
+            # keep values small, and never divide by zero
+            return '{0} {1} {2}'.format(self.random.choice(self.variables), op,
+                                        self.random.randint(2, 3))
+        return '{0} {1} {2}'.format(self.random.choice(self.variables), op,
+                                    self.operand())
+
+    def assignment(self, label=None):
+        if self.random.random() < self.dead_ratio:
+            # assigned to but never read
+            self.dead += 1
+            var = 'd{0}'.format(self.dead)
+        else:
+            var = self.random.choice(self.variables)
+        self.emit('{0} = {1}'.format(var, self.expression()), label)
+
+    def region(self, depth, budget):
+        """Generate roughly `budget` statements of straight-line and nested code."""
+        end = len(self.lines) + budget
+        while len(self.lines) < end:
+            remaining = end - len(self.lines)
+            choice = self.random.random()
+
+            if depth < self.loop_depth and remaining > 8 and choice < 0.05:
+                self.loop(depth + 1, self.random.randint(4, max(4, remaining // 2)))
+            elif remaining > 4 and choice < 0.05 + self.branch_density:
+                self.branch(depth, self.random.randint(1, min(remaining, 20)))
+            elif remaining > 3 and choice < 0.05 + self.branch_density + \
+                    self.dead_ratio / 4:
+                self.unreachable()
+            else:
+                self.assignment()
+
+    def loop(self, depth, budget):
+        counter = 'n{0}'.format(depth)
+        cond = 'c{0}'.format(depth)
+        header = self.new_label('L')
+
+        self.emit('{0} = 0'.format(counter))
+        self.assignment(header)
+        self.region(depth, budget - 5)
+        self.emit('{0} = {0} + 1'.format(counter))
+        self.emit('{0} = {1} < {2}'.format(cond, counter,
+                                          self.random.randint(2, 5)))
+        self.emit('if {0} goto {1}'.format(cond, header))
+
+    def branch(self, depth, budget):
+        skip = self.new_label('S')
+        cond = 'b{0}'.format(depth)
+
+        self.emit('{0} = {1} {2} {3}'.format(
+            cond, self.random.choice(self.variables),
+            self.random.choice(COMPARE_OPS), self.operand()))
+        self.emit('if {0} goto {1}'.format(cond, skip))
+        self.region(depth, budget)
+        self.assignment(skip)
+
+    def unreachable(self):
+        skip = self.new_label('U')
+        self.emit('goto {0}'.format(skip))
+        self.assignment()
+        self.assignment(skip)
+
+def get_argparser():
+    parser = argparse.ArgumentParser(
+        description='Print a random (but valid and terminating) Jump program.')
+    parser.add_argument('--statements', type=int, default=1000)
+    parser.add_argument('--variables', type=int, default=20)
+    parser.add_argument('--loop-depth', type=int, default=2)
+    parser.add_argument('--branch-density', type=float, default=0.1)
+    parser.add_argument('--label-density', type=float, default=0.05)
+    parser.add_argument('--dead-ratio', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=0)
+    return parser
+
+
+if __name__ == '__main__':
+    args = get_argparser().parse_args()
+    generator = ProgramGenerator(**vars(args))
+    sys.stdout.write('\n'.join(generator.generate()) + '\n')
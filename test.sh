@@ -0,0 +1,8 @@
+#!/bin/sh
+
+ANTLR_DIR=antlr-3.1.3
+ANTLR_PY=${ANTLR_DIR}/runtime/Python
+
+cd "$(dirname "$0")"
+
+PYTHONPATH=${ANTLR_PY}:. python2 -m unittest discover -s tests -t . "$@"
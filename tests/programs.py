@@ -0,0 +1,75 @@
+"""
+Programs for the tests to run: seeded synth.py programs, and what running
+them (optimised or not) comes to.
+
+"""
+import random
+import unittest
+
+from graph import JumpRuntimeError
+from graph.cfg import CFGraph
+from graph.parser import parse
+from graph.passes import PassManager
+from graph.vm import execute
+from synth import ProgramGenerator
+
+SEEDS = range(40)
+MAX_STEPS = 10 ** 6
+
+def synth_source(seed):
+    r = random.Random(seed)
+    generator = ProgramGenerator(statements=r.randint(10, 300),
+                                 variables=r.randint(1, 8),
+                                 loop_depth=r.randint(0, 3),
+                                 branch_density=r.random() * 0.3,
+                                 label_density=r.random() * 0.2,
+                                 dead_ratio=r.random() * 0.3, seed=seed)
+    return '\n'.join(generator.generate()) + '\n'
+
+def optimised(source, pipeline):
+    graph = CFGraph(parse(source))
+    PassManager(graph, pipeline).run()
+    return graph
+
+def outcome(run, graph):
+    """What running graph with run comes to: its Execution, or its error."""
+    try:
+        return run(graph, MAX_STEPS)
+    except JumpRuntimeError as e:
+        return str(e)
+
+def code(graph):
+    """The code generated from graph, on one line."""
+    return ' '.join(' '.join(graph.generate()).split())
+
+class ProgramTestCase(unittest.TestCase):
+    def assertOptimises(self, source, pipeline, expected, fewer_steps=True):
+        self.assertEqual(code(optimised(source, pipeline)), expected)
+        self.assertBehaves(source, pipeline, fewer_steps)
+
+    def assertBehaves(self, source, pipeline, fewer_steps=True):
+        """
+        Optimised by pipeline, source must return what it did before, in no
+        more steps (unless not fewer_steps, for passes trading slow steps for
+        more of faster ones); and so must its optimised code, parsed back in.
+
+        """
+        expected = outcome(execute, CFGraph(parse(source)))
+        graph = optimised(source, pipeline)
+        result = outcome(execute, graph)
+        if isinstance(expected, str):
+            self.assertEqual(result, expected)
+        else:
+            self.assertEqual((result.value, result.returned),
+                             (expected.value, expected.returned),
+                             '{0} changed what the program returns'
+                             .format(pipeline))
+            if fewer_steps:
+                self.assertLessEqual(result.steps, expected.steps)
+
+        again = outcome(execute, CFGraph(parse('\n'.join(graph.generate()))))
+        self.assertEqual(again, result)
+
+    def assertBehavesOnSynth(self, pipeline, seeds=SEEDS):
+        for seed in seeds:
+            self.assertBehaves(synth_source(seed), pipeline)
@@ -0,0 +1,60 @@
+"""
+Basic blocks: maximal runs of statements entered only at their first and
+left only from their last.
+
+"""
+import unittest
+
+from graph import tokens as lex
+from graph.blocks import BlockGraph
+from graph.cfg import CFGraph
+from graph.parser import parse
+
+from tests.programs import SEEDS, synth_source
+
+class BlockGraphTest(unittest.TestCase):
+    def assertBlocks(self, graph):
+        blocks = BlockGraph(graph)
+        seen = []
+        for block in blocks:
+            seen.extend(block.statements)
+            for i, stmt in enumerate(block.statements):
+                self.assertIs(blocks.block(stmt), block)
+                self.assertEqual(blocks.position[stmt.num], i)
+            for stmt, following in zip(block.statements,
+                                       block.statements[1:]):
+                self.assertNotEqual(stmt.type, lex.IFGOTO)
+                self.assertEqual(graph.successors(stmt), [following])
+                self.assertEqual([pred for pred, edge_type
+                                  in graph.predecessors(following)], [stmt])
+                self.assertIsNot(following, graph.start)
+
+            succs = []
+            for stmt in graph.successors(block.last):
+                succ = blocks.block(stmt)
+                self.assertIs(succ.first, stmt)
+                if succ not in succs:
+                    succs.append(succ)
+            self.assertEqual(block.succs, succs)
+            for succ in block.succs:
+                self.assertIn(block, succ.preds)
+        self.assertEqual(sorted(seen), sorted(graph.statements))
+        return blocks
+
+    def test_loop(self):
+        graph = CFGraph(parse('i = 0; s = 0; L: s = s + i; i = i + 1; '
+                              'c = 4 - i; if c goto L; return s;'))
+        blocks = self.assertBlocks(graph)
+        # the label, jumped around, is left in a block of its own
+        self.assertEqual([[stmt.num for stmt in block.statements]
+                          for block in blocks],
+                         [[0, 1], [3, 4, 5, 6], [7], [2]])
+        self.assertIs(blocks.entry, blocks.blocks[0])
+
+    def test_synth_programs(self):
+        for seed in SEEDS:
+            self.assertBlocks(CFGraph(parse(synth_source(seed))))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+"""
+Common subexpression elimination: an expression computed again, with the
+same operands, is replaced by a copy of the variable holding it.
+
+"""
+import unittest
+
+from tests.programs import ProgramTestCase
+
+class CSETest(ProgramTestCase):
+    def test_redundant(self):
+        self.assertOptimises('x = a + b; y = a + b; z = x * y; return z;',
+                             ['CSE'], 'x = a + b; y = x; z = x * y; return z;')
+        # + commutes
+        self.assertOptimises('x = a + b; y = b + a; z = x * y; return z;',
+                             ['CSE'], 'x = a + b; y = x; z = x * y; return z;')
+        # in both branches the computation dominates
+        self.assertOptimises('x = a + b; if c goto L; y = a + b; return y; '
+                             'L: z = a + b; return z;', ['CSE'],
+                             'x = a + b; if c goto L0; y = x; return y; '
+                             'L0: z = x; return z;')
+
+    def test_not_redundant(self):
+        # a changed in between (though its new value is known)
+        self.assertOptimises('x = a + b; a = 1; y = a + b; z = x * y; '
+                             'return z;', ['CSE'],
+                             'x = a + b; a = 1; y = 1 + b; z = x * y; '
+                             'return z;')
+        # a + b is not computed along one path to y
+        self.assertOptimises('if c goto L; x = a + b; goto M; L: x = 1; '
+                             'M: y = a + b; return y;', ['CSE'],
+                             'if c goto L0; x = a + b; goto L1; L0: x = 1; '
+                             'L1: y = a + b; return y;')
+
+    def test_synth_programs(self):
+        self.assertBehavesOnSynth(['CSE'])
+
+
+if __name__ == '__main__':
+    unittest.main()
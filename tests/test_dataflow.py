@@ -0,0 +1,77 @@
+"""
+Liveness and reaching definitions, solved over blocks of bit vectors, against
+the same problems solved naively over sets, statement by statement.
+
+"""
+import unittest
+
+from graph.cfg import CFGraph
+from graph.dataflow import Liveness, ReachingDefinitions, defs, uses
+from graph.parser import parse
+
+from tests.programs import SEEDS, synth_source
+
+def naive_liveness(graph):
+    live_in = dict((stmt, set()) for stmt in graph.statements)
+    live_out = dict((stmt, set()) for stmt in graph.statements)
+    changed = True
+    while changed:
+        changed = False
+        for stmt in reversed(graph.statements):
+            out = set()
+            for succ in graph.successors(stmt):
+                out |= live_in[succ]
+            live = set(uses(stmt)) | (out - set(defs(stmt)))
+            if (out, live) != (live_out[stmt], live_in[stmt]):
+                live_out[stmt], live_in[stmt] = out, live
+                changed = True
+    return live_out
+
+def naive_reaching(graph):
+    reach_in = dict((stmt, set()) for stmt in graph.statements)
+    reach_out = dict((stmt, set()) for stmt in graph.statements)
+    changed = True
+    while changed:
+        changed = False
+        for stmt in graph.statements:
+            reach = set()
+            for pred, edge_type in graph.predecessors(stmt):
+                reach |= reach_out[pred]
+            out = reach
+            if defs(stmt):
+                killed = set(defs(stmt))
+                out = set(d for d in reach if not set(defs(d)) & killed)
+                out.add(stmt)
+            if (reach, out) != (reach_in[stmt], reach_out[stmt]):
+                reach_in[stmt], reach_out[stmt] = reach, out
+                changed = True
+    return reach_in
+
+class DataflowTest(unittest.TestCase):
+    def test_loop(self):
+        graph = CFGraph(parse('i = 0; s = 0; L: s = s + i; i = i + 1; y = i; '
+                              'c = 10 - i; if c goto L; return s;'))
+        liveness = Liveness(graph)
+        y = graph.nodes[5]  # labels are statements too
+        self.assertTrue(liveness.is_dead(y))
+        self.assertEqual(liveness.live_out_names(y), set(['i', 's']))
+
+        reaching = ReachingDefinitions(graph)
+        self.assertEqual(reaching.reaching(graph.nodes[3], 'i'),
+                         [graph.nodes[0], graph.nodes[4]])
+
+    def test_synth_programs(self):
+        for seed in SEEDS:
+            graph = CFGraph(parse(synth_source(seed)))
+
+            liveness = Liveness(graph)
+            for stmt, names in naive_liveness(graph).items():
+                self.assertEqual(liveness.live_out_names(stmt), names)
+
+            reaching = ReachingDefinitions(graph)
+            for stmt, found in naive_reaching(graph).items():
+                self.assertEqual(set(reaching.reaching(stmt)), found)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+"""
+Dead code elimination: assignments whose values are never read go, unless
+they could trap.
+
+"""
+import unittest
+
+from tests.programs import ProgramTestCase
+
+class DCETest(ProgramTestCase):
+    def test_dead_assignments(self):
+        self.assertOptimises('x = 1; y = 2; x = 3; return x;', ['DCE'],
+                             'x = 3; return x;')
+        # removing c leaves b dead, and then a
+        self.assertOptimises('a = 1; b = a + 1; c = b; return 4;', ['DCE'],
+                             'return 4;')
+
+    def test_live_assignments(self):
+        # x = 1 is live along the branch skipping x = 2
+        self.assertOptimises('x = 1; if a goto L; x = 2; L: return x;',
+                             ['DCE'],
+                             'x = 1; if a goto L0; x = 2; L0: return x;')
+        # y is dead, though read by the loop it is in
+        self.assertOptimises('i = 0; s = 0; L: s = s + i; i = i + 1; y = i; '
+                             'c = 10 - i; if c goto L; return s;', ['DCE'],
+                             'i = 0; s = 0; L0: s = s + i; i = i + 1; '
+                             'c = 10 - i; if c goto L0; return s;')
+
+    def test_trapping_assignments(self):
+        self.assertOptimises('y = 0; x = 1 / y; return 3;', ['DCE'],
+                             'y = 0; x = 1 / y; return 3;')
+
+    def test_synth_programs(self):
+        self.assertBehavesOnSynth(['DCE'])
+
+
+if __name__ == '__main__':
+    unittest.main()
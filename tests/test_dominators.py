@@ -0,0 +1,68 @@
+"""
+Dominators and natural loops, against their definitions: a block dominates
+another if every path from the entry to the other passes through it.
+
+"""
+import unittest
+
+from graph.blocks import BlockGraph
+from graph.cfg import CFGraph
+from graph.dominators import DominatorTree, LoopNest
+from graph.parser import parse
+
+from tests.programs import SEEDS, synth_source
+
+def reaching(blocks, avoid=None):
+    """The numbers of the blocks reached from the entry, not through avoid."""
+    seen = set()
+    stack = [blocks.entry] if blocks.entry is not avoid else []
+    while stack:
+        block = stack.pop()
+        if block.num not in seen:
+            seen.add(block.num)
+            stack.extend(succ for succ in block.succs if succ is not avoid)
+    return seen
+
+class DominatorTest(unittest.TestCase):
+    def test_synth_programs(self):
+        for seed in SEEDS[::2]:
+            blocks = BlockGraph(CFGraph(parse(synth_source(seed))))
+            dominators = DominatorTree(blocks)
+            reached = reaching(blocks)
+
+            dominated = {}
+            for a in blocks:
+                dominated[a.num] = (set([a.num]) & reached) | \
+                                   (reached - reaching(blocks, a))
+                for b in blocks:
+                    self.assertEqual(dominators.dominates(a, b),
+                                     b.num in dominated[a.num])
+
+            # a block's frontier: the blocks it does not strictly dominate,
+            # with a pred it does dominate
+            for a, frontier in zip(blocks, dominators.frontiers()):
+                expected = set(b.num for b in blocks
+                               if (b.num == a.num or
+                                   b.num not in dominated[a.num]) and
+                               any(p.num in dominated[a.num]
+                                   for p in b.preds))
+                self.assertEqual(set(frontier), expected)
+
+    def test_loops(self):
+        graph = CFGraph(parse('i = 0; L: j = 0; M: j = j + 1; c = 3 - j; '
+                              'if c goto M; i = i + 1; d = 3 - i; '
+                              'if d goto L; return i;'))
+        loops = LoopNest(DominatorTree(BlockGraph(graph)))
+        self.assertEqual(len(loops), 2)
+        outer, inner = loops.loops
+        self.assertIs(inner.parent, outer)
+        self.assertTrue(inner.blocks < outer.blocks)
+
+        depths = [(stmt.tree()[1], loops.depth(stmt))
+                  for stmt in graph.statements if stmt.lhs]
+        self.assertEqual(depths, [('i', 0), ('j', 1), ('j', 2), ('c', 2),
+                                  ('i', 1), ('d', 1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+"""
+GOTO elimination: edges into a chain of GOTOs lead straight to the statement
+at its end, however long the chain, and wherever it is entered.
+
+"""
+import random
+import unittest
+
+from graph import GOTO, IFGOTO, JumpSyntaxError
+from graph.cfg import CFGraph
+from graph.parser import parse
+
+def parse_graph(source):
+    return CFGraph(parse(source))
+
+def chain(length, seed):
+    """
+    A program with a chain of GOTOs through labels L0 to L{length}, laid out
+    in shuffled order, and a branch into each of them from the start.
+
+    """
+    order = range(length)
+    random.Random(seed).shuffle(order)
+    lines = ['x = 1;']
+    lines.extend('if x goto L{0};'.format(i) for i in range(length))
+    lines.append('goto L0;')
+    lines.extend('L{0}: goto L{1};'.format(i, i + 1) for i in order)
+    lines.append('L{0}: return x;'.format(length))
+    return parse_graph('\n'.join(lines))
+
+class GotoTest(unittest.TestCase):
+    def test_chains(self):
+        for length in (1, 2, 10, 5000):
+            graph = chain(length, length)
+            end = graph.nodes[-1]
+            for stmt in graph.statements:
+                for target in stmt.next[GOTO], stmt.next[IFGOTO]:
+                    if target is not None:
+                        self.assertIs(target, end)
+
+    def test_cycles(self):
+        self.assertRaises(JumpSyntaxError, parse_graph,
+                          'x = 1; goto L; L: goto M; M: goto L;')
+        self.assertRaises(JumpSyntaxError, parse_graph, 'L: goto L;')
+
+
+if __name__ == '__main__':
+    unittest.main()
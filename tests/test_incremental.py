@@ -0,0 +1,74 @@
+"""
+Incremental re-optimisation: after each edit, the code put together from
+regions old and new must behave as the edited program does, and regions the
+edit leaves alone are not optimised again.
+
+"""
+import random
+import unittest
+
+from graph.cfg import CFGraph
+from graph.incremental import IncrementalCompiler
+from graph.parser import parse
+from graph.vm import execute
+from synth import ProgramGenerator
+
+from tests.programs import SEEDS, outcome, synth_source
+
+def edit(source, r):
+    """source with an assignment added or removed."""
+    lines = source.splitlines()
+    i = r.randrange(1, len(lines) - 1)
+    kind = r.random()
+    if kind < 0.4:
+        lines.insert(i, '  v{0} = {1};'.format(r.randint(0, 3),
+                                                r.randint(-9, 9)))
+    elif kind < 0.7 and ' = ' in lines[i] and ':' not in lines[i]:
+        del lines[i]
+    else:
+        lines.insert(i, '  v{0} = v{1} + {2};'.format(
+            r.randint(0, 3), r.randint(0, 3), r.randint(1, 3)))
+    return '\n'.join(lines) + '\n'
+
+def result(source):
+    result = outcome(execute, CFGraph(parse(source)))
+    return result if isinstance(result, str) else result[::2]
+
+class IncrementalTest(unittest.TestCase):
+    def test_edits(self):
+        for seed in SEEDS[::4]:
+            r = random.Random(seed)
+            compiler = IncrementalCompiler('O2')
+            source = synth_source(seed)
+            for version in range(4):
+                update = compiler.update(source)
+                self.assertEqual(result('\n'.join(update.lines)),
+                                 result(source))
+                source = edit(source, r)
+
+    def test_unchanged(self):
+        compiler = IncrementalCompiler('O2')
+        source = synth_source(0)
+        first = compiler.update(source)
+        self.assertEqual(first.recompiled, first.regions)
+
+        again = compiler.update(source)
+        self.assertEqual(again.recompiled, 0)
+        self.assertEqual(again.lines, first.lines)
+
+    def test_small_edits(self):
+        compiler = IncrementalCompiler('O2')
+        source = '\n'.join(ProgramGenerator(statements=2000, variables=4,
+                                            seed=3).generate()) + '\n'
+        compiler.update(source)
+        r = random.Random(0)
+        for version in range(3):
+            source = edit(source, r)
+            update = compiler.update(source)
+            self.assertLess(update.recompiled * 4, update.regions)
+            self.assertEqual(result('\n'.join(update.lines)),
+                             result(source))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+"""
+Laying code out and generating it: the generated code, parsed back in, must
+behave as the graph it came from.  Laid out by the profile of a run, it
+should take fewer jumps.
+
+"""
+import unittest
+from cStringIO import StringIO
+
+from graph import LINR
+from graph.cfg import CFGraph
+from graph.layout import EdgeProfile
+from graph.parser import parse
+from graph.vm import execute
+
+from tests.programs import MAX_STEPS, SEEDS, optimised, outcome, synth_source
+
+def regenerated(graph):
+    return CFGraph(parse('\n'.join(graph.generate())))
+
+def trained(source, relayout=True):
+    """source optimised, with the profile of a run; and laid out by it."""
+    graph = optimised(source, 'O2')
+    graph.profile = EdgeProfile()
+    execute(graph, MAX_STEPS, graph.profile)
+    if relayout:
+        graph.JE()
+    return graph
+
+class LayoutTest(unittest.TestCase):
+    def assertRegenerates(self, graph):
+        expected = outcome(execute, graph)
+        result = outcome(execute, regenerated(graph))
+        if isinstance(expected, str):
+            self.assertEqual(result, expected)
+        else:
+            self.assertEqual(result[::2], expected[::2])
+
+    def test_branch_falling_off(self):
+        # the last statement falls off the end when its branch is not taken,
+        # so nothing may be laid out after it
+        for source in ['b = 0; goto L0; L2: return 7; L0: if a goto L2; '
+                       'a = b; if b goto L0;',
+                       'a = 0; goto L0; L2: x = 1 / a; L0: if a goto L2; '
+                       'a = b; if b goto L0;']:
+            for level in ('O0', 'O1', 'O2'):
+                self.assertRegenerates(optimised(source, level))
+
+    def test_several_branches_falling_off(self):
+        # neither branch can be jumped to from the other, so they jump to an
+        # end of their own
+        for a in (0, 1):
+            graph = CFGraph(parse('a = {0}; if a goto L; return 9; '
+                                  'L: if b goto M; return 8; M: return 1;'
+                                  .format(a)))
+            graph.nodes[1].next[LINR] = None
+            graph.nodes[4].next[LINR] = None
+            self.assertRegenerates(graph)
+
+    def test_synth_programs(self):
+        for seed in SEEDS:
+            self.assertRegenerates(CFGraph(parse(synth_source(seed))))
+
+    def test_trained(self):
+        # the branch is taken on all but one trip, which the static guess
+        # cannot tell
+        source = ('i = 0; L: c = i - 1; if c goto H; x = x + 1; goto N; '
+                  'H: y = y + 1; N: i = i + 1; d = 100 - i; if d goto L; '
+                  'return y;')
+        taken = []
+        for relayout in (False, True):
+            graph = trained(source, relayout)
+            self.assertRegenerates(graph)
+            taken.append(graph.stats['generate'].counters['taken_jumps'])
+        self.assertLess(taken[1], taken[0])
+
+    def test_trained_synth_programs(self):
+        for seed in SEEDS:
+            self.assertRegenerates(trained(synth_source(seed)))
+
+    def test_saved_profiles(self):
+        profile = trained(synth_source(0)).profile
+        saved = StringIO()
+        profile.dump(saved)
+        loaded = EdgeProfile.load(StringIO(saved.getvalue()))
+        self.assertEqual(loaded.counts, profile.counts)
+        self.assertRaises(ValueError, EdgeProfile.load, StringIO('{}'))
+
+
+if __name__ == '__main__':
+    unittest.main()
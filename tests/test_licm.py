@@ -0,0 +1,42 @@
+"""
+Loop-invariant code motion: statements computing the same value on every
+trip round a loop are hoisted out in front of it.
+
+"""
+import unittest
+
+from tests.programs import ProgramTestCase
+
+class LICMTest(ProgramTestCase):
+    def test_hoisting(self):
+        self.assertOptimises('i = 0; s = 0; L: t = a * b; s = s + t; '
+                             'i = i + 1; c = 10 - i; if c goto L; return t;',
+                             ['LICM'],
+                             'i = 0; s = 0; t = a * b; L0: s = s + t; '
+                             'i = i + 1; c = 10 - i; if c goto L0; return t;')
+        # from a branch of the loop too, as it cannot trap
+        self.assertOptimises('i = 0; L: if x goto M; t = a * b; s = s + t; '
+                             'M: i = i + 1; c = 5 - i; if c goto L; return s;',
+                             ['LICM'],
+                             'i = 0; t = a * b; L1: if x goto L0; s = s + t; '
+                             'L0: i = i + 1; c = 5 - i; if c goto L1; '
+                             'return s;')
+
+    def test_not_hoisting(self):
+        # a is assigned in the loop
+        self.assertOptimises('i = 0; L: t = a * b; i = i + 1; a = i; '
+                             'c = 5 - i; if c goto L; return t;', ['LICM'],
+                             'i = 0; L0: t = a * b; i = i + 1; a = i; '
+                             'c = 5 - i; if c goto L0; return t;')
+        # b could be 0
+        self.assertOptimises('i = 0; L: t = a / b; i = i + 1; c = 5 - i; '
+                             'if c goto L; return t;', ['LICM'],
+                             'i = 0; L0: t = a / b; i = i + 1; c = 5 - i; '
+                             'if c goto L0; return t;')
+
+    def test_synth_programs(self):
+        self.assertBehavesOnSynth(['LICM'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+"""
+The hand-written frontend against the ANTLR-generated one.
+
+Both must build the same statements, numbered alike and with the same edges,
+from the example programs and from synth.py programs, however they are
+spaced out; or both reject the program.  The ANTLR parser needs building
+first (make), and is skipped without it; but what the example programs
+parse to is also checked in, under tests/expected, for the hand-written
+frontend to be tested against always.
+
+"""
+import glob
+import os
+import random
+import unittest
+from cStringIO import StringIO
+
+from graph import JumpSyntaxError
+from graph.parser import parse as parse_fast
+from run import parse
+
+from tests.programs import SEEDS, synth_source
+
+try:
+    import antlr3
+    from build.JumpParser import JumpParser
+except ImportError:
+    antlr3 = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXAMPLES = sorted(glob.glob(os.path.join(ROOT, 'example*.jmp')))
+EXPECTED = os.path.join(ROOT, 'tests', 'expected')
+
+def respace(source, seed):
+    """source with the space between its words changed at random."""
+    r = random.Random(seed)
+    spaces = [' ', '\t', '\n', '  \r\n\f', '\n\n  ']
+    return ''.join(r.choice(spaces) + word for word in source.split())
+
+def describe(source, frontend):
+    """Every statement source parses to, and where each edge goes."""
+    try:
+        graph = parse(StringIO(source), frontend=frontend)
+    except JumpSyntaxError:
+        return None
+    return ([stmt.tree() for stmt in graph.nodes],
+            [list(edges) for edges in graph.succ])
+
+def listing(source):
+    """
+    The lines of tests/expected/*.txt: each statement the hand-written
+    frontend parses source to and its LINR, GOTO and IFGOTO edges; or the
+    error rejecting it.
+
+    """
+    try:
+        graph = parse(StringIO(source), frontend='fast')
+    except JumpSyntaxError as e:
+        return ['error: {0}'.format(e)]
+    return ['{0} {1!r} {2}'.format(stmt.num, stmt.tree(),
+                                   ' '.join(str(edges[stmt.num])
+                                            for edges in graph.succ))
+            for stmt in graph.nodes]
+
+def expected_path(path):
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(EXPECTED, name + '.txt')
+
+class FastFrontendTest(unittest.TestCase):
+    def test_examples(self):
+        for path in EXAMPLES:
+            with open(path) as f:
+                lines = listing(f.read())
+            with open(expected_path(path)) as f:
+                self.assertEqual(lines, f.read().splitlines(), path)
+
+    def test_spacing(self):
+        for seed in SEEDS:
+            source = synth_source(seed)
+            self.assertEqual(describe(respace(source, seed), 'fast'),
+                             describe(source, 'fast'))
+
+    def test_syntax_errors(self):
+        for source in ['x = ;', 'x = 1', 'goto l;', 'X: ;', 'x = a -1;',
+                       'return x; if x goto;', 'goto = 1;', 'x = 1 @ 2;']:
+            self.assertRaises(JumpSyntaxError, parse_fast, source)
+
+@unittest.skipIf(antlr3 is None, 'the ANTLR parser is not built (run make)')
+class FrontendDifferentialTest(unittest.TestCase):
+    def assertAgree(self, source):
+        self.assertEqual(describe(source, 'fast'), describe(source, 'antlr'))
+
+    def test_examples(self):
+        for path in EXAMPLES:
+            with open(path) as f:
+                self.assertAgree(f.read())
+
+    def test_synth_programs(self):
+        for seed in SEEDS:
+            self.assertAgree(synth_source(seed))
+
+    def test_spacing(self):
+        for seed in SEEDS:
+            self.assertAgree(respace(synth_source(seed), seed))
+
+    def test_keyword_prefixes(self):
+        self.assertAgree('gotox = 1; returnx = gotox - -1; ifx = returnx;\n'
+                         'IFX: if ifx goto IFX; return returnx;')
+
+    def test_dense(self):
+        self.assertAgree('x=1;y=x- 1;z=y- -1;A:if z gotoA;B:goto B;return-2;')
+        # a '-' before a digit starts a NUM, even after an operand
+        self.assertAgree('x=1;y=x-1;return y;')
+
+
+if __name__ == '__main__':
+    unittest.main()
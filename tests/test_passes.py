@@ -0,0 +1,61 @@
+"""
+The pass manager: running pipelines to a fixpoint, rerunning only the passes
+a change may have invalidated.
+
+"""
+import unittest
+
+from graph.cfg import CFGraph
+from graph.parser import parse
+from graph.passes import PassManager, PIPELINES, INVALIDATES
+
+from tests.programs import ProgramTestCase, SEEDS, synth_source
+
+class PassManagerTest(ProgramTestCase):
+    def test_levels(self):
+        for seed in SEEDS:
+            source = synth_source(seed)
+            for level in sorted(PIPELINES):
+                self.assertBehaves(source, level)
+
+    def test_each_pass(self):
+        for name in sorted(INVALIDATES):
+            self.assertBehavesOnSynth([name], SEEDS[::4])
+
+    def test_reruns(self):
+        for seed in SEEDS[::4]:
+            graph = CFGraph(parse(synth_source(seed)))
+            manager = PassManager(graph, 'O2')
+            self.assertTrue(manager.run())
+
+            # every pass after the first round was invalidated by a change
+            # since it last ran
+            dirty = set()
+            for i, (name, changed) in enumerate(manager.runs):
+                if i >= len(PIPELINES['O2']):
+                    self.assertIn(name, dirty)
+                dirty.discard(name)
+                if changed:
+                    dirty.update(INVALIDATES[name])
+
+            # and at the fixpoint, no pass changes anything
+            again = PassManager(graph, 'O2')
+            self.assertTrue(again.run())
+            self.assertEqual(again.runs,
+                             [(name, False) for name in PIPELINES['O2']])
+
+    def test_max_iterations(self):
+        source = 'a = 1; if a goto L; return 1; L: b = a + 2; return b;'
+        manager = PassManager(CFGraph(parse(source)), 'O2', max_iterations=1)
+        self.assertFalse(manager.run())
+        self.assertFalse(manager.converged)
+        self.assertEqual(manager.iterations, 1)
+
+    def test_unknown_passes(self):
+        graph = CFGraph(parse('return 1;'))
+        self.assertRaises(ValueError, PassManager, graph, 'O3')
+        self.assertRaises(ValueError, PassManager, graph, ['CP', 'XYZ'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+"""
+Compiling with run.py: code and dot files written out as they are generated
+must be what would have been returned whole, whether or not they are also
+being written to the cache; and output files are only replaced by those of a
+program that compiles.
+
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from cStringIO import StringIO
+
+import run
+from graph import JumpSyntaxError
+from graph.cache import CompileCache, MemoryCache
+
+from tests.programs import SEEDS, synth_source
+
+DOTS = [None, run.DotOptions(False, None), run.DotOptions(True, None),
+        run.DotOptions(False, 10)]
+
+def compiled(text, cache=None, dot=None):
+    """The code and dot file of text, returned whole."""
+    result = run.compile_source(text, frontend='fast', cache=cache, dot=dot)
+    return ''.join(line + '\n' for line in result.output), result.dot
+
+def streamed(text, cache=None, dot=None):
+    """The code and dot file of text, written out."""
+    out = StringIO()
+    dot_out = StringIO() if dot is not None else None
+    result = run.compile_source(text, frontend='fast', cache=cache, out=out,
+                                dot=dot, dot_out=dot_out)
+    assert result.output is None and result.dot is None
+    return out.getvalue(), dot_out.getvalue() if dot is not None else None
+
+class StreamingTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_streamed(self):
+        for seed in SEEDS[::4]:
+            text = synth_source(seed)
+            for dot in DOTS:
+                self.assertEqual(streamed(text, dot=dot),
+                                 compiled(text, dot=dot))
+
+    def test_cached(self):
+        chunk_lines = run.CHUNK_LINES
+        run.CHUNK_LINES = 7  # so that entries are written a piece at a time
+        try:
+            for seed in SEEDS[::4]:
+                text = synth_source(seed)
+                for dot in DOTS:
+                    expected = compiled(text, dot=dot)
+                    cache = CompileCache(self.directory)
+                    memory = MemoryCache(backing=CompileCache(self.directory))
+                    for compile_with in (streamed, compiled, streamed):
+                        self.assertEqual(compile_with(text, cache, dot),
+                                         expected)
+                        self.assertEqual(compile_with(text, memory, dot),
+                                         expected)
+        finally:
+            run.CHUNK_LINES = chunk_lines
+
+    def test_failing(self):
+        output = os.path.join(self.directory, 'prog.out')
+        dot_path = os.path.join(self.directory, 'prog.dot')
+        for path in (output, dot_path):
+            with open(path, 'w') as f:
+                f.write('old\n')
+
+        self.assertRaises(JumpSyntaxError, run.main, StringIO('goto X;'),
+                          frontend='fast', output=output, dot=DOTS[1],
+                          dot_path=dot_path)
+        for path in (output, dot_path):
+            with open(path) as f:
+                self.assertEqual(f.read(), 'old\n')
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         ['prog.dot', 'prog.out'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+"""
+Sparse conditional constant propagation: constants are substituted and
+folded, and branches on them decided, counting only the paths the program
+can take.
+
+"""
+import unittest
+
+from tests.programs import ProgramTestCase
+
+class SCCPTest(ProgramTestCase):
+    def test_folding(self):
+        self.assertOptimises('x = 1; y = 2; z = x + y; return z;', ['CP'],
+                             'x = 1; y = 2; z = 1 + 2; return 3;')
+        # a division by zero is left to trap
+        self.assertOptimises('a = 0; b = 1 / a; return 2;', ['CP'],
+                             'a = 0; b = 1 / 0; return 2;')
+
+    def test_branches(self):
+        self.assertOptimises('a = 1; if a goto L; return 1; '
+                             'L: b = a + 2; return b;', ['CP'],
+                             'a = 1; goto L0; L0: b = 1 + 2; return 3;')
+        # x = 2 is never run, so x is still 1 where the paths meet
+        self.assertOptimises('x = 1; if x goto L; x = 2; L: return x;',
+                             ['CP'], 'x = 1; goto L0; L0: return 1;')
+        # but here it may be
+        self.assertOptimises('x = 1; if a goto L; x = 2; L: return x;',
+                             ['CP'],
+                             'x = 1; if a goto L0; x = 2; L0: return x;')
+
+    def test_loops(self):
+        self.assertOptimises('x = 1; i = 0; L: i = i + x; c = 5 - i; '
+                             'if c goto L; return x;', ['CP'],
+                             'x = 1; i = 0; L0: i = i + 1; c = 5 - i; '
+                             'if c goto L0; return 1;')
+
+    def test_synth_programs(self):
+        self.assertBehavesOnSynth(['CP'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+"""
+The compile server: one JSON response per request line, compiling as
+run.py would, and refusing bad requests without stopping.
+
+"""
+import json
+import unittest
+from cStringIO import StringIO
+
+import run
+from graph.cache import MemoryCache
+
+from tests.programs import SEEDS, synth_source
+
+def request(**fields):
+    return json.dumps(fields)
+
+class CompileServerTest(unittest.TestCase):
+    def setUp(self):
+        self.server = run.CompileServer(MemoryCache(), frontend='fast')
+
+    def test_compiling(self):
+        for seed in SEEDS[::8]:
+            source = synth_source(seed)
+            expected = run.compile_source(source, frontend='fast', level='O1',
+                                          dot=run.DotOptions(True, 5))
+            for cached in (False, True):
+                response = self.server.respond(request(
+                    id=seed, source=source, level='O1',
+                    dot={'blocks': True, 'max_nodes': 5}))
+                self.assertTrue(response['ok'])
+                self.assertEqual(response['id'], seed)
+                self.assertEqual(response['output'],
+                                 ''.join(line + '\n'
+                                         for line in expected.output))
+                self.assertEqual(response['dot'], expected.dot)
+                self.assertEqual(response['cached'], cached)
+
+    def test_bad_requests(self):
+        for line in ['[]', 'source', request(id=1),
+                     request(source='return 1;', level='O9'),
+                     request(source='return 1;', frontend='slow'),
+                     request(source='return 1;', max_iterations=True),
+                     request(source='return 1;', max_iterations='2'),
+                     request(source='return 1;', dot={'max_nodes': False})]:
+            response = self.server.respond(line)
+            self.assertFalse(response['ok'])
+            self.assertTrue(response['error'].startswith('bad request'),
+                            response['error'])
+
+        response = self.server.respond(request(source='goto X;'))
+        self.assertFalse(response['ok'])
+        self.assertTrue(response['error'].startswith('syntax error'))
+
+    def test_serving(self):
+        lines = [request(id=1, source='x = 1; return x;'), '', 'nonsense',
+                 request(id=3, source='return 2;', stats=True)]
+        out = StringIO()
+        self.server.serve(StringIO(''.join(line + '\n' for line in lines)),
+                          out)
+        responses = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([(r['id'], r['ok']) for r in responses],
+                         [(1, True), (None, False), (3, True)])
+        self.assertNotIn('stats', responses[0])
+        self.assertIn('optimise', responses[2]['stats'])
+
+
+if __name__ == '__main__':
+    unittest.main()
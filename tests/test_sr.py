@@ -0,0 +1,55 @@
+"""
+Strength reduction: multiples of a loop's induction variables are stepped
+alongside them rather than multiplied out on every trip, and an induction
+variable only compared is replaced by a multiple of it.
+
+"""
+import unittest
+
+from tests.programs import ProgramTestCase
+
+class SRTest(ProgramTestCase):
+    def assertReduces(self, source, expected):
+        # steps are counted alike whatever they do, so trading multiplications
+        # for additions takes more of them
+        self.assertOptimises(source, ['SR'], expected, fewer_steps=False)
+
+    def test_multiples(self):
+        self.assertReduces('i = 0; s = 0; L: t = i * 4; s = s + t; '
+                           'i = i + 2; c = 10 - i; if c goto L; return s;',
+                           'i = 0; s = 0; iv4 = i * 4; L0: t = iv4; '
+                           's = s + t; i = i + 2; iv4 = iv4 + 8; '
+                           'c = 10 - i; if c goto L0; return s;')
+        self.assertReduces('i = 0; s = 0; L: t = i * k; s = s + t; '
+                           'i = i + 1; c = 10 - i; if c goto L; return s;',
+                           'i = 0; s = 0; iv5 = i * k; L0: t = iv5; '
+                           's = s + t; i = i + 1; iv5 = iv5 + k; '
+                           'c = 10 - i; if c goto L0; return s;')
+
+    def test_eliminating(self):
+        self.assertReduces('i = 0; s = 0; L: t = i * 4; s = s + t; '
+                           'i = i + 1; c = i < 10; if c goto L; return s;',
+                           'i = 0; s = 0; iv4 = i * 4; L0: t = iv4; '
+                           's = s + t; iv4 = iv4 + 4; c = iv4 < 40; '
+                           'if c goto L0; return s;')
+        # a negative factor turns the comparison round
+        self.assertReduces('i = 0; s = 0; L: t = i * -2; s = s + t; '
+                           'i = i + 1; c = i < n; if c goto L; return s;',
+                           'i = 0; s = 0; iv5 = i * -2; iv6 = n * -2; '
+                           'L0: t = iv5; s = s + t; iv5 = iv5 + -2; '
+                           'c = iv5 > iv6; if c goto L0; return s;')
+
+    def test_not_reducing(self):
+        # i is not stepped by a constant
+        self.assertOptimises('i = 1; s = 0; L: t = i * 4; s = s + t; '
+                             'i = i * 2; c = 16 - i; if c goto L; return s;',
+                             ['SR'],
+                             'i = 1; s = 0; L0: t = i * 4; s = s + t; '
+                             'i = i * 2; c = 16 - i; if c goto L0; return s;')
+
+    def test_synth_programs(self):
+        self.assertBehavesOnSynth(['SR'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+"""
+SSA form: every use reads the one Value that reaches it, as reaching
+definitions would have it, and copies are only propagated while their
+sources still hold the copied value.
+
+"""
+import unittest
+
+from graph.cfg import CFGraph
+from graph.dataflow import ReachingDefinitions
+from graph.parser import parse
+from graph.ssa import SSAForm
+from graph.traversal import reachable
+
+from tests.programs import ProgramTestCase, SEEDS, synth_source
+
+class SSATest(ProgramTestCase):
+    def test_synth_programs(self):
+        for seed in SEEDS:
+            graph = CFGraph(parse(synth_source(seed)))
+            ssa = SSAForm(graph)
+            reaching = ReachingDefinitions(graph)
+            seen = reachable(graph)
+
+            for stmt, value in ssa.defined.iteritems():
+                self.assertIs(value.stmt, stmt)
+            for stmt, reads in ssa.used.iteritems():
+                for var, value in reads.iteritems():
+                    self.assertEqual(value.var, var)
+                    self.assertIn(stmt, value.uses)
+
+                    found = [d for d in reaching.reaching(stmt, var)
+                             if seen[d.num]]
+                    if value.is_phi:
+                        continue
+                    elif value.stmt is not None:
+                        self.assertEqual(found, [value.stmt])
+                    else:
+                        self.assertEqual(found, [])  # the entry value
+
+    def test_copies(self):
+        self.assertOptimises('x = a; y = x + 1; return y;', ['CP'],
+                             'x = a; y = a + 1; return y;')
+        # a no longer holds what was copied to x
+        self.assertOptimises('x = a; a = 2; y = x + 1; return y;', ['CP'],
+                             'x = a; a = 2; y = x + 1; return y;')
+        # x may have been copied from a or from b
+        self.assertOptimises('x = a; if c goto L; x = b; L: y = x + 1; '
+                             'return y;', ['CP'],
+                             'x = a; if c goto L0; x = b; L0: y = x + 1; '
+                             'return y;')
+        # i is stepped between the copy and its use
+        self.assertOptimises('i = 0; L: j = i; i = i + 1; c = 5 - j; '
+                             'if c goto L; return i;', ['CP'],
+                             'i = 0; L0: j = i; i = i + 1; c = 5 - j; '
+                             'if c goto L0; return i;')
+
+
+if __name__ == '__main__':
+    unittest.main()
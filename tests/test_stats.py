@@ -0,0 +1,54 @@
+"""
+Instrumentation: each pass's calls, changes and counters, as the pass
+manager ran them.
+
+"""
+import unittest
+
+from graph.cfg import CFGraph
+from graph.parser import parse
+from graph.passes import PassManager
+from graph.stats import Stats
+
+from tests.programs import SEEDS, synth_source
+
+class StatsTest(unittest.TestCase):
+    def test_passes(self):
+        for seed in SEEDS[::4]:
+            graph = CFGraph(parse(synth_source(seed)))
+            manager = PassManager(graph, 'O2')
+            manager.run()
+
+            stats = graph.stats.as_dict()
+            for name in set(name for name, changed in manager.runs):
+                runs = [changed for n, changed in manager.runs if n == name]
+                self.assertEqual(stats[name]['calls'], len(runs))
+                self.assertEqual(stats[name]['changed'], sum(runs))
+            self.assertEqual(stats['optimise']['calls'], 1)
+            self.assertEqual(stats['optimise']['counters']['iterations'],
+                             manager.iterations)
+
+    def test_generate(self):
+        graph = CFGraph(parse(synth_source(0)))
+        # one call, however many lines it yields
+        list(graph.generate())
+        self.assertEqual(graph.stats['generate'].calls, 1)
+
+    def test_merge(self):
+        graph = CFGraph(parse(synth_source(1)))
+        PassManager(graph, 'O2').run()
+        stats = graph.stats.as_dict()
+
+        merged = Stats()
+        merged.merge(stats)
+        merged.merge(stats)
+        for name, values in merged.as_dict().iteritems():
+            self.assertEqual(values['calls'], 2 * stats[name]['calls'])
+            self.assertEqual(values['changed'], 2 * stats[name]['changed'])
+            self.assertEqual(values['counters'],
+                             dict((counter, 2 * n) for counter, n in
+                                  stats[name]['counters'].iteritems()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+"""
+The program generator: seeded, and its programs valid and terminating.
+
+"""
+import unittest
+
+from graph.cfg import CFGraph
+from graph.parser import parse
+from graph.vm import execute
+from synth import ProgramGenerator
+
+from tests.programs import MAX_STEPS, SEEDS, synth_source
+
+class SynthTest(unittest.TestCase):
+    def test_seeded(self):
+        self.assertEqual(synth_source(1), synth_source(1))
+        self.assertNotEqual(synth_source(1), synth_source(2))
+
+    def test_terminating(self):
+        for seed in SEEDS:
+            result = execute(CFGraph(parse(synth_source(seed))), MAX_STEPS)
+            self.assertTrue(result.returned)
+
+    def test_size(self):
+        for statements in (100, 1000, 10000):
+            lines = ProgramGenerator(statements=statements, seed=0).generate()
+            count = sum(1 for line in lines if line.endswith(';'))
+            self.assertTrue(statements * 0.8 <= count <= statements,
+                            '{0} statements for {1}'.format(count, statements))
+
+
+if __name__ == '__main__':
+    unittest.main()
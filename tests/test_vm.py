@@ -0,0 +1,46 @@
+"""
+The engines running programs: compiled to the VM or to Python, they must
+come to what walking their statements does.
+
+"""
+import unittest
+
+from graph import pycompile
+from graph.cfg import CFGraph
+from graph.parser import parse
+from graph.vm import Execution, execute, interpret
+
+from tests.programs import SEEDS, optimised, outcome, synth_source
+
+class EngineTest(unittest.TestCase):
+    def test_values(self):
+        graph = CFGraph(parse('i = 0; s = 0; L: s = s + i; i = i + 1; '
+                              'c = 4 - i; if c goto L; return s;'))
+        self.assertEqual(execute(graph), Execution(6, 19, True))
+        self.assertEqual(pycompile.execute(graph), Execution(6, 19, True))
+        falling = CFGraph(parse('x = 1;'))
+        self.assertEqual(execute(falling), Execution(None, 1, False))
+        self.assertEqual(pycompile.execute(falling),
+                         Execution(None, 1, False))
+
+    def test_engines_agree(self):
+        for seed in SEEDS:
+            source = synth_source(seed)
+            for level in ('O0', 'O2'):
+                graph = optimised(source, level)
+                expected = outcome(interpret, graph)
+                self.assertEqual(outcome(execute, graph), expected)
+                self.assertEqual(outcome(pycompile.execute, graph), expected)
+
+    def test_runtime_errors(self):
+        for source in ['x = 0; y = 1 / x; return y;',
+                       'i = 0; L: i = i + 1; goto L;']:
+            graph = CFGraph(parse(source))
+            expected = outcome(interpret, graph)
+            self.assertIsInstance(expected, str)
+            self.assertEqual(outcome(execute, graph), expected)
+            self.assertEqual(outcome(pycompile.execute, graph), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()